@@ -81,43 +81,42 @@ def poll(interval):
     sorted by IO activity and total disks I/O activity.
     """
     # first get a list of all processes and disk io counters
-    procs = [p for p in psutil.process_iter()]
-    for p in procs[:]:
-        try:
-            p._before = p.io_counters()
-        except psutil.Error:
-            procs.remove(p)
-            continue
+    # ({Process: io_counters()})
+    before = {}
+    for p in psutil.process_iter(['io_counters']):
+        if p.info['io_counters'] is not None:
+            before[p] = p.info['io_counters']
     disks_before = psutil.disk_io_counters()
 
     # sleep some time
     time.sleep(interval)
 
     # then retrieve the same info again
-    for p in procs[:]:
-        try:
-            p._after = p.io_counters()
-            p._cmdline = ' '.join(p.cmdline())
-            if not p._cmdline:
-                p._cmdline = p.name()
-            p._username = p.username()
-        except psutil.NoSuchProcess:
-            procs.remove(p)
+    procs = []
+    attrs = ['io_counters', 'cmdline', 'name', 'username']
+    for p in psutil.process_iter(attrs):
+        if p not in before:
+            continue
+        after = p.info['io_counters']
+        if after is None:
+            continue
+        cmdline = ' '.join(p.info['cmdline'] or []) or p.info['name']
+        # finally calculate results by comparing data before and
+        # after the interval
+        read_per_sec = after.read_bytes - before[p].read_bytes
+        write_per_sec = after.write_bytes - before[p].write_bytes
+        procs.append(dict(pid=p.pid, username=p.info['username'] or '',
+                          cmdline=cmdline, read_per_sec=read_per_sec,
+                          write_per_sec=write_per_sec,
+                          total=read_per_sec + write_per_sec))
     disks_after = psutil.disk_io_counters()
 
-    # finally calculate results by comparing data before and
-    # after the interval
-    for p in procs:
-        p._read_per_sec = p._after.read_bytes - p._before.read_bytes
-        p._write_per_sec = p._after.write_bytes - p._before.write_bytes
-        p._total = p._read_per_sec + p._write_per_sec
-
     disks_read_per_sec = disks_after.read_bytes - disks_before.read_bytes
     disks_write_per_sec = disks_after.write_bytes - disks_before.write_bytes
 
     # sort processes by total disk IO so that the more intensive
     # ones get listed first
-    processes = sorted(procs, key=lambda p: p._total, reverse=True)
+    processes = sorted(procs, key=lambda p: p['total'], reverse=True)
 
     return (processes, disks_read_per_sec, disks_write_per_sec)
 
@@ -137,11 +136,11 @@ def refresh_window(procs, disks_read, disks_write):
 
     for p in procs:
         line = templ % (
-            p.pid,
-            p._username[:7],
-            bytes2human(p._read_per_sec),
-            bytes2human(p._write_per_sec),
-            p._cmdline)
+            p['pid'],
+            p['username'][:7],
+            bytes2human(p['read_per_sec']),
+            bytes2human(p['write_per_sec']),
+            p['cmdline'])
         try:
             print_line(line)
         except curses.error:
@@ -26,31 +26,26 @@ proto_map = {
 
 
 def main():
-    templ = "%-5s %-22s %-22s %-13s %-6s %s"
+    templ = "%-5s %-30s %-30s %-13s %-6s %s"
     print_(templ % (
-        "Proto", "Local addr", "Remote addr", "Status", "PID", "Program name"))
-    for p in psutil.process_iter():
-        name = '?'
-        try:
-            name = p.name()
-            cons = p.connections(kind='inet')
-        except psutil.AccessDenied:
-            print_(templ % (AD, AD, AD, AD, p.pid, name))
-        except psutil.NoSuchProcess:
-            continue
-        else:
-            for c in cons:
-                raddr = ""
-                laddr = "%s:%s" % (c.laddr)
-                if c.raddr:
-                    raddr = "%s:%s" % (c.raddr)
-                print_(templ % (
-                    proto_map[(c.family, c.type)],
-                    laddr,
-                    raddr,
-                    c.status,
-                    p.pid,
-                    name[:15]))
+        "Proto", "Local address", "Remote address", "Status", "PID",
+        "Program name"))
+    proc_names = {}
+    for p in psutil.process_iter(['name'], ad_value='?'):
+        proc_names[p.pid] = p.info['name']
+    for c in psutil.net_connections(kind='inet'):
+        laddr = "%s:%s" % (c.laddr)
+        raddr = ""
+        if c.raddr:
+            raddr = "%s:%s" % (c.raddr)
+        print_(templ % (
+            proto_map[(c.family, c.type)],
+            laddr,
+            raddr or AD,
+            c.status,
+            c.pid or AD,
+            proc_names.get(c.pid, '?')[:15],
+        ))
 
 if __name__ == '__main__':
     main()
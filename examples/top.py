@@ -76,22 +76,18 @@ def poll(interval):
     time.sleep(interval)
     procs = []
     procs_status = {}
-    for p in psutil.process_iter():
+    attrs = ['pid', 'username', 'nice', 'memory_info', 'memory_percent',
+             'cpu_percent', 'cpu_times', 'name', 'status']
+    for p in psutil.process_iter(attrs):
+        pinfo = p.info
         try:
-            p.dict = p.as_dict(['username', 'nice', 'memory_info',
-                                'memory_percent', 'cpu_percent',
-                                'cpu_times', 'name', 'status'])
-            try:
-                procs_status[p.dict['status']] += 1
-            except KeyError:
-                procs_status[p.dict['status']] = 1
-        except psutil.NoSuchProcess:
-            pass
-        else:
-            procs.append(p)
+            procs_status[pinfo['status']] += 1
+        except KeyError:
+            procs_status[pinfo['status']] = 1
+        procs.append(pinfo)
 
     # return processes sorted by CPU percent usage
-    processes = sorted(procs, key=lambda p: p.dict['cpu_percent'],
+    processes = sorted(procs, key=lambda p: p['cpu_percent'],
                        reverse=True)
     return (processes, procs_status)
 
@@ -160,32 +156,32 @@ def refresh_window(procs, procs_status):
     for p in procs:
         # TIME+ column shows process CPU cumulative time and it
         # is expressed as: "mm:ss.ms"
-        if p.dict['cpu_times'] is not None:
-            ctime = timedelta(seconds=sum(p.dict['cpu_times']))
+        if p['cpu_times'] is not None:
+            ctime = timedelta(seconds=sum(p['cpu_times']))
             ctime = "%s:%s.%s" % (ctime.seconds // 60 % 60,
                                   str((ctime.seconds % 60)).zfill(2),
                                   str(ctime.microseconds)[:2])
         else:
             ctime = ''
-        if p.dict['memory_percent'] is not None:
-            p.dict['memory_percent'] = round(p.dict['memory_percent'], 1)
+        if p['memory_percent'] is not None:
+            p['memory_percent'] = round(p['memory_percent'], 1)
         else:
-            p.dict['memory_percent'] = ''
-        if p.dict['cpu_percent'] is None:
-            p.dict['cpu_percent'] = ''
-        if p.dict['username']:
-            username = p.dict['username'][:8]
+            p['memory_percent'] = ''
+        if p['cpu_percent'] is None:
+            p['cpu_percent'] = ''
+        if p['username']:
+            username = p['username'][:8]
         else:
             username = ""
-        line = templ % (p.pid,
+        line = templ % (p['pid'],
                         username,
-                        p.dict['nice'],
-                        bytes2human(getattr(p.dict['memory_info'], 'vms', 0)),
-                        bytes2human(getattr(p.dict['memory_info'], 'rss', 0)),
-                        p.dict['cpu_percent'],
-                        p.dict['memory_percent'],
+                        p['nice'],
+                        bytes2human(getattr(p['memory_info'], 'vms', 0)),
+                        bytes2human(getattr(p['memory_info'], 'rss', 0)),
+                        p['cpu_percent'],
+                        p['memory_percent'],
                         ctime,
-                        p.dict['name'] or '',
+                        p['name'] or '',
                         )
         try:
             print_line(line)
@@ -26,15 +26,22 @@ __all__ = [
     "CONN_ESTABLISHED", "CONN_SYN_SENT", "CONN_SYN_RECV", "CONN_FIN_WAIT1",
     "CONN_FIN_WAIT2", "CONN_TIME_WAIT", "CONN_CLOSE", "CONN_CLOSE_WAIT",
     "CONN_LAST_ACK", "CONN_LISTEN", "CONN_CLOSING", "CONN_NONE",
+    "PROC_EVENT_FORK", "PROC_EVENT_EXEC", "PROC_EVENT_EXIT",
     # classes
-    "Process", "Popen",
+    "Process", "Popen", "ProcessTree", "ProcessEvents", "ProcessCache",
+    "Sampler", "CPUPercentTracker",
     # functions
-    "pid_exists", "pids", "process_iter", "wait_procs",             # proc
+    "pid_exists", "pids", "process_iter", "process_table",          # proc
+    "wait_procs", "wait_procs_async",
     "virtual_memory", "swap_memory",                                # memory
     "cpu_times", "cpu_percent", "cpu_times_percent", "cpu_count",   # cpu
-    "net_io_counters",                                              # network
+    "per_cpu_times_array", "cpu_busy_percent_array",
+    "net_io_counters", "net_connections", "iter_net_connections",   # network
     "disk_io_counters", "disk_partitions", "disk_usage",            # disk
     "users", "boot_time",                                           # others
+    "cpu_times_async", "cpu_percent_async", "cpu_times_percent_async",
+    "virtual_memory_async", "disk_io_counters_async",               # async
+    "net_io_counters_async", "process_table_async",
 ]
 
 import sys
@@ -43,21 +50,27 @@ import time
 import signal
 import warnings
 import errno
-import subprocess
+import select
+import array as _array
 try:
     import pwd
 except ImportError:
     pwd = None
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
 
 from psutil._error import Error, NoSuchProcess, AccessDenied, TimeoutExpired
 from psutil._common import cached_property, memoize
 from psutil._compat import property, callable, defaultdict
 from psutil._compat import (wraps as _wraps,
                             PY3 as _PY3)
-from psutil._common import (deprecated_method as _deprecated_method,
-                            deprecated as _deprecated,
-                            sdiskio as _nt_sys_diskio,
-                            snetio as _nt_sys_netio)
+from psutil._common import (sdiskio as _nt_sys_diskio,
+                            snetio as _nt_sys_netio,
+                            sconn as _nt_sys_conn,
+                            sprocevent as _nt_sys_procevent,
+                            ssample as _nt_sys_sample)
 
 from psutil._common import (STATUS_RUNNING,
                             STATUS_SLEEPING,
@@ -85,10 +98,12 @@ from psutil._common import (CONN_ESTABLISHED,
                             CONN_CLOSING,
                             CONN_NONE)
 
+from psutil._common import (PROC_EVENT_FORK,
+                            PROC_EVENT_EXEC,
+                            PROC_EVENT_EXIT)
+
 if sys.platform.startswith("linux"):
     import psutil._pslinux as _psplatform
-    from psutil._pslinux import (phymem_buffers,
-                                 cached_phymem)
 
     from psutil._pslinux import (IOPRIO_CLASS_NONE,
                                  IOPRIO_CLASS_RT,
@@ -164,6 +179,7 @@ __all__.extend(_psplatform.__extra__all__)
 _TOTAL_PHYMEM = None
 _POSIX = os.name == 'posix'
 _WINDOWS = os.name == 'nt'
+_NAN = float('nan')
 
 
 def _assert_pid_not_reused(fun):
@@ -178,6 +194,153 @@ def _assert_pid_not_reused(fun):
     return wrapper
 
 
+# --- process information shared by Process and process_table()
+#
+# These work with the platform-specific Process implementation and
+# are used where the public Process class adds some logic on top
+# of it.
+
+def _proc_name(proc):
+    name = proc.name()
+    if _POSIX and len(name) >= 15:
+        # On UNIX the name gets truncated to the first 15 characters.
+        # If it matches the first part of the cmdline we return that
+        # one instead because it's usually more explicative.
+        # Examples are "gnome-keyring-d" vs. "gnome-keyring-daemon".
+        try:
+            cmdline = proc.cmdline()
+        except AccessDenied:
+            pass
+        else:
+            if cmdline:
+                extended_name = os.path.basename(cmdline[0])
+                if extended_name.startswith(name):
+                    name = extended_name
+    return name
+
+
+def _proc_exe(proc):
+    def guess_it(fallback):
+        # try to guess exe from cmdline[0] in absence of a native
+        # exe representation
+        cmdline = proc.cmdline()
+        if cmdline and hasattr(os, 'access') and hasattr(os, 'X_OK'):
+            exe = cmdline[0]  # the possible exe
+            # Attempt to guess only in case of an absolute path.
+            # It is not safe otherwise as the process might have
+            # changed cwd.
+            if (os.path.isabs(exe)
+                    and os.path.isfile(exe)
+                    and os.access(exe, os.X_OK)):
+                return exe
+        if isinstance(fallback, AccessDenied):
+            raise fallback
+        return fallback
+
+    try:
+        exe = proc.exe()
+    except AccessDenied:
+        err = sys.exc_info()[1]
+        return guess_it(fallback=err)
+    else:
+        if not exe:
+            # underlying implementation can legitimately return an
+            # empty string; if that's the case we don't want to
+            # raise AD while guessing from the cmdline
+            try:
+                exe = guess_it(fallback=exe)
+            except AccessDenied:
+                pass
+        return exe
+
+
+def _proc_username(proc):
+    if _POSIX:
+        if pwd is None:
+            # might happen if python was installed from sources
+            raise ImportError(
+                "requires pwd module shipped with standard python")
+        # real uid
+        return pwd.getpwuid(proc.uids()[0]).pw_name
+    else:
+        return proc.username()
+
+
+def _proc_cpu_percent(pt1, pt2, st1, st2):
+    """Return process CPU utilization percentage given two process
+    cpu_times() and the sum of the system cpu_times() taken at the
+    same time.
+    """
+    # (user, system, ...) tuples
+    delta_proc = (pt2[0] - pt1[0]) + (pt2[1] - pt1[1])
+    delta_time = st2 - st1
+    try:
+        # the utilization split between all CPUs
+        overall_percent = (delta_proc / delta_time) * 100
+    except ZeroDivisionError:
+        # interval was too low
+        return 0.0
+    # the utilization of a single CPU (note: cpu_count() value is cached)
+    single_cpu_percent = overall_percent * cpu_count()
+    # On POSIX a percentage > 100 is legitimate:
+    # http://stackoverflow.com/questions/1032357/
+    #   comprehending-top-cpu-usage
+    # On windows we use this ugly hack in order to avoid float
+    # precision issues.
+    if not _POSIX:
+        if single_cpu_percent > 100.0:
+            return 100.0
+    return round(single_cpu_percent, 1)
+
+
+def _proc_memory_percent(proc):
+    rss = proc.memory_info()[0]
+    # use cached value if available
+    total_phymem = _TOTAL_PHYMEM or virtual_memory().total
+    try:
+        return (rss / float(total_phymem)) * 100
+    except ZeroDivisionError:
+        return 0.0
+
+
+def _new_process(pid, create_time=None):
+    """Return a Process instance for 'pid'. If its 'create_time' is
+    already known it is not read again.
+    """
+    if create_time is None:
+        return Process(pid)
+    proc = Process.__new__(Process)
+    proc._init(pid, _create_time=create_time)
+    return proc
+
+
+class _Oneshot(object):
+    """The context manager returned by Process.oneshot()."""
+
+    def __init__(self, proc):
+        self._proc = proc
+        self._owner = False
+
+    def __enter__(self):
+        proc = self._proc
+        # nested oneshot() blocks are a no-op: the cache is owned and
+        # eventually cleared by the outermost one
+        if not proc._oneshot_inctx:
+            proc._oneshot_inctx = True
+            self._owner = True
+            if hasattr(proc._proc, "oneshot_enter"):
+                proc._proc.oneshot_enter()
+        return proc
+
+    def __exit__(self, *exc_info):
+        if self._owner:
+            proc = self._proc
+            self._owner = False
+            proc._oneshot_inctx = False
+            if hasattr(proc._proc, "oneshot_exit"):
+                proc._proc.oneshot_exit()
+
+
 class Process(object):
     """Represents an OS process with the given PID.
     If PID is omitted current process PID (os.getpid()) is used.
@@ -211,10 +374,16 @@ class Process(object):
         process identity for every yielded instance
     """
 
+    # 'info' is set by process_iter(), 'returncode' by wait_procs()
+    __slots__ = ['_pid', '_name', '_exe', '_create_time', '_gone', '_hash',
+                 '_ppid', '_proc', '_last_sys_cpu_times',
+                 '_last_proc_cpu_times', '_oneshot_inctx', '_ident',
+                 'info', 'returncode', '__weakref__']
+
     def __init__(self, pid=None):
         self._init(pid)
 
-    def _init(self, pid, _ignore_nsp=False):
+    def _init(self, pid, _ignore_nsp=False, _create_time=None):
         if pid is None:
             pid = os.getpid()
         else:
@@ -236,9 +405,14 @@ class Process(object):
         self._proc = _psplatform.Process(pid)
         self._last_sys_cpu_times = None
         self._last_proc_cpu_times = None
+        self._oneshot_inctx = False
         # cache creation time for later use in is_running() method
+        # (unless the caller already knows it)
         try:
-            self.create_time()
+            if _create_time is None:
+                self.create_time()
+            else:
+                self._create_time = _create_time
         except AccessDenied:
             # we should never get here as AFAIK we're able to get
             # process creation time on all platforms even as a
@@ -287,6 +461,30 @@ class Process(object):
 
     # --- utility methods
 
+    def oneshot(self):
+        """Utility context manager which considerably speeds up the
+        retrieval of multiple process information at the same time.
+
+        Different process information are usually extracted from the
+        same underlying source (e.g. on Linux name(), ppid(), status(),
+        cpu_times() and create_time() all come from /proc/PID/stat)
+        which gets read again on every call.
+        Within this block every source is read only once, the first
+        time it's needed, and the parsed content is shared between
+        all methods. The cache is cleared on exit.
+
+        >>> import psutil
+        >>> p = psutil.Process()
+        >>> with p.oneshot():
+        ...     p.name()  # reads /proc/PID/stat
+        ...     p.cpu_times()  # uses cached stat
+        ...     p.create_time()  # uses cached stat
+        ...     p.ppid()  # uses cached stat
+        ...
+        >>>
+        """
+        return _Oneshot(self)
+
     def as_dict(self, attrs=[], ad_value=None):
         """Utility method returning process information as a
         hashable dictionary.
@@ -300,47 +498,73 @@ class Process(object):
         AccessDenied  exception is raised when retrieving that
         particular process information.
         """
+        return self._as_dict(self._as_dict_names(attrs), ad_value,
+                             bool(attrs))
+
+    def _as_dict_names(self, attrs):
+        """Return the attribute names as_dict(attrs) has to fetch."""
         excluded_names = set(
             ['send_signal', 'suspend', 'resume', 'terminate', 'kill', 'wait',
-             'is_running', 'as_dict', 'parent', 'children', 'rlimit'])
-        retdict = dict()
+             'is_running', 'as_dict', 'parent', 'children', 'rlimit',
+             'oneshot', 'iter_open_files', 'iter_connections',
+             'wait_async', 'keep_procfs_open', 'raw_tuples', 'info',
+             'returncode'])
         ls = set(attrs or [x for x in dir(self) if not x.startswith('get')])
+        names = []
         for name in ls:
             if name.startswith('_'):
                 continue
             if name.startswith('set_'):
                 continue
             if name.startswith('get_'):
-                msg = "%s() is deprecated; use %s() instead" % (name, name[4:])
-                warnings.warn(msg, category=DeprecationWarning, stacklevel=2)
+                msg = "%s() is deprecated; use %s() instead" % (
+                    name, name[4:])
+                warnings.warn(msg, category=DeprecationWarning,
+                              stacklevel=3)
                 name = name[4:]
                 if name in ls:
                     continue
             if name == 'getcwd':
                 msg = "getcwd() is deprecated; use cwd() instead"
-                warnings.warn(msg, category=DeprecationWarning, stacklevel=2)
+                warnings.warn(msg, category=DeprecationWarning,
+                              stacklevel=3)
                 name = 'cwd'
                 if name in ls:
                     continue
 
             if name in excluded_names:
                 continue
-            try:
-                attr = getattr(self, name)
-                if callable(attr):
-                    ret = attr()
-                else:
-                    ret = attr
-            except AccessDenied:
-                ret = ad_value
-            except NotImplementedError:
-                # in case of not implemented functionality (may happen
-                # on old or exotic systems) we want to crash only if
-                # the user explicitly asked for that particular attr
-                if attrs:
-                    raise
-                continue
-            retdict[name] = ret
+            names.append(name)
+        return names
+
+    def _as_dict(self, names, ad_value, strict):
+        """Fetch the attributes returned by _as_dict_names(). If
+        'strict' is True NotImplementedError is raised instead of
+        skipping the attribute.
+        """
+        retdict = dict()
+        ctx = self.oneshot()
+        ctx.__enter__()
+        try:
+            for name in names:
+                try:
+                    attr = getattr(self, name)
+                    if callable(attr):
+                        ret = attr()
+                    else:
+                        ret = attr
+                except AccessDenied:
+                    ret = ad_value
+                except NotImplementedError:
+                    # in case of not implemented functionality (may happen
+                    # on old or exotic systems) we want to crash only if
+                    # the user explicitly asked for that particular attr
+                    if strict:
+                        raise
+                    continue
+                retdict[name] = ret
+        finally:
+            ctx.__exit__(None, None, None)
         return retdict
 
     def parent(self):
@@ -404,21 +628,7 @@ class Process(object):
     def name(self):
         """The process name. The return value is cached after first call."""
         if self._name is None:
-            name = self._proc.name()
-            if _POSIX and len(name) >= 15:
-                # On UNIX the name gets truncated to the first 15 characters.
-                # If it matches the first part of the cmdline we return that
-                # one instead because it's usually more explicative.
-                # Examples are "gnome-keyring-d" vs. "gnome-keyring-daemon".
-                try:
-                    cmdline = self.cmdline()
-                except AccessDenied:
-                    pass
-                else:
-                    if cmdline:
-                        extended_name = os.path.basename(cmdline[0])
-                        if extended_name.startswith(name):
-                            name = extended_name
+            name = _proc_name(self._proc)
             self._proc._name = name
             self._name = name
         return self._name
@@ -428,39 +638,8 @@ class Process(object):
         May also be an empty string.
         The return value is cached after first call.
         """
-        def guess_it(fallback):
-            # try to guess exe from cmdline[0] in absence of a native
-            # exe representation
-            cmdline = self.cmdline()
-            if cmdline and hasattr(os, 'access') and hasattr(os, 'X_OK'):
-                exe = cmdline[0]  # the possible exe
-                # Attempt to guess only in case of an absolute path.
-                # It is not safe otherwise as the process might have
-                # changed cwd.
-                if (os.path.isabs(exe)
-                        and os.path.isfile(exe)
-                        and os.access(exe, os.X_OK)):
-                    return exe
-            if isinstance(fallback, AccessDenied):
-                raise fallback
-            return fallback
-
         if self._exe is None:
-            try:
-                exe = self._proc.exe()
-            except AccessDenied:
-                err = sys.exc_info()[1]
-                return guess_it(fallback=err)
-            else:
-                if not exe:
-                    # underlying implementation can legitimately return an
-                    # empty string; if that's the case we don't want to
-                    # raise AD while guessing from the cmdline
-                    try:
-                        exe = guess_it(fallback=exe)
-                    except AccessDenied:
-                        pass
-                self._exe = exe
+            self._exe = _proc_exe(self._proc)
         return self._exe
 
     def cmdline(self):
@@ -475,14 +654,7 @@ class Process(object):
         """The name of the user that owns the process.
         On UNIX this is calculated by using *real* process uid.
         """
-        if _POSIX:
-            if pwd is None:
-                # might happen if python was installed from sources
-                raise ImportError(
-                    "requires pwd module shipped with standard python")
-            return pwd.getpwuid(self.uids().real).pw_name
-        else:
-            return self._proc.username()
+        return _proc_username(self._proc)
 
     def create_time(self):
         """The process creation time as a floating point number
@@ -597,6 +769,36 @@ class Process(object):
             else:
                 self._proc.cpu_affinity_set(cpus)
 
+    # Linux only
+    if hasattr(_psplatform.Process, "raw_tuples"):
+
+        def raw_tuples(self, enabled=True):
+            """Make cpu_times(), memory_info(), memory_info_ex(),
+            memory_full_info(), io_counters(), num_ctx_switches(),
+            uids(), gids(), ionice() and threads() return plain
+            tuples instead of namedtuples, with fields in the same
+            order, which saves creating a namedtuple on every call.
+            Pass False to get namedtuples again.
+            Available on Linux only.
+            """
+            self._proc.raw_tuples(enabled)
+
+    # Linux only
+    if hasattr(_psplatform.Process, "keep_procfs_open"):
+
+        def keep_procfs_open(self, enabled=True):
+            """Keep the /proc/{pid}/stat, statm, status and io files
+            open once read and read them again with pread() instead
+            of opening them on every call, which is faster for a
+            process which is monitored over time.
+            The files are closed when False is passed, when this
+            object is garbage collected or as soon as the process is
+            found to be gone, after which NoSuchProcess is raised
+            even if its PID gets reused.
+            Available on Linux only.
+            """
+            self._proc.keep_procfs_open(enabled)
+
     if _WINDOWS:
 
         def num_handles(self):
@@ -649,8 +851,17 @@ class Process(object):
         process Y won't be listed as the reference to process A
         is lost.
         """
-        if hasattr(_psplatform, 'ppid_map'):
-            # Windows only: obtain a {pid:ppid, ...} dict for all running
+        # {pid: create_time} of the processes in ppid_map, if known
+        ctimes = {}
+        if hasattr(_psplatform, 'ppid_ctime_map'):
+            # Linux: the creation times are read in the same pass so
+            # that Process instances don't have to read them again
+            ppid_map = {}
+            for pid, (ppid, ctime) in _psplatform.ppid_ctime_map().items():
+                ppid_map[pid] = ppid
+                ctimes[pid] = ctime
+        elif hasattr(_psplatform, 'ppid_map'):
+            # Windows: obtain a {pid:ppid, ...} dict for all running
             # processes in one shot (faster).
             ppid_map = _psplatform.ppid_map()
         else:
@@ -659,7 +870,7 @@ class Process(object):
         ret = []
         if not recursive:
             if ppid_map is None:
-                # 'slow' version, common to all platforms except Windows
+                # 'slow' version, common to all other platforms
                 for p in process_iter():
                     try:
                         if p.ppid() == self.pid:
@@ -670,11 +881,11 @@ class Process(object):
                     except NoSuchProcess:
                         pass
             else:
-                # Windows only (faster)
+                # Windows and Linux (faster)
                 for pid, ppid in ppid_map.items():
                     if ppid == self.pid:
                         try:
-                            child = Process(pid)
+                            child = _new_process(pid, ctimes.get(pid))
                             # if child happens to be older than its parent
                             # (self) it means child's PID has been reused
                             if self.create_time() <= child.create_time():
@@ -692,20 +903,21 @@ class Process(object):
                     except NoSuchProcess:
                         pass
             else:
+                # here values are PIDs; Process instances are created
+                # later for the descendants only
                 for pid, ppid in ppid_map.items():
-                    try:
-                        p = Process(pid)
-                        table[ppid].append(p)
-                    except NoSuchProcess:
-                        pass
+                    table[ppid].append(pid)
             # At this point we have a mapping table where table[self.pid]
             # are the current process' children.
             # Below, we look for all descendants recursively, similarly
             # to a recursive function call.
             checkpids = [self.pid]
+            seen = set(checkpids)
             for pid in checkpids:
                 for child in table[pid]:
                     try:
+                        if ppid_map is not None:
+                            child = _new_process(child, ctimes.get(child))
                         # if child happens to be older than its parent
                         # (self) it means child's PID has been reused
                         intime = self.create_time() <= child.create_time()
@@ -714,7 +926,8 @@ class Process(object):
                     else:
                         if intime:
                             ret.append(child)
-                            if child.pid not in checkpids:
+                            if child.pid not in seen:
+                                seen.add(child.pid)
                                 checkpids.append(child.pid)
         return ret
 
@@ -762,29 +975,10 @@ class Process(object):
                 self._last_proc_cpu_times = pt2
                 return 0.0
 
-        delta_proc = (pt2.user - pt1.user) + (pt2.system - pt1.system)
-        delta_time = st2 - st1
         # reset values for next call in case of interval == None
         self._last_sys_cpu_times = st2
         self._last_proc_cpu_times = pt2
-
-        try:
-            # the utilization split between all CPUs
-            overall_percent = (delta_proc / delta_time) * 100
-        except ZeroDivisionError:
-            # interval was too low
-            return 0.0
-        # the utilization of a single CPU (note: cpu_count() value is cached)
-        single_cpu_percent = overall_percent * cpu_count()
-        # On POSIX a percentage > 100 is legitimate:
-        # http://stackoverflow.com/questions/1032357/
-        #   comprehending-top-cpu-usage
-        # On windows we use this ugly hack in order to avoid float
-        # precision issues.
-        if not _POSIX:
-            if single_cpu_percent > 100.0:
-                return 100.0
-        return round(single_cpu_percent, 1)
+        return _proc_cpu_percent(pt1, pt2, st1, st2)
 
     def cpu_times(self):
         """Return a (user, system) namedtuple representing  the
@@ -811,17 +1005,32 @@ class Process(object):
         """
         return self._proc.memory_info_ex()
 
+    # Linux only
+    if hasattr(_psplatform.Process, "memory_full_info"):
+
+        def memory_full_info(self):
+            """Same as memory_info_ex() plus:
+
+             - uss: Unique Set Size, the memory which would be freed
+               if the process was terminated right now
+             - pss: Proportional Set Size, the memory shared with
+               other processes divided by the number of processes
+               sharing it
+             - swap: the memory swapped out to disk
+
+            On Linux >= 4.14 these are read from the short
+            /proc/PID/smaps_rollup file, else they are summed from
+            /proc/PID/smaps, which is slower and may require higher
+            user privileges.
+            Available on Linux only.
+            """
+            return self._proc.memory_full_info()
+
     def memory_percent(self):
         """Compare physical system memory to process resident memory
         (RSS) and calculate process memory utilization as a percentage.
         """
-        rss = self._proc.memory_info()[0]
-        # use cached value if available
-        total_phymem = _TOTAL_PHYMEM or virtual_memory().total
-        try:
-            return (rss / float(total_phymem)) * 100
-        except ZeroDivisionError:
-            return 0.0
+        return _proc_memory_percent(self._proc)
 
     def memory_maps(self, grouped=True):
         """Return process' mapped memory regions as a list of nameduples
@@ -834,21 +1043,23 @@ class Process(object):
         entity and the namedtuple will also include the mapped region's
         address space ('addr') and permission set ('perms').
         """
-        it = self._proc.memory_maps()
         if grouped:
+            nt = _psplatform.pmmap_grouped
+            if hasattr(self._proc, "memory_maps_grouped"):
+                # summed while parsing (Linux)
+                return [nt(*x) for x in self._proc.memory_maps_grouped()]
             d = {}
-            for tupl in it:
+            for tupl in self._proc.memory_maps():
                 path = tupl[2]
                 nums = tupl[3:]
                 try:
-                    d[path] = map(lambda x, y: x + y, d[path], nums)
+                    d[path] = [x + y for x, y in zip(d[path], nums)]
                 except KeyError:
                     d[path] = nums
-            nt = _psplatform.pmmap_grouped
             return [nt(path, *d[path]) for path in d]
         else:
             nt = _psplatform.pmmap_ext
-            return [nt(*x) for x in it]
+            return [nt(*x) for x in self._proc.memory_maps()]
 
     def open_files(self):
         """Return files opened by process as a list of
@@ -857,6 +1068,14 @@ class Process(object):
         """
         return self._proc.open_files()
 
+    def iter_open_files(self):
+        """Same as open_files() but return a generator yielding
+        files as they are found rather than building a list first.
+        """
+        if hasattr(self._proc, "iter_open_files"):
+            return self._proc.iter_open_files()
+        return iter(self._proc.open_files())
+
     def connections(self, kind='inet'):
         """Return connections opened by process as a list of
         (fd, family, type, laddr, raddr, status) namedtuples.
@@ -878,6 +1097,22 @@ class Process(object):
         """
         return self._proc.connections(kind)
 
+    def iter_connections(self, kind='inet', status=None, laddr_port=None):
+        """Same as connections() but return a generator yielding
+        connections as they are found.
+        If 'status' is specified (a CONN_* constant or a sequence of
+        them) only connections in that status are returned.
+        If 'laddr_port' is specified only connections bound to that
+        local port are returned.
+        On Linux these filters are applied while parsing, before
+        addresses get decoded.
+        """
+        status = _conn_status_filter(status)
+        if hasattr(self._proc, "iter_connections"):
+            return self._proc.iter_connections(kind, status, laddr_port)
+        return _filter_connections(self._proc.connections(kind), status,
+                                   laddr_port)
+
     if _POSIX:
         def _send_signal(self, sig):
             try:
@@ -965,113 +1200,60 @@ class Process(object):
             raise ValueError("timeout must be a positive integer")
         return self._proc.wait(timeout)
 
-    # --- deprecated APIs
-
-    _locals = set(locals())
+    def wait_async(self, timeout=None):
+        """Same as wait() but return an asyncio future to be awaited,
+        without blocking the event loop:
 
-    @_deprecated_method(replacement='children')
-    def get_children(self):
-        pass
+          >>> await proc.wait_async(timeout=3)
+          0
 
-    @_deprecated_method(replacement='connections')
-    def get_connections(self):
-        pass
-
-    if "cpu_affinity" in _locals:
-        @_deprecated_method(replacement='cpu_affinity')
-        def get_cpu_affinity(self):
-            pass
-
-        @_deprecated_method(replacement='cpu_affinity')
-        def set_cpu_affinity(self, cpus):
-            pass
-
-    @_deprecated_method(replacement='cpu_percent')
-    def get_cpu_percent(self):
-        pass
-
-    @_deprecated_method(replacement='cpu_times')
-    def get_cpu_times(self):
-        pass
-
-    @_deprecated_method(replacement='cwd')
-    def getcwd(self):
-        pass
-
-    @_deprecated_method(replacement='memory_info_ex')
-    def get_ext_memory_info(self):
-        pass
-
-    if "io_counters" in _locals:
-        @_deprecated_method(replacement='io_counters')
-        def get_io_counters(self):
-            pass
-
-    if "ionice" in _locals:
-        @_deprecated_method(replacement='ionice')
-        def get_ionice(self):
-            pass
-
-        @_deprecated_method(replacement='ionice')
-        def set_ionice(self, ioclass, value=None):
-            pass
-
-    @_deprecated_method(replacement='memory_info')
-    def get_memory_info(self):
-        pass
-
-    @_deprecated_method(replacement='memory_maps')
-    def get_memory_maps(self):
-        pass
-
-    @_deprecated_method(replacement='memory_percent')
-    def get_memory_percent(self):
-        pass
-
-    @_deprecated_method(replacement='nice')
-    def get_nice(self):
-        pass
-
-    @_deprecated_method(replacement='num_ctx_switches')
-    def get_num_ctx_switches(self):
-        pass
-
-    if 'num_fds' in _locals:
-        @_deprecated_method(replacement='num_fds')
-        def get_num_fds(self):
-            pass
-
-    if 'num_handles' in _locals:
-        @_deprecated_method(replacement='num_handles')
-        def get_num_handles(self):
-            pass
-
-    @_deprecated_method(replacement='num_threads')
-    def get_num_threads(self):
-        pass
-
-    @_deprecated_method(replacement='open_files')
-    def get_open_files(self):
-        pass
-
-    if "rlimit" in _locals:
-        @_deprecated_method(replacement='rlimit')
-        def get_rlimit(self):
-            pass
+        On Linux >= 5.3 the loop is notified through a pidfd as
+        soon as the process terminates, else the process is checked
+        by loop callbacks with an increasing delay.
+        Requires Python >= 3.5.
+        """
+        if timeout is not None and not timeout >= 0:
+            raise ValueError("timeout must be a positive integer")
+        from psutil import _psasyncio
+        return _psasyncio.wait(self, timeout)
 
-        @_deprecated_method(replacement='rlimit')
-        def set_rlimit(self, resource, limits):
-            pass
 
-    @_deprecated_method(replacement='threads')
-    def get_threads(self):
-        pass
 
-    @_deprecated_method(replacement='nice')
-    def set_nice(self, value):
-        pass
+class _DeprecatedMethod(object):
+    """Placeholder of a deprecated Process method which is replaced
+    by the actual one on first access, see psutil/_deprecated.py.
+    """
 
-    del _locals
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, cls):
+        from psutil import _deprecated
+        _deprecated.install_process_methods(Process)
+        return Process.__dict__[self.name].__get__(obj, cls)
+
+
+# deprecated Process methods and their replacements; only those whose
+# replacement is available on this platform are defined
+_deprecated_process_methods = {
+    'get_children': 'children', 'get_connections': 'connections',
+    'get_cpu_affinity': 'cpu_affinity', 'set_cpu_affinity': 'cpu_affinity',
+    'get_cpu_percent': 'cpu_percent', 'get_cpu_times': 'cpu_times',
+    'getcwd': 'cwd', 'get_ext_memory_info': 'memory_info_ex',
+    'get_io_counters': 'io_counters', 'get_ionice': 'ionice',
+    'set_ionice': 'ionice', 'get_memory_info': 'memory_info',
+    'get_memory_maps': 'memory_maps', 'get_memory_percent': 'memory_percent',
+    'get_nice': 'nice', 'get_num_ctx_switches': 'num_ctx_switches',
+    'get_num_fds': 'num_fds', 'get_num_handles': 'num_handles',
+    'get_num_threads': 'num_threads', 'get_open_files': 'open_files',
+    'get_rlimit': 'rlimit', 'set_rlimit': 'rlimit',
+    'get_threads': 'threads', 'set_nice': 'nice',
+}
+
+for _name, _replacement in _deprecated_process_methods.items():
+    if hasattr(Process, _replacement):
+        setattr(Process, _name, _DeprecatedMethod(_name))
+del _name, _replacement
 
 
 class Popen(Process):
@@ -1108,10 +1290,12 @@ class Popen(Process):
         # Explicitly avoid to raise NoSuchProcess in case the process
         # spawned by subprocess.Popen terminates too quickly, see:
         # https://code.google.com/p/psutil/issues/detail?id=193
+        import subprocess
         self.__subproc = subprocess.Popen(*args, **kwargs)
         self._init(self.__subproc.pid, _ignore_nsp=True)
 
     def __dir__(self):
+        import subprocess
         return sorted(set(dir(Popen) + dir(subprocess.Popen)))
 
     def __getattribute__(self, name):
@@ -1125,6 +1309,658 @@ class Popen(Process):
                                      % (self.__class__.__name__, name))
 
 
+class ProcessTree(object):
+    """A snapshot of the system-wide process tree, mapping every
+    process to its parent and children.
+
+    The tree is refreshed incrementally: on refresh() only processes
+    which appeared or disappeared since the last refresh are read
+    (plus the orphans of the disappeared ones, which get reparented),
+    so that queries such as children() or total() cost
+    O(subtree) rather than O(all processes).
+
+    Process identity (PID + creation time) is checked for the
+    processes touched by a query; those whose PID has been reused
+    are dropped and picked up again on next refresh().
+
+      >>> import psutil
+      >>> tree = psutil.ProcessTree()
+      >>> tree.children(1)
+      [<psutil.Process(pid=312, name='systemd-journald') at ...>, ...]
+      >>> tree.total(1, 'memory_info')
+      pmem(rss=2316341248, vms=23417008128)
+      >>> tree.refresh()
+    """
+
+    def __init__(self):
+        self._procs = {}     # {pid: Process}
+        self._ppids = {}     # {pid: ppid}
+        self._children = defaultdict(set)   # {ppid: set([pid, ...])}
+        self.refresh()
+
+    def __contains__(self, pid):
+        return pid in self._procs
+
+    def __len__(self):
+        return len(self._procs)
+
+    def __iter__(self):
+        return iter(self._procs.values())
+
+    def _add(self, pid):
+        try:
+            if hasattr(_psplatform, 'ppid_ctime'):
+                # Linux: a single read of /proc/PID/stat
+                ppid, ctime = _psplatform.ppid_ctime(pid)
+                proc = _new_process(pid, ctime)
+            else:
+                proc = Process(pid)
+                ppid = proc.ppid()
+        except NoSuchProcess:
+            return
+        self._procs[pid] = proc
+        self._ppids[pid] = ppid
+        self._children[ppid].add(pid)
+
+    def _remove(self, pid):
+        del self._procs[pid]
+        ppid = self._ppids.pop(pid)
+        siblings = self._children[ppid]
+        siblings.discard(pid)
+        if not siblings:
+            del self._children[ppid]
+
+    def _check(self, pid):
+        """Return the Process instance for 'pid' if it is still
+        running, else remove it from the tree and return None.
+        """
+        proc = self._procs.get(pid)
+        if proc is not None and not proc.is_running():
+            self._remove(pid)
+            proc = None
+        return proc
+
+    def refresh(self):
+        """Update the tree reading only the processes which appeared
+        or disappeared since the last refresh.
+        """
+        current = set(pids())
+        known = set(self._procs)
+        orphans = set()
+        for pid in known - current:
+            self._remove(pid)
+            orphans.update(self._children.get(pid, ()))
+        # orphans got reparented (usually to init)
+        for pid in orphans:
+            if pid in self._procs:
+                proc = self._procs[pid]
+                self._remove(pid)
+                try:
+                    ppid = proc.ppid()
+                except NoSuchProcess:
+                    continue
+                self._procs[pid] = proc
+                self._ppids[pid] = ppid
+                self._children[ppid].add(pid)
+        for pid in current - known:
+            self._add(pid)
+
+    def parent(self, pid):
+        """Return the parent of 'pid' as a Process instance or None
+        if it is unknown.
+        """
+        if self._check(pid) is None:
+            return None
+        return self._check(self._ppids[pid])
+
+    def children(self, pid, recursive=False):
+        """Return the children of 'pid' as a list of Process
+        instances. If recursive is True return all its descendants.
+        """
+        ret = []
+        checkpids = [pid]
+        for ppid in checkpids:
+            for cpid in sorted(self._children.get(ppid, ())):
+                child = self._check(cpid)
+                if child is not None:
+                    ret.append(child)
+                    if recursive:
+                        checkpids.append(cpid)
+        return ret
+
+    def total(self, pid, attr):
+        """Return the sum of the Process method 'attr' (e.g.
+        'memory_info', 'cpu_times', 'num_threads', 'cpu_percent')
+        for 'pid' and all its descendants.
+        Namedtuples are summed field by field. Processes for which
+        the information is not accessible are not counted.
+        """
+        if attr not in _tree_totals:
+            raise ValueError("invalid attr name %r" % attr)
+        procs = self.children(pid, recursive=True)
+        proc = self._check(pid)
+        if proc is not None:
+            procs.insert(0, proc)
+        ret = None
+        for proc in procs:
+            try:
+                value = getattr(proc, attr)()
+            except (AccessDenied, NoSuchProcess):
+                continue
+            if ret is None:
+                ret = value
+            elif isinstance(value, tuple):
+                ret = value.__class__(*[a + b for a, b in zip(ret, value)])
+            else:
+                ret += value
+        return ret
+
+
+# Process methods which can be summed by ProcessTree.total()
+_tree_totals = set([
+    'cpu_percent', 'cpu_times', 'memory_info', 'memory_info_ex',
+    'memory_percent', 'io_counters', 'num_ctx_switches', 'num_fds',
+    'num_handles', 'num_threads'])
+
+
+class ProcessEvents(object):
+    """Subscribe to process lifecycle events.
+
+    Events are (event, pid, ppid, exitcode) namedtuples where 'event'
+    is one of PROC_EVENT_FORK (a new process was created),
+    PROC_EVENT_EXEC (a process executed a new program) or
+    PROC_EVENT_EXIT (a process terminated). 'exitcode' is only set
+    for exit events and has the same meaning as Process.wait()
+    return value.
+
+    On Linux events are delivered by the kernel through the netlink
+    process connector (root is required) so that even very short
+    lived processes are caught.
+    Elsewhere, or if the connector can't be used, PIDs are polled
+    every 'interval' seconds and diffed against the previous ones:
+    processes living less than that are missed, exec events are not
+    generated and exit codes are None.
+    'polling' attribute tells which one of the two is in use; pass
+    polling=True or False to force it.
+
+    While a connector-based subscriber is open process_iter() uses
+    it to keep its internal process table up to date instead of
+    listing all PIDs on every call. Events must be consumed as they
+    are kept in memory until read.
+
+      >>> import psutil
+      >>> events = psutil.ProcessEvents()
+      >>> for event in events:
+      ...     print(event)
+      ...
+      sprocevent(event='fork', pid=18302, ppid=1452, exitcode=None)
+      sprocevent(event='exec', pid=18302, ppid=1452, exitcode=None)
+      sprocevent(event='exit', pid=18302, ppid=1452, exitcode=0)
+    """
+
+    def __init__(self, interval=0.1, polling=None):
+        global _pmap_events
+        self.interval = interval
+        self._fd = None
+        self._queue = []
+        if not polling:
+            if not hasattr(_psplatform, "proc_connector_open"):
+                if polling is not None:
+                    raise NotImplementedError(
+                        "process connector not supported on this platform")
+            else:
+                try:
+                    self._fd = _psplatform.proc_connector_open()
+                except EnvironmentError:
+                    if polling is not None:
+                        raise
+        self.polling = self._fd is None
+        # {pid: ppid} of running processes; collected after having
+        # subscribed so that no process is missed
+        self._ppids = _ppid_map()
+        self._last_poll = time.time()
+        self._closed = False
+        # process_iter() may read events from any thread
+        self._lock = threading.Lock()
+        if not self.polling and _pmap_events is None:
+            _pmap_events = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            for event in self.read():
+                yield event
+
+    def fileno(self):
+        """Return the file descriptor which becomes readable when
+        events are available (can be used with select() & co.).
+        Raise ValueError if polling.
+        """
+        if self._fd is None:
+            raise ValueError("no file descriptor available when polling")
+        return self._fd
+
+    def read(self, timeout=None):
+        """Return the list of events occurred since the last call.
+        If none is available wait up to 'timeout' seconds for one
+        (forever if None); return an empty list on timeout.
+        """
+        if self._closed:
+            raise ValueError("ProcessEvents instance is closed")
+        if timeout is not None:
+            stop_at = time.time() + timeout
+        self._fetch(0)
+        while not self._queue:
+            if timeout is None:
+                self._fetch(None)
+            else:
+                timeleft = stop_at - time.time()
+                if timeleft <= 0:
+                    break
+                self._fetch(timeleft)
+        self._lock.acquire()
+        try:
+            ret = self._queue
+            self._queue = []
+        finally:
+            self._lock.release()
+        return ret
+
+    def close(self):
+        """Unsubscribe and release the underlying resources."""
+        global _pmap_events
+        self._lock.acquire()
+        try:
+            if self._closed:
+                return
+            self._closed = True
+            if _pmap_events is self:
+                _pmap_events = None
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        finally:
+            self._lock.release()
+
+    def _running_pids(self):
+        """Queue the available events without waiting and return the
+        set of running PIDs, or None if closed. Used by
+        process_iter().
+        """
+        self._lock.acquire()
+        try:
+            if self._closed:
+                return None
+            self._drain()
+            return set(self._ppids)
+        finally:
+            self._lock.release()
+
+    def _fetch(self, timeout):
+        """Wait up to 'timeout' seconds for new events and queue all
+        the available ones.
+        """
+        if self.polling:
+            delay = self._last_poll + self.interval - time.time()
+            if delay > 0:
+                if timeout is not None and timeout < delay:
+                    time.sleep(timeout)
+                    return
+                time.sleep(delay)
+            self._last_poll = time.time()
+            self._lock.acquire()
+            try:
+                self._diff()
+            finally:
+                self._lock.release()
+            return
+        # wait without holding the lock; another thread may read the
+        # events in the meantime, which is fine as they are queued
+        # into the same queue
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return
+        self._lock.acquire()
+        try:
+            if not self._closed:
+                self._drain()
+        finally:
+            self._lock.release()
+
+    def _drain(self):
+        """Queue the events which can be read without blocking.
+        Must be called with the lock held.
+        """
+        while select.select([self._fd], [], [], 0)[0]:
+            try:
+                rows = _psplatform.proc_connector_read(self._fd)
+            except EnvironmentError:
+                err = sys.exc_info()[1]
+                if err.errno != errno.ENOBUFS:
+                    raise
+                # the socket buffer overflowed and some events were
+                # lost; resynchronize by polling
+                self._diff()
+            else:
+                for what, pid, ppid, status in rows:
+                    self._apply(what, pid, ppid, status)
+
+    def _apply(self, what, pid, ppid, status):
+        exitcode = None
+        if what == PROC_EVENT_FORK:
+            self._ppids[pid] = ppid
+        elif what == PROC_EVENT_EXEC:
+            ppid = self._ppids.get(pid)
+        else:
+            ppid = self._ppids.pop(pid, None)
+            # same as Process.wait()
+            if os.WIFSIGNALED(status):
+                exitcode = os.WTERMSIG(status)
+            else:
+                exitcode = os.WEXITSTATUS(status)
+        self._queue.append(_nt_sys_procevent(what, pid, ppid, exitcode))
+
+    def _diff(self):
+        old = self._ppids
+        new = _ppid_map()
+        for pid in sorted([x for x in old if x not in new]):
+            self._queue.append(
+                _nt_sys_procevent(PROC_EVENT_EXIT, pid, old[pid], None))
+        for pid in sorted([x for x in new if x not in old]):
+            self._queue.append(
+                _nt_sys_procevent(PROC_EVENT_FORK, pid, new[pid], None))
+        self._ppids = new
+
+
+class ProcessCache(object):
+    """A table of Process instances indexed by PID, as used by
+    process_iter().
+
+    Getting the same instance for the same process every time keeps
+    its state between calls (e.g. cpu_percent() with no interval).
+    The identity (PID + creation time) of a cached instance is
+    verified again if it was last verified more than 'ttl' seconds
+    ago (on every access if 0); an instance whose PID has been
+    reused by another process is replaced by a new one. A higher
+    'ttl' saves reading the creation time of every process on every
+    iteration at the cost of possibly not noticing a reused PID for
+    up to 'ttl' seconds.
+
+    If 'maxsize' is not None no more than 'maxsize' instances are
+    kept: the least recently used ones are evicted first by get().
+    process_iter() instead never evicts an instance to make room for
+    another one, as a full scan would otherwise evict every instance
+    before it is used again: once the cache is full the remaining
+    processes are yielded as new, uncached instances (hence their
+    state, e.g. cpu_percent(), is not preserved between iterations).
+
+    process_iter() uses a module-wide cache; pass your own to
+    process_iter(cache=...) to keep instances private to a consumer,
+    bound memory usage or change the TTL:
+
+      >>> import psutil
+      >>> cache = psutil.ProcessCache(maxsize=1000, ttl=5)
+      >>> for p in psutil.process_iter(cache=cache):
+      ...     print(p.cpu_percent())
+      ...
+      >>> cache.get(1)
+      <psutil.Process(pid=1, name='systemd') at ...>
+    """
+
+    def __init__(self, maxsize=None, ttl=0):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be a positive integer (got %r)"
+                             % maxsize)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # {pid: [prev, next, proc, verified_at]}; links form a circular
+        # doubly linked list going from the least to the most recently
+        # used instance
+        self._links = {}
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None]
+
+    def __contains__(self, pid):
+        return pid in self._links
+
+    def __len__(self):
+        return len(self._links)
+
+    def __iter__(self):
+        # from the least to the most recently used
+        procs = []
+        root = self._root
+        link = root[1]
+        while link is not root:
+            procs.append(link[2])
+            link = link[1]
+        return iter(procs)
+
+    def _unlink(self, link):
+        link[0][1] = link[1]
+        link[1][0] = link[0]
+
+    def _append(self, link):
+        root = self._root
+        last = root[0]
+        link[0] = last
+        link[1] = root
+        last[1] = root[0] = link
+
+    def get(self, pid):
+        """Return the Process instance for 'pid', creating it if not
+        cached or if its PID has been reused.
+        Raise NoSuchProcess if the process does not exist.
+        """
+        return self._get(pid, True)
+
+    def _get(self, pid, evict):
+        # if 'evict' is False and the cache is full new instances are
+        # returned without being cached
+        link = self._links.get(pid)
+        if link is not None:
+            proc = link[2]
+            now = time.time()
+            if 0 <= now - link[3] < self.ttl:
+                running = True
+            else:
+                try:
+                    running = proc.is_running()
+                except AccessDenied:
+                    # Process creation time can't be determined hence
+                    # there's no way to tell whether the pid of the
+                    # cached process has been reused.
+                    running = True
+                link[3] = now
+            if running:
+                self._unlink(link)
+                self._append(link)
+                return proc
+            self.discard(pid)
+        proc = Process(pid)
+        if self.maxsize is not None and len(self._links) >= self.maxsize:
+            if not evict:
+                return proc
+            self.discard(self._root[1][2].pid)
+        link = [None, None, proc, time.time()]
+        self._append(link)
+        self._links[pid] = link
+        return proc
+
+    def discard(self, pid):
+        """Remove the instance for 'pid' from the cache, if any."""
+        link = self._links.pop(pid, None)
+        if link is not None:
+            self._unlink(link)
+
+    def clear(self):
+        """Remove all the instances from the cache."""
+        self._links.clear()
+        self._root[:] = [self._root, self._root, None, None]
+
+
+class Sampler(object):
+    """Sample several metrics sharing the same interval.
+
+    sample() takes one "before" snapshot of all the requested
+    metrics, sleeps once and takes one "after" snapshot, so that
+    collecting N rates costs one interval rather than N and all of
+    them refer to the same time frame:
+
+      >>> import psutil
+      >>> sampler = psutil.Sampler(percpu=True, disk=True, net=True,
+      ...                          procs=[os.getpid()])
+      >>> s = sampler.sample(interval=1)
+      >>> s.cpu_percent, s.per_cpu_percent
+      (3.1, [4.0, 2.0])
+      >>> s.net_io_rate.bytes_recv
+      1382.2
+      >>> s.procs_cpu_percent
+      {4817: 0.0}
+
+    Metrics are enabled by the constructor arguments:
+
+     - cpu: cpu_percent and cpu_times_percent
+     - percpu: per_cpu_percent and per_cpu_times_percent
+     - disk: disk_io_counters() deltas (disk_io) and per second rates
+       (disk_io_rate); perdisk=True returns dicts by disk
+     - net: same as above for net_io_counters() (net_io and
+       net_io_rate); pernic=True returns dicts by interface
+     - procs: a list of PIDs or Process instances; procs_cpu_percent
+       is a {pid: percent} dict (None if the process is gone or
+       access is denied), same as Process.cpu_percent()
+
+    Metrics which were not requested are None. 'elapsed' is the
+    time in seconds between the two snapshots.
+
+    If interval is 0.0 or None sample() compares against the
+    snapshot taken by the previous call, returning immediately.
+    """
+
+    def __init__(self, cpu=True, percpu=False, disk=False, net=False,
+                 procs=None, perdisk=False, pernic=False):
+        self.cpu = cpu
+        self.percpu = percpu
+        self.disk = disk
+        self.net = net
+        self.perdisk = perdisk
+        self.pernic = pernic
+        self.procs = []
+        for proc in procs or ():
+            if not isinstance(proc, Process):
+                proc = Process(proc)
+            self.procs.append(proc)
+        self._last = None
+
+    def _snapshot(self):
+        snap = {'timer': time.time()}
+        if self.cpu or self.procs:
+            snap['cpu'] = cpu_times()
+        if self.percpu:
+            snap['percpu'] = cpu_times(percpu=True)
+        if self.disk:
+            snap['disk'] = disk_io_counters(self.perdisk)
+        if self.net:
+            snap['net'] = net_io_counters(self.pernic)
+        if self.procs:
+            procs = snap['procs'] = {}
+            for proc in self.procs:
+                try:
+                    procs[proc.pid] = proc._proc.cpu_times()
+                except (NoSuchProcess, AccessDenied):
+                    procs[proc.pid] = None
+        return snap
+
+    def sample(self, interval=None):
+        """Return a ssample namedtuple with the utilization, deltas
+        and rates of the requested metrics over 'interval' seconds
+        (blocking) or since the last call if interval is 0.0 or None.
+        """
+        if interval is not None and interval > 0.0:
+            before = self._snapshot()
+            time.sleep(interval)
+            after = self._snapshot()
+        else:
+            after = self._snapshot()
+            before = self._last
+            if before is None:
+                # first call: meaningless zeroes as cpu_percent()
+                before = after
+        self._last = after
+        return self._compare(before, after)
+
+    def _compare(self, before, after):
+        elapsed = after['timer'] - before['timer']
+        cpu = cpu_fields = percpu = percpu_fields = None
+        disk_io = disk_io_rate = net_io = net_io_rate = procs = None
+        if self.cpu:
+            cpu = _cpu_busy_percent(before['cpu'], after['cpu'])
+            cpu_fields = _cpu_fields_percent(before['cpu'], after['cpu'])
+        if self.percpu:
+            pairs = list(zip(before['percpu'], after['percpu']))
+            percpu = [_cpu_busy_percent(t1, t2) for t1, t2 in pairs]
+            percpu_fields = [_cpu_fields_percent(t1, t2) for t1, t2 in pairs]
+        if self.disk:
+            disk_io, disk_io_rate = self._deltas(
+                before['disk'], after['disk'], elapsed)
+        if self.net:
+            net_io, net_io_rate = self._deltas(
+                before['net'], after['net'], elapsed)
+        if self.procs:
+            procs = {}
+            st1 = sum(before['cpu'])
+            st2 = sum(after['cpu'])
+            for pid, pt2 in after['procs'].items():
+                pt1 = before['procs'].get(pid)
+                if pt1 is None or pt2 is None:
+                    procs[pid] = None
+                else:
+                    procs[pid] = _proc_cpu_percent(pt1, pt2, st1, st2)
+        return _nt_sys_sample(elapsed, cpu, cpu_fields, percpu, percpu_fields,
+                              disk_io, disk_io_rate, net_io, net_io_rate,
+                              procs)
+
+    def _deltas(self, t1, t2, elapsed):
+        """Return a (deltas, rates) tuple of two I/O counters
+        namedtuples or dicts of namedtuples.
+        """
+        if t1 is None or t2 is None:
+            # e.g. no disks
+            return (None, None)
+        if isinstance(t2, dict):
+            deltas = {}
+            rates = {}
+            for name in t2:
+                if name in t1:
+                    deltas[name], rates[name] = self._deltas(
+                        t1[name], t2[name], elapsed)
+            return (deltas, rates)
+        nt = t2.__class__
+        deltas = [y - x for x, y in zip(t1, t2)]
+        if elapsed > 0:
+            rates = [x / elapsed for x in deltas]
+        else:
+            rates = [0.0] * len(deltas)
+        return (nt(*deltas), nt(*rates))
+
+
+def _ppid_map():
+    """Return a {pid: ppid} dict for all running processes."""
+    if hasattr(_psplatform, "ppid_map"):
+        return _psplatform.ppid_map()
+    ret = {}
+    for pid in pids():
+        try:
+            ret[pid] = Process(pid).ppid()
+        except (NoSuchProcess, AccessDenied):
+            pass
+    return ret
+
+
 # =====================================================================
 # --- system processes related functions
 # =====================================================================
@@ -1152,56 +1988,399 @@ def pid_exists(pid):
         return _psplatform.pid_exists(pid)
 
 
-_pmap = {}
+# the cache used by process_iter() by default
+_pmap = ProcessCache()
+# the ProcessEvents instance keeping _pmap up to date, if any
+_pmap_events = None
+
 
-def process_iter():
+def process_iter(attrs=None, ad_value=None, cache=None):
     """Return a generator yielding a Process instance for all
     running processes.
 
     Every new Process instance is only created once and then cached
     into an internal table which is updated every time this is used.
+    A ProcessCache instance can be passed as 'cache' to use a
+    separate table, possibly bounded in size or checking processes
+    identity less often.
 
     Cached Process instances are checked for identity so that you're
     safe in case a PID has been reused by another process, in which
     case the cached instance is updated.
 
+    If 'attrs' is not None the information of every process is read
+    in advance by as_dict(attrs, ad_value) (an empty list means all
+    attributes) and stored into an 'info' dict attribute of the
+    yielded instances; processes which disappear meanwhile are
+    skipped:
+
+      >>> import psutil
+      >>> for p in psutil.process_iter(['name', 'username']):
+      ...     print(p.pid, p.info['name'], p.info['username'])
+      ...
+
     The sorting order in which processes are yielded is based on
     their PIDs.
     """
-    def add(pid):
-        proc = Process(pid)
-        _pmap[proc.pid] = proc
-        return proc
+    if cache is None:
+        cache = _pmap
+    a = None
+    events = _pmap_events
+    if events is not None:
+        # new and gone processes are tracked by the process connector
+        a = events._running_pids()
+    if a is None:
+        a = set(pids())
+    for pid in [x for x in cache._links if x not in a]:
+        cache.discard(pid)
+    names = None
+    for pid in sorted(a):
+        try:
+            proc = cache._get(pid, False)
+            if attrs is not None:
+                # same as as_dict() but attribute names are only
+                # resolved once
+                if names is None:
+                    names = proc._as_dict_names(attrs)
+                proc.info = proc._as_dict(names, ad_value, bool(attrs))
+        except NoSuchProcess:
+            cache.discard(pid)
+            continue
+        yield proc
+
+
+# process_table() attributes requiring some logic on top of the
+# platform-specific Process implementation
+_table_getters = {
+    'pid': lambda proc: proc.pid,
+    'name': _proc_name,
+    'exe': _proc_exe,
+    'username': _proc_username,
+    'memory_percent': _proc_memory_percent,
+}
+# process_table() attributes whose platform-specific Process method
+# has a different name
+_table_methods = {
+    'nice': 'nice_get',
+    'ionice': 'ionice_get',
+    'cpu_affinity': 'cpu_affinity_get',
+}
+# read-only Process methods which can be fetched in bulk
+_table_attrs = set([
+    'ppid', 'cmdline', 'status', 'create_time', 'cwd', 'uids', 'gids',
+    'terminal', 'num_fds', 'num_handles', 'num_threads', 'num_ctx_switches',
+    'threads', 'cpu_times', 'memory_info', 'memory_info_ex', 'io_counters',
+    'open_files', 'connections'])
+_table_attrs.update(_table_getters)
+_table_attrs.update(_table_methods)
+
+
+def _get_table_getters(attrs):
+    """Return a list of functions which, given a platform-specific
+    Process instance, retrieve the process information in 'attrs'.
+    """
+    getters = []
+    for name in attrs:
+        if name in _table_getters:
+            getters.append(_table_getters[name])
+            continue
+        meth = _table_methods.get(name, name)
+        if name not in _table_attrs or not hasattr(_psplatform.Process, meth):
+            raise ValueError("invalid attr name %r" % name)
+        getters.append(getattr(_psplatform.Process, meth))
+    return getters
+
+
+# process_table(columnar=True) attributes returning a number
+_columnar_scalars = set([
+    'pid', 'ppid', 'create_time', 'num_fds', 'num_handles', 'num_threads',
+    'nice', 'memory_percent'])
+# process_table(columnar=True) attributes returning a namedtuple of
+# numbers; every field gets its own "attr.field" column
+_columnar_tuples = set([
+    'cpu_times', 'memory_info', 'memory_info_ex', 'io_counters',
+    'num_ctx_switches', 'uids', 'gids', 'ionice'])
+
+
+def _get_numpy():
+    """Return the numpy module or None if it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class _ProcessColumns(dict):
+    """The value returned by process_table(columnar=True): a dict
+    mapping column names to arrays of equal length, the 'pid' column
+    being the (sorted) key of each row.
+    The 'timer' attribute is the system-wide CPU time at sampling
+    time, used by cpu_percent().
+    """
 
-    def remove(pid):
-        _pmap.pop(pid, None)
+    timer = None
+
+    def cpu_percent(self, prev):
+        """Given a previous sample 'prev' return the CPU utilization
+        percentage of every process in this sample (same as
+        Process.cpu_percent()), as an array aligned to the 'pid'
+        column. Processes which were not in 'prev' (or whose pid
+        has been reused, if 'create_time' was sampled) get NaN.
+        Both samples must include the 'cpu_times' attribute.
+        """
+        for cols in (self, prev):
+            if 'cpu_times.user' not in cols:
+                raise ValueError("samples must include 'cpu_times' attr")
+        delta_time = self.timer - prev.timer
+        if delta_time <= 0:
+            # interval was too low
+            factor = 0.0
+        else:
+            factor = cpu_count() * 100 / delta_time
+        check_ctime = 'create_time' in self and 'create_time' in prev
+        pids2 = self['pid']
+        numpy = _get_numpy()
+        if numpy is not None and isinstance(pids2, numpy.ndarray):
+            pids1 = numpy.asarray(prev['pid'])
+            busy1 = numpy.asarray(prev['cpu_times.user']) + \
+                numpy.asarray(prev['cpu_times.system'])
+            busy2 = self['cpu_times.user'] + self['cpu_times.system']
+            if not len(pids1):
+                return numpy.full(len(pids2), _NAN)
+            idx = numpy.searchsorted(pids1, pids2)
+            idx[idx >= len(pids1)] = 0
+            match = pids1[idx] == pids2
+            if check_ctime:
+                match &= numpy.asarray(prev['create_time'])[idx] == \
+                    self['create_time']
+            ret = numpy.round((busy2 - busy1[idx]) * factor, 1)
+            ret[~match] = _NAN
+            return ret
+        # pure python: merge join of the two sorted pid columns
+        pids1 = prev['pid']
+        user1, sys1 = prev['cpu_times.user'], prev['cpu_times.system']
+        user2, sys2 = self['cpu_times.user'], self['cpu_times.system']
+        if check_ctime:
+            ctime1, ctime2 = prev['create_time'], self['create_time']
+        ret = _array.array('d', [_NAN]) * len(pids2)
+        i, size1 = 0, len(pids1)
+        for j in range(len(pids2)):
+            pid = pids2[j]
+            while i < size1 and pids1[i] < pid:
+                i += 1
+            if i == size1:
+                break
+            if pids1[i] != pid:
+                continue
+            if check_ctime and ctime1[i] != ctime2[j]:
+                continue
+            delta_proc = (user2[j] - user1[i]) + (sys2[j] - sys1[i])
+            ret[j] = round(delta_proc * factor, 1)
+        return ret
 
-    a = set(pids())
-    b = set(_pmap.keys())
-    new_pids = a - b
-    gone_pids = b - a
 
-    for pid in gone_pids:
-        remove(pid)
-    for pid, proc in sorted(list(_pmap.items()) +
-                            list(dict.fromkeys(new_pids).items())):
+def _process_columns(attrs, ad_value):
+    """process_table() implementation for columnar=True."""
+    getters = _get_table_getters(attrs)
+    for name in attrs:
+        if name not in _columnar_scalars and name not in _columnar_tuples:
+            raise ValueError("attr %r is not numeric and cannot be used "
+                             "in columnar mode" % name)
+    if ad_value is None:
+        ad_value = _NAN
+    timer = sum(cpu_times())
+    pidlist = sorted(pids())
+    size = len(pidlist)
+    pidcol = _array.array('l', pidlist)
+    # for each attr a list of preallocated columns, one per namedtuple
+    # field; namedtuple columns are allocated as soon as the first
+    # value (and hence its fields) is known
+    columns = []
+    fields = []
+    for name in attrs:
+        if name in _columnar_scalars:
+            columns.append([_array.array('d', [ad_value]) * size])
+        else:
+            columns.append(None)
+        fields.append(None)
+    count = 0
+    for pid in pidlist:
+        proc = _psplatform.Process(pid)
+        ctx = hasattr(proc, "oneshot_enter")
+        if ctx:
+            proc.oneshot_enter()
         try:
-            if proc is None:  # new process
-                yield add(pid)
-            else:
-                # use is_running() to check whether PID has been reused by
-                # another process in which case yield a new Process instance
-                if proc.is_running():
-                    yield proc
+            try:
+                for i in range(len(getters)):
+                    try:
+                        value = getters[i](proc)
+                    except AccessDenied:
+                        continue
+                    cols = columns[i]
+                    if cols is None:
+                        fields[i] = value._fields
+                        cols = columns[i] = \
+                            [_array.array('d', [ad_value]) * size
+                             for x in value]
+                    if fields[i] is None:
+                        cols[0][count] = value
+                    else:
+                        for j in range(len(value)):
+                            cols[j][count] = value[j]
+            except NoSuchProcess:
+                # wipe whatever was written for this row
+                for cols in columns:
+                    if cols is not None:
+                        for col in cols:
+                            col[count] = ad_value
+                continue
+            pidcol[count] = pid
+            count += 1
+        finally:
+            if ctx:
+                proc.oneshot_exit()
+
+    numpy = _get_numpy()
+    if numpy is not None:
+        convert = numpy.array
+    else:
+        convert = lambda x: x
+    ret = _ProcessColumns()
+    ret.timer = timer
+    for i in range(len(attrs)):
+        if columns[i] is None:
+            # value was never available
+            continue
+        if fields[i] is None:
+            names = [attrs[i]]
+        else:
+            names = ["%s.%s" % (attrs[i], x) for x in fields[i]]
+        for name, col in zip(names, columns[i]):
+            del col[count:]
+            ret[name] = convert(col)
+    del pidcol[count:]
+    ret['pid'] = convert(pidcol)
+    return ret
+
+
+def process_table(attrs, ad_value=None, columnar=False):
+    """Return information about all running processes as a list of
+    tuples in the form (pid, attr1, attr2, ...) where attr* are the
+    values of the Process methods listed in 'attrs'
+    (e.g. ['name', 'cpu_times']), sorted by pid.
+
+    Contrarily to process_iter() no Process instance is created and
+    cached: /proc (or the equivalent platform API) is walked once and
+    for every process only the information needed by 'attrs' is
+    retrieved, sharing the same reads as Process.oneshot() does.
+    This is considerably faster when sampling all processes
+    periodically, but note that process identity is not checked.
+
+    'ad_value' is the value which gets assigned in case AccessDenied
+    exception is raised when retrieving that particular information.
+    Processes which disappear in the meantime are skipped.
+
+    If 'columnar' is True the result is instead a dict mapping column
+    names to arrays (numpy arrays if numpy is installed, else
+    array.array), all aligned to the 'pid' column, with no
+    per-process object being returned.  Only numeric attrs are
+    allowed; namedtuples are split into one "attr.field" column per
+    field (e.g. 'memory_info.rss') and unavailable values are NaN
+    unless 'ad_value' is specified.  Attrs whose value could not be
+    retrieved for any process get no column.
+    The result has a cpu_percent(prev) method which computes the CPU
+    utilization of all processes against a previous sample at once.
+
+    >>> for pid, name, mem in psutil.process_table(
+    ...         ['name', 'memory_info']):
+    ...     print(pid, name, mem.rss)
+
+    >>> t1 = psutil.process_table(['cpu_times'], columnar=True)
+    >>> t2 = psutil.process_table(['cpu_times'], columnar=True)
+    >>> zip(t2['pid'], t2.cpu_percent(t1))
+    """
+    if columnar:
+        return _process_columns(attrs, ad_value)
+    getters = _get_table_getters(attrs)
+    ret = []
+    for pid in sorted(pids()):
+        proc = _psplatform.Process(pid)
+        ctx = hasattr(proc, "oneshot_enter")
+        if ctx:
+            proc.oneshot_enter()
+        try:
+            row = [pid]
+            try:
+                for getter in getters:
+                    try:
+                        row.append(getter(proc))
+                    except AccessDenied:
+                        row.append(ad_value)
+            except NoSuchProcess:
+                continue
+            ret.append(tuple(row))
+        finally:
+            if ctx:
+                proc.oneshot_exit()
+    return ret
+
+
+# Linux only
+if hasattr(_psplatform.Process, "memory_full_info"):
+
+    def memory_full_info_bulk(procs=None, ad_value=None, workers=4):
+        """Return a {proc: memory_full_info()} dict for 'procs', a
+        list of Process instances or PIDs (defaults to all running
+        processes), the keys being the list items.
+
+        USS and PSS are computed by the kernel walking the page
+        tables of every process, during which the GIL is released,
+        hence processes are split across a pool of 'workers' threads.
+
+        'ad_value' is the value which gets assigned in case
+        AccessDenied exception is raised. Processes which disappear
+        in the meantime are skipped.
+        """
+        if procs is None:
+            procs = pids()
+        todo = list(procs)
+        todo.reverse()
+        ret = {}
+        errors = []
+
+        def worker():
+            while not errors:
+                try:
+                    item = todo.pop()
+                except IndexError:
+                    return
+                if isinstance(item, Process):
+                    proc = item._proc
                 else:
-                    yield add(pid)
-        except NoSuchProcess:
-            remove(pid)
-        except AccessDenied:
-            # Process creation time can't be determined hence there's
-            # no way to tell whether the pid of the cached process
-            # has been reused. Just return the cached version.
-            yield proc
+                    proc = _psplatform.Process(item)
+                try:
+                    ret[item] = proc.memory_full_info()
+                except AccessDenied:
+                    ret[item] = ad_value
+                except NoSuchProcess:
+                    pass
+                except Exception:
+                    errors.append(sys.exc_info()[1])
+
+        threads = [threading.Thread(target=worker)
+                   for x in range(min(workers, len(todo)) - 1)]
+        for t in threads:
+            t.start()
+        # the calling thread works too
+        worker()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return ret
+
+    __all__.append("memory_full_info_bulk")
 
 
 def wait_procs(procs, timeout=None, callback=None):
@@ -1261,6 +2440,14 @@ def wait_procs(procs, timeout=None, callback=None):
     if timeout is not None:
         deadline = timer() + timeout
 
+    if hasattr(_psplatform, "poll_pidfds"):
+        alive = _wait_pidfds(alive, gone, timeout, callback)
+        if alive is None:
+            # pidfds not supported
+            alive = set(procs)
+        else:
+            return (list(gone), list(alive))
+
     while alive:
         if timeout is not None and timeout <= 0:
             break
@@ -1291,6 +2478,76 @@ def wait_procs(procs, timeout=None, callback=None):
     return (list(gone), list(alive))
 
 
+def wait_procs_async(procs, timeout=None, callback=None):
+    """Same as wait_procs() but return an asyncio future to be
+    awaited, without blocking the event loop:
+
+      >>> gone, alive = await wait_procs_async(procs, timeout=3)
+
+    Requires Python >= 3.5.
+    """
+    if timeout is not None and not timeout >= 0:
+        msg = "timeout must be a positive integer, got %s" % timeout
+        raise ValueError(msg)
+    if callback is not None and not callable(callback):
+        raise TypeError("callback %r is not a callable" % callback)
+    from psutil import _psasyncio
+    return _psasyncio.wait_procs(procs, timeout, callback)
+
+
+def _wait_pidfds(procs, gone, timeout, callback):
+    """wait_procs() implementation sleeping in a single poll() call
+    on one pidfd per process (Linux >= 5.3) rather than polling each
+    process in turn. Add the terminated processes to 'gone' and
+    return the alive ones or None if pidfds are not supported.
+    """
+    def on_gone(proc):
+        proc.returncode = _psplatform.reap_pid(proc.pid)
+        gone.add(proc)
+        if callback is not None:
+            callback(proc)
+
+    timer = getattr(time, 'monotonic', time.time)
+    fds = {}
+    dead = []
+    try:
+        for proc in procs:
+            try:
+                fds[_psplatform.pidfd_open(proc.pid)] = proc
+            except EnvironmentError:
+                err = sys.exc_info()[1]
+                if err.errno != errno.ESRCH:
+                    raise
+                dead.append(proc)
+    except EnvironmentError:
+        # e.g. ENOSYS (Linux < 5.3) or EMFILE
+        for fd in fds:
+            os.close(fd)
+        return None
+    for proc in dead:
+        on_gone(proc)
+
+    try:
+        if timeout is not None:
+            stop_at = timer() + timeout
+        while fds:
+            if timeout is None:
+                ready = _psplatform.poll_pidfds(fds)
+            else:
+                ready = _psplatform.poll_pidfds(
+                    fds, max(0, stop_at - timer()))
+            if not ready:
+                break
+            for fd in ready:
+                proc = fds.pop(fd)
+                os.close(fd)
+                on_gone(proc)
+    finally:
+        for fd in fds:
+            os.close(fd)
+    return set(fds.values())
+
+
 # =====================================================================
 # --- CPU related functions
 # =====================================================================
@@ -1343,8 +2600,142 @@ def cpu_times(percpu=False):
         return _psplatform.per_cpu_times()
 
 
-_last_cpu_times = cpu_times()
-_last_per_cpu_times = cpu_times(percpu=True)
+def _cpu_busy_percent(t1, t2):
+    """Return CPU utilization percentage between two cpu_times()."""
+    t1_all = sum(t1)
+    t1_busy = t1_all - t1.idle
+
+    t2_all = sum(t2)
+    t2_busy = t2_all - t2.idle
+
+    # this usually indicates a float precision issue
+    if t2_busy <= t1_busy:
+        return 0.0
+
+    busy_delta = t2_busy - t1_busy
+    all_delta = t2_all - t1_all
+    busy_perc = (busy_delta / all_delta) * 100
+    return round(busy_perc, 1)
+
+
+def _cpu_fields_percent(t1, t2):
+    """Return utilization percentage of every CPU time field between
+    two cpu_times().
+    """
+    nums = []
+    all_delta = sum(t2) - sum(t1)
+    for field in t1._fields:
+        field_delta = getattr(t2, field) - getattr(t1, field)
+        try:
+            field_perc = (100 * field_delta) / all_delta
+        except ZeroDivisionError:
+            field_perc = 0.0
+        field_perc = round(field_perc, 1)
+        if _WINDOWS:
+            # XXX
+            # Work around:
+            # https://code.google.com/p/psutil/issues/detail?id=392
+            # CPU times are always supposed to increase over time
+            # or at least remain the same and that's because time
+            # cannot go backwards.
+            # Surprisingly sometimes this might not be the case on
+            # Windows where 'system' CPU time can be smaller
+            # compared to the previous call, resulting in corrupted
+            # percentages (< 0 or > 100).
+            # I really don't know what to do about that except
+            # forcing the value to 0 or 100.
+            if field_perc > 100.0:
+                field_perc = 100.0
+            elif field_perc < 0.0:
+                field_perc = 0.0
+        nums.append(field_perc)
+    return _psplatform.scputimes(*nums)
+
+
+class CPUPercentTracker(object):
+    """Compute CPU utilization percentages since the last call in a
+    non-blocking fashion, same as cpu_percent() and
+    cpu_times_percent() with interval=None, but holding its own
+    baseline so that different consumers (e.g. two exporters)
+    don't corrupt each other's deltas:
+
+      >>> import psutil
+      >>> tracker = psutil.CPUPercentTracker()
+      >>> tracker.cpu_percent()
+      2.9
+      >>> tracker.cpu_times_percent(percpu=True)
+      [scputimes(user=2.0, ...), scputimes(user=1.0, ...)]
+
+    cpu_percent() and cpu_times_percent() keep separate baselines,
+    as do their percpu versions. An instance can be shared between
+    threads: CPU times are read without holding any lock and only
+    the baseline swap is serialized by a per-instance lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        times = self._sample(False)
+        per_times = self._sample(True)
+        self._last = {
+            (_cpu_busy_percent, False): times,
+            (_cpu_busy_percent, True): per_times,
+            (_cpu_fields_percent, False): times,
+            (_cpu_fields_percent, True): per_times,
+        }
+
+    def _sample(self, percpu):
+        times = cpu_times(percpu=percpu)
+        if percpu:
+            # sum of all CPU times is used as a clock
+            return (sum([sum(x) for x in times]), times)
+        return (sum(times), times)
+
+    def _compare(self, calculate, percpu):
+        key = (calculate, percpu)
+        clock2, t2 = sample = self._sample(percpu)
+        self._lock.acquire()
+        try:
+            clock1, t1 = self._last[key]
+            if clock2 >= clock1:
+                self._last[key] = sample
+            else:
+                # a concurrent call stored a more recent sample; treat
+                # this one as having a zero interval
+                t1 = t2
+        finally:
+            self._lock.release()
+        if percpu:
+            return [calculate(x, y) for x, y in zip(t1, t2)]
+        return calculate(t1, t2)
+
+    def cpu_percent(self, percpu=False):
+        """Same as psutil.cpu_percent(interval=None)."""
+        return self._compare(_cpu_busy_percent, percpu)
+
+    def cpu_times_percent(self, percpu=False):
+        """Same as psutil.cpu_times_percent(interval=None)."""
+        return self._compare(_cpu_fields_percent, percpu)
+
+
+# used by cpu_percent() and cpu_times_percent() when non-blocking;
+# created on first use so that CPU times are not read at import time
+_cpu_tracker = None
+_cpu_tracker_lock = threading.Lock()
+
+
+def _get_cpu_tracker():
+    global _cpu_tracker
+    tracker = _cpu_tracker
+    if tracker is None:
+        _cpu_tracker_lock.acquire()
+        try:
+            if _cpu_tracker is None:
+                _cpu_tracker = CPUPercentTracker()
+            tracker = _cpu_tracker
+        finally:
+            _cpu_tracker_lock.release()
+    return tracker
+
 
 def cpu_percent(interval=None, percpu=False):
     """Return a float representing the current system-wide CPU
@@ -1354,11 +2745,13 @@ def cpu_percent(interval=None, percpu=False):
     and after the interval (blocking).
 
     When interval is 0.0 or None compares system CPU times elapsed
-    since last call or module import, returning immediately (non
-    blocking). That means the first time this is called it will
-    return a meaningless 0.0 value which you should ignore.
+    since last call, returning immediately (non blocking).
+    That means the first time this is called it will return a
+    meaningless 0.0 value which you should ignore.
     In this case is recommended for accuracy that this function be
     called with at least 0.1 seconds between calls.
+    The last call is shared by the whole program: independent
+    callers should use their own CPUPercentTracker instance.
 
     When percpu is True returns a list of floats representing the
     utilization as a percentage for each CPU.
@@ -1381,54 +2774,20 @@ def cpu_percent(interval=None, percpu=False):
       2.9
       >>>
     """
-    global _last_cpu_times
-    global _last_per_cpu_times
     blocking = interval is not None and interval > 0.0
+    if not blocking:
+        return _get_cpu_tracker().cpu_percent(percpu)
+    return _cpu_percent_blocking(interval, percpu, _cpu_busy_percent)
 
-    def calculate(t1, t2):
-        t1_all = sum(t1)
-        t1_busy = t1_all - t1.idle
-
-        t2_all = sum(t2)
-        t2_busy = t2_all - t2.idle
 
-        # this usually indicates a float precision issue
-        if t2_busy <= t1_busy:
-            return 0.0
+def _cpu_percent_blocking(interval, percpu, calculate):
+    tot1 = cpu_times(percpu=percpu)
+    time.sleep(interval)
+    tot2 = cpu_times(percpu=percpu)
+    if percpu:
+        return [calculate(t1, t2) for t1, t2 in zip(tot1, tot2)]
+    return calculate(tot1, tot2)
 
-        busy_delta = t2_busy - t1_busy
-        all_delta = t2_all - t1_all
-        busy_perc = (busy_delta / all_delta) * 100
-        return round(busy_perc, 1)
-
-    # system-wide usage
-    if not percpu:
-        if blocking:
-            t1 = cpu_times()
-            time.sleep(interval)
-        else:
-            t1 = _last_cpu_times
-        _last_cpu_times = cpu_times()
-        return calculate(t1, _last_cpu_times)
-    # per-cpu usage
-    else:
-        ret = []
-        if blocking:
-            tot1 = cpu_times(percpu=True)
-            time.sleep(interval)
-        else:
-            tot1 = _last_per_cpu_times
-        _last_per_cpu_times = cpu_times(percpu=True)
-        for t1, t2 in zip(tot1, _last_per_cpu_times):
-            ret.append(calculate(t1, t2))
-        return ret
-
-
-# Use separate global vars for cpu_times_percent() so that it's
-# independent from cpu_percent() and they can both be used within
-# the same program.
-_last_cpu_times_2 = _last_cpu_times
-_last_per_cpu_times_2 = _last_per_cpu_times
 
 def cpu_times_percent(interval=None, percpu=False):
     """Same as cpu_percent() but provides utilization percentages
@@ -1443,61 +2802,105 @@ def cpu_times_percent(interval=None, percpu=False):
     interval and percpu arguments have the same meaning as in
     cpu_percent().
     """
-    global _last_cpu_times_2
-    global _last_per_cpu_times_2
     blocking = interval is not None and interval > 0.0
+    if not blocking:
+        return _get_cpu_tracker().cpu_times_percent(percpu)
+    return _cpu_percent_blocking(interval, percpu, _cpu_fields_percent)
 
-    def calculate(t1, t2):
-        nums = []
-        all_delta = sum(t2) - sum(t1)
-        for field in t1._fields:
-            field_delta = getattr(t2, field) - getattr(t1, field)
-            try:
-                field_perc = (100 * field_delta) / all_delta
-            except ZeroDivisionError:
-                field_perc = 0.0
-            field_perc = round(field_perc, 1)
-            if _WINDOWS:
-                # XXX
-                # Work around:
-                # https://code.google.com/p/psutil/issues/detail?id=392
-                # CPU times are always supposed to increase over time
-                # or at least remain the same and that's because time
-                # cannot go backwards.
-                # Surprisingly sometimes this might not be the case on
-                # Windows where 'system' CPU time can be smaller
-                # compared to the previous call, resulting in corrupted
-                # percentages (< 0 or > 100).
-                # I really don't know what to do about that except
-                # forcing the value to 0 or 100.
-                if field_perc > 100.0:
-                    field_perc = 100.0
-                elif field_perc < 0.0:
-                    field_perc = 0.0
-            nums.append(field_perc)
-        return _psplatform.scputimes(*nums)
-
-    # system-wide usage
-    if not percpu:
-        if blocking:
-            t1 = cpu_times()
-            time.sleep(interval)
-        else:
-            t1 = _last_cpu_times_2
-        _last_cpu_times_2 = cpu_times()
-        return calculate(t1, _last_cpu_times_2)
-    # per-cpu usage
+
+def _cpu_times_fields():
+    nt = _psplatform.scputimes
+    if nt is None:
+        # Linux: determined by the first cpu_times() call
+        nt = cpu_times().__class__
+    return nt._fields
+
+
+def _double_view(buf):
+    """Return a flat view of a buffer of doubles."""
+    try:
+        return memoryview(buf).cast('B').cast('d')
+    except (NameError, AttributeError):
+        # Python < 3.3
+        return buf
+
+
+def per_cpu_times_array(out=None):
+    """Return the times of every CPU as a flat array('d') of
+    ncpus x nfields floats, one CPU after another, fields being
+    the same as cpu_times() ones (cpu_times()._fields).
+
+    If 'out' is given it must be a writable buffer of doubles such
+    as an array('d') or a float64 numpy array (possibly 2D, e.g.
+    numpy.zeros((cpu_count(), len(cpu_times()._fields)))) which
+    gets filled in place and returned; unused items are set to 0.
+    On Linux this reads /proc/stat with no object being allocated,
+    which is meant for sampling many CPUs at high frequency:
+
+      >>> import psutil
+      >>> t1 = psutil.per_cpu_times_array()
+      >>> t2 = psutil.per_cpu_times_array()
+      >>> out = psutil.cpu_busy_percent_array(t1, t2)
+      >>> while True:
+      ...     time.sleep(0.1)
+      ...     t1, t2 = t2, psutil.per_cpu_times_array(t1)
+      ...     psutil.cpu_busy_percent_array(t1, t2, out)
+      ...
+    """
+    nfields = len(_cpu_times_fields())
+    if out is None:
+        times = cpu_times(percpu=True)
+        out = _array.array('d', [0.0]) * (len(times) * nfields)
+    elif hasattr(_psplatform, "per_cpu_times_into"):
+        _psplatform.per_cpu_times_into(out, nfields)
+        return out
     else:
-        ret = []
-        if blocking:
-            tot1 = cpu_times(percpu=True)
-            time.sleep(interval)
+        times = cpu_times(percpu=True)
+    view = _double_view(out)
+    if len(times) * nfields > len(view):
+        raise ValueError("buffer too small for all CPUs")
+    i = 0
+    for cpu in times:
+        for value in cpu:
+            view[i] = value
+            i += 1
+    for i in range(i, len(view)):
+        view[i] = 0.0
+    return out
+
+
+def cpu_busy_percent_array(t1, t2, out=None):
+    """Given two per_cpu_times_array() samples return the utilization
+    percentage of every CPU as an array('d'), same as
+    cpu_percent(percpu=True) but not rounded.
+    If 'out' is given it must be a writable buffer of doubles of
+    (at least) ncpus items which gets filled in place and returned.
+    """
+    fields = _cpu_times_fields()
+    nfields = len(fields)
+    idle = fields.index('idle')
+    if out is None:
+        out = _array.array('d', [0.0]) * (len(_double_view(t2)) // nfields)
+    if hasattr(_psplatform, "cpu_busy_percent_into"):
+        _psplatform.cpu_busy_percent_into(t1, t2, out, nfields, idle)
+        return out
+    t1 = _double_view(t1)
+    t2 = _double_view(t2)
+    view = _double_view(out)
+    ncpus = len(t2) // nfields
+    if len(t1) != len(t2) or len(view) < ncpus:
+        raise ValueError("buffers size mismatch")
+    for cpu in range(ncpus):
+        start = cpu * nfields
+        all1 = sum(t1[start:start + nfields])
+        all2 = sum(t2[start:start + nfields])
+        busy1 = all1 - t1[start + idle]
+        busy2 = all2 - t2[start + idle]
+        if busy2 <= busy1:
+            view[cpu] = 0.0
         else:
-            tot1 = _last_per_cpu_times_2
-        _last_per_cpu_times_2 = cpu_times(percpu=True)
-        for t1, t2 in zip(tot1, _last_per_cpu_times_2):
-            ret.append(calculate(t1, t2))
-        return ret
+            view[cpu] = (busy2 - busy1) / (all2 - all1) * 100
+    return out
 
 
 # =====================================================================
@@ -1668,93 +3071,194 @@ def net_io_counters(pernic=False):
         return _nt_sys_netio(*[sum(x) for x in zip(*rawdict.values())])
 
 
-# =====================================================================
-# --- other system related functions
-# =====================================================================
+def net_connections(kind='inet', raw=False):
+    """Return system-wide connections as a list of
+    (fd, family, type, laddr, raddr, status, pid) namedtuples.
+    In case of limited privileges 'fd' and 'pid' may be set to -1
+    and None respectively.
+    If 'raw' is True (Linux only) IP addresses are returned as
+    integers (e.g. 2130706433 instead of "127.0.0.1"), skipping
+    the formatting step, which is useful if addresses are not
+    needed or compared numerically.
+    The 'kind' parameter filters for connections that fit the
+    following criteria:
+
+    Kind Value      Connections using
+    inet            IPv4 and IPv6
+    inet4           IPv4
+    inet6           IPv6
+    tcp             TCP
+    tcp4            TCP over IPv4
+    tcp6            TCP over IPv6
+    udp             UDP
+    udp4            UDP over IPv4
+    udp6            UDP over IPv6
+    unix            UNIX socket (both UDP and TCP protocols)
+    all             the sum of all the possible families and protocols
+
+    On Linux every /proc/net/* table is parsed once and joined with
+    an inode -> pid map built from a single scan of /proc/*/fd.
+    On other platforms this is the sum of all Process.connections()
+    the current user has access to.
+    """
+    if hasattr(_psplatform, "net_connections"):
+        return _psplatform.net_connections(kind, raw)
+    if raw:
+        raise NotImplementedError("raw=True is not supported on this "
+                                  "platform")
+    ret = []
+    for p in process_iter():
+        try:
+            cons = p.connections(kind)
+        except (AccessDenied, NoSuchProcess):
+            continue
+        for conn in cons:
+            ret.append(_nt_sys_conn(*(tuple(conn) + (p.pid, ))))
+    return ret
 
-def boot_time():
-    """Return the system boot time expressed in seconds since the epoch.
-    This is also available as psutil.BOOT_TIME.
+
+def iter_net_connections(kind='inet', status=None, laddr_port=None,
+                         raw=False):
+    """Same as net_connections() but return a generator yielding
+    connections as they are found.
+    If 'status' is specified (a CONN_* constant or a sequence of
+    them) only connections in that status are returned.
+    If 'laddr_port' is specified only connections bound to that
+    local port are returned.
+    On Linux these filters are applied while parsing (TCP states
+    are even filtered by the kernel on Linux >= 3.3) and the
+    inode -> pid map is only built once a connection matches.
     """
-    # Note: we are not caching this because it is subject to
-    # system clock updates.
-    return _psplatform.boot_time()
+    status = _conn_status_filter(status)
+    if hasattr(_psplatform, "iter_net_connections"):
+        return _psplatform.iter_net_connections(kind, status, laddr_port,
+                                                raw)
+    return _filter_connections(net_connections(kind, raw), status,
+                               laddr_port)
 
 
-def users():
-    """Return users currently connected on the system as a list of
-    namedtuples including the following fields.
+def _conn_status_filter(status):
+    if status is None:
+        return None
+    if isinstance(status, str):
+        return frozenset([status])
+    return frozenset(status)
 
-     - user: the name of the user
-     - terminal: the tty or pseudo-tty associated with the user, if any.
-     - host: the host name associated with the entry, if any.
-     - started: the creation time as a floating point number expressed in
-       seconds since the epoch.
-    """
-    return _psplatform.users()
+
+def _filter_connections(conns, status, laddr_port):
+    for conn in conns:
+        if status is not None and conn.status not in status:
+            continue
+        if laddr_port is not None and (
+                not conn.laddr or not isinstance(conn.laddr, tuple) or
+                conn.laddr[1] != laddr_port):
+            continue
+        yield conn
 
 
 # =====================================================================
-# --- deprecated functions
+# --- asyncio collectors
 # =====================================================================
 
-@_deprecated(replacement="psutil.pids()")
-def get_pid_list():
-    return pids()
-
+# The functions below return an asyncio future (Python >= 3.5) and
+# collect information in a bounded thread pool, so that they can be
+# awaited without blocking the event loop. Calls issued within the
+# same event loop iteration are batched together:
+#
+#   >>> cpu, mem, net = await asyncio.gather(
+#   ...     psutil.cpu_times_async(),
+#   ...     psutil.virtual_memory_async(),
+#   ...     psutil.net_io_counters_async(pernic=True))
+
+def cpu_times_async(percpu=False):
+    """Same as cpu_times() but return an asyncio future."""
+    from psutil import _psasyncio
+    return _psasyncio.call(cpu_times, percpu)
+
+
+def cpu_percent_async(interval=None, percpu=False):
+    """Same as cpu_percent() but return an asyncio future; if
+    interval is > 0.0 the loop is not blocked while waiting.
+    """
+    from psutil import _psasyncio
+    if interval is not None and interval > 0.0:
+        return _psasyncio.cpu_percent(interval, percpu, _cpu_busy_percent)
+    return _psasyncio.call(cpu_percent, None, percpu)
 
-@_deprecated(replacement="list(process_iter())")
-def get_process_list():
-    return list(process_iter())
 
+def cpu_times_percent_async(interval=None, percpu=False):
+    """Same as cpu_times_percent() but return an asyncio future; if
+    interval is > 0.0 the loop is not blocked while waiting.
+    """
+    from psutil import _psasyncio
+    if interval is not None and interval > 0.0:
+        return _psasyncio.cpu_percent(interval, percpu, _cpu_fields_percent)
+    return _psasyncio.call(cpu_times_percent, None, percpu)
 
-@_deprecated(replacement="psutil.users()")
-def get_users():
-    return users()
 
+def virtual_memory_async():
+    """Same as virtual_memory() but return an asyncio future."""
+    from psutil import _psasyncio
+    return _psasyncio.call(virtual_memory)
 
-@_deprecated(replacement="psutil.virtual_memory()")
-def phymem_usage():
-    """Return the amount of total, used and free physical memory
-    on the system in bytes plus the percentage usage.
-    Deprecated; use psutil.virtual_memory() instead.
-    """
-    return virtual_memory()
 
+def disk_io_counters_async(perdisk=False):
+    """Same as disk_io_counters() but return an asyncio future."""
+    from psutil import _psasyncio
+    return _psasyncio.call(disk_io_counters, perdisk)
 
-@_deprecated(replacement="psutil.swap_memory()")
-def virtmem_usage():
-    return swap_memory()
 
+def net_io_counters_async(pernic=False):
+    """Same as net_io_counters() but return an asyncio future."""
+    from psutil import _psasyncio
+    return _psasyncio.call(net_io_counters, pernic)
 
-@_deprecated(replacement="psutil.phymem_usage().free")
-def avail_phymem():
-    return phymem_usage().free
 
+def process_table_async(attrs, ad_value=None, columnar=False):
+    """Same as process_table() but return an asyncio future."""
+    from psutil import _psasyncio
+    return _psasyncio.call(process_table, attrs, ad_value, columnar)
 
-@_deprecated(replacement="psutil.phymem_usage().used")
-def used_phymem():
-    return phymem_usage().used
 
+# =====================================================================
+# --- other system related functions
+# =====================================================================
 
-@_deprecated(replacement="psutil.virtmem_usage().total")
-def total_virtmem():
-    return virtmem_usage().total
+def boot_time():
+    """Return the system boot time expressed in seconds since the epoch.
+    This is also available as psutil.BOOT_TIME.
+    """
+    # Note: we are not caching this because it is subject to
+    # system clock updates.
+    return _psplatform.boot_time()
 
 
-@_deprecated(replacement="psutil.virtmem_usage().used")
-def used_virtmem():
-    return virtmem_usage().used
+def users():
+    """Return users currently connected on the system as a list of
+    namedtuples including the following fields.
 
+     - user: the name of the user
+     - terminal: the tty or pseudo-tty associated with the user, if any.
+     - host: the host name associated with the entry, if any.
+     - started: the creation time as a floating point number expressed in
+       seconds since the epoch.
+    """
+    return _psplatform.users()
 
-@_deprecated(replacement="psutil.virtmem_usage().free")
-def avail_virtmem():
-    return virtmem_usage().free
 
+# Linux only
+if hasattr(_psplatform, "keep_procfs_open"):
 
-@_deprecated(replacement="psutil.net_io_counters()")
-def network_io_counters(pernic=False):
-    return net_io_counters(pernic)
+    def keep_procfs_open(enabled=True):
+        """Keep the procfs files read by cpu_times(), cpu_percent(),
+        virtual_memory(), swap_memory(), boot_time(),
+        net_io_counters() and disk_io_counters() open after the
+        first call and read them again with pread() from then on,
+        saving the open() and close() system calls when sampling
+        them repeatedly. Pass False to close them.
+        Available on Linux only.
+        """
+        _psplatform.keep_procfs_open(enabled)
 
 
 def test():
@@ -1821,44 +3325,56 @@ def test():
                             pinfo['name'].strip() or '?'))
 
 
-def _replace_module():
-    """Dirty hack to replace the module object in order to access
-    deprecated module constants, see:
-    http://www.dr-josiah.com/2013/12/properties-on-python-modules.html
-    """
-    class ModuleWrapper(object):
-
-        def __repr__(self):
-            return repr(self._module)
-        __str__ = __repr__
-
-        @property
-        def NUM_CPUS(self):
-            msg = "NUM_CPUS constant is deprecated; use cpu_count() instead"
-            warnings.warn(msg, category=DeprecationWarning, stacklevel=2)
-            return cpu_count()
-
-        @property
-        def BOOT_TIME(self):
-            msg = "BOOT_TIME constant is deprecated; use boot_time() instead"
-            warnings.warn(msg, category=DeprecationWarning, stacklevel=2)
-            return boot_time()
-
-        @property
-        def TOTAL_PHYMEM(self):
-            msg = "TOTAL_PHYMEM constant is deprecated; " \
-                  "use virtual_memory().total instead"
-            warnings.warn(msg, category=DeprecationWarning, stacklevel=2)
-            return virtual_memory().total
-
-    mod = ModuleWrapper()
-    mod.__dict__ = globals()
-    mod._module = sys.modules[__name__]
-    sys.modules[__name__] = mod
-
-
-_replace_module()
-del property, cached_property, memoize, division, _replace_module
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        # deprecated APIs are loaded on first use, see _deprecated.py
+        if not name.startswith('_'):
+            from psutil import _deprecated
+            try:
+                return _deprecated.module_getattr(name)
+            except AttributeError:
+                pass
+        raise AttributeError("module %r has no attribute %r"
+                             % (__name__, name))
+
+else:
+    def _replace_module():
+        """Dirty hack to replace the module object in order to access
+        deprecated module constants, see:
+        http://www.dr-josiah.com/2013/12/properties-on-python-modules.html
+        """
+        class ModuleWrapper(object):
+
+            def __repr__(self):
+                return repr(self._module)
+            __str__ = __repr__
+
+            @property
+            def NUM_CPUS(self):
+                return _deprecated.constant('NUM_CPUS', stacklevel=3)
+
+            @property
+            def BOOT_TIME(self):
+                return _deprecated.constant('BOOT_TIME', stacklevel=3)
+
+            @property
+            def TOTAL_PHYMEM(self):
+                return _deprecated.constant('TOTAL_PHYMEM', stacklevel=3)
+
+        mod = ModuleWrapper()
+        mod.__dict__ = globals()
+        mod._module = sys.modules[__name__]
+        sys.modules[__name__] = mod
+
+    # no module __getattr__: load deprecated APIs now
+    from psutil import _deprecated
+    for _name in _deprecated.functions + _deprecated.platform_functions:
+        globals()[_name] = _deprecated.module_getattr(_name)
+    _deprecated.install_process_methods(Process)
+    _replace_module()
+    del _name, _replace_module
+
+del property, cached_property, memoize, division
 if sys.version_info < (3, 0):
     del num
 
@@ -53,6 +53,10 @@ CONN_LISTEN = "LISTEN"
 CONN_CLOSING = "CLOSING"
 CONN_NONE = "NONE"
 
+PROC_EVENT_FORK = "fork"
+PROC_EVENT_EXEC = "exec"
+PROC_EVENT_EXIT = "exit"
+
 
 # --- functions
 
@@ -109,6 +113,61 @@ def memoize(fun):
     return wrapper
 
 
+def memoize_when_activated(fun):
+    """A memoize decorator which is disabled by default. It can be
+    activated and deactivated on request for a given instance.
+    Meant to be used on methods taking no arguments; the cache is
+    stored in the instance "_cache" attribute which exists only
+    while the cache is active:
+
+    >>> class Foo:
+    ...     @memoize_when_activated
+    ...     def foo(self):
+    ...         print(1)
+    ...
+    >>> f = Foo()
+    >>> # deactivated (default)
+    >>> f.foo()
+    1
+    >>> f.foo()
+    1
+    >>>
+    >>> # activated
+    >>> Foo.foo.cache_activate(f)
+    >>> f.foo()
+    1
+    >>> f.foo()
+    >>>
+    """
+    @wraps(fun)
+    def wrapper(self):
+        try:
+            cache = self._cache
+        except AttributeError:
+            # cache is not active
+            return fun(self)
+        try:
+            return cache[fun]
+        except KeyError:
+            ret = cache[fun] = fun(self)
+            return ret
+
+    def cache_activate(obj):
+        """Activate cache for the given instance."""
+        obj._cache = {}
+
+    def cache_deactivate(obj):
+        """Deactivate and clear cache for the given instance."""
+        try:
+            del obj._cache
+        except AttributeError:
+            pass
+
+    wrapper.cache_activate = cache_activate
+    wrapper.cache_deactivate = cache_deactivate
+    return wrapper
+
+
 # http://code.activestate.com/recipes/576563-cached-property/
 # Credits: Ken Seeho
 def cached_property(fun):
@@ -226,6 +285,17 @@ snetio = namedtuple('snetio', ['bytes_sent', 'bytes_recv',
                                'dropin', 'dropout'])
 # psutil.users()
 suser = namedtuple('suser', ['name', 'terminal', 'host', 'started'])
+# psutil.net_connections()
+sconn = namedtuple('sconn', ['fd', 'family', 'type', 'laddr', 'raddr',
+                             'status', 'pid'])
+# psutil.Sampler.sample()
+ssample = namedtuple('ssample', ['elapsed', 'cpu_percent', 'cpu_times_percent',
+                                 'per_cpu_percent', 'per_cpu_times_percent',
+                                 'disk_io', 'disk_io_rate',
+                                 'net_io', 'net_io_rate',
+                                 'procs_cpu_percent'])
+# psutil.ProcessEvents
+sprocevent = namedtuple('sprocevent', ['event', 'pid', 'ppid', 'exitcode'])
 
 
 # --- namedtuples for psutil.Process methods
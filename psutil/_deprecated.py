@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2009, Giampaolo Rodola'. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Deprecated APIs.
+
+This module is imported on first use of a deprecated name: on
+Python >= 3.7 by psutil module __getattr__ (module functions and
+NUM_CPUS, BOOT_TIME and TOTAL_PHYMEM constants), on older Python
+versions at the end of psutil import. Deprecated Process methods
+are defined as placeholders in psutil module and replaced by the
+actual methods on first access.
+"""
+
+import warnings
+
+import psutil
+from psutil._common import deprecated, deprecated_method
+
+
+# =====================================================================
+# --- deprecated functions
+# =====================================================================
+
+@deprecated(replacement="psutil.pids()")
+def get_pid_list():
+    return psutil.pids()
+
+
+@deprecated(replacement="list(process_iter())")
+def get_process_list():
+    return list(psutil.process_iter())
+
+
+@deprecated(replacement="psutil.users()")
+def get_users():
+    return psutil.users()
+
+
+@deprecated(replacement="psutil.virtual_memory()")
+def phymem_usage():
+    """Return the amount of total, used and free physical memory
+    on the system in bytes plus the percentage usage.
+    Deprecated; use psutil.virtual_memory() instead.
+    """
+    return psutil.virtual_memory()
+
+
+@deprecated(replacement="psutil.swap_memory()")
+def virtmem_usage():
+    return psutil.swap_memory()
+
+
+@deprecated(replacement="psutil.phymem_usage().free")
+def avail_phymem():
+    return psutil.virtual_memory().free
+
+
+@deprecated(replacement="psutil.phymem_usage().used")
+def used_phymem():
+    return psutil.virtual_memory().used
+
+
+@deprecated(replacement="psutil.virtmem_usage().total")
+def total_virtmem():
+    return psutil.swap_memory().total
+
+
+@deprecated(replacement="psutil.virtmem_usage().used")
+def used_virtmem():
+    return psutil.swap_memory().used
+
+
+@deprecated(replacement="psutil.virtmem_usage().free")
+def avail_virtmem():
+    return psutil.swap_memory().free
+
+
+@deprecated(replacement="psutil.net_io_counters()")
+def network_io_counters(pernic=False):
+    return psutil.net_io_counters(pernic)
+
+
+functions = ['get_pid_list', 'get_process_list', 'get_users', 'phymem_usage',
+             'virtmem_usage', 'avail_phymem', 'used_phymem', 'total_virtmem',
+             'used_virtmem', 'avail_virtmem', 'network_io_counters']
+
+# defined by psutil._ps<platform> modules
+platform_functions = [x for x in ('phymem_buffers', 'cached_phymem')
+                      if hasattr(psutil._psplatform, x)]
+
+
+# =====================================================================
+# --- deprecated constants
+# =====================================================================
+
+constants = {
+    'NUM_CPUS': 'cpu_count()',
+    'BOOT_TIME': 'boot_time()',
+    'TOTAL_PHYMEM': 'virtual_memory().total',
+}
+
+
+def constant(name, stacklevel=2):
+    """Return the value of deprecated constant psutil.<name>."""
+    msg = "%s constant is deprecated; use %s instead" % (
+        name, constants[name])
+    warnings.warn(msg, category=DeprecationWarning, stacklevel=stacklevel)
+    if name == 'NUM_CPUS':
+        return psutil.cpu_count()
+    elif name == 'BOOT_TIME':
+        return psutil.boot_time()
+    else:
+        return psutil.virtual_memory().total
+
+
+def module_getattr(name):
+    """Return the value of deprecated psutil.<name> or raise
+    AttributeError.
+    """
+    if name in constants:
+        # caller -> psutil.__getattr__ -> module_getattr -> constant
+        return constant(name, stacklevel=4)
+    if name in functions:
+        return globals()[name]
+    # platform specific, e.g. phymem_buffers() on Linux
+    if name in platform_functions:
+        return getattr(psutil._psplatform, name)
+    raise AttributeError(name)
+
+
+# =====================================================================
+# --- deprecated Process methods
+# =====================================================================
+
+_installed = set()
+
+
+def install_process_methods(cls):
+    """Replace the placeholders of deprecated methods of Process class
+    'cls' with the actual methods. Return False if they were already
+    replaced.
+    """
+    if cls in _installed:
+        return False
+    # only add the methods whose replacement is available on this
+    # platform
+    for name, replacement in psutil._deprecated_process_methods.items():
+        if hasattr(cls, replacement):
+            def method(self, *args, **kwargs):
+                pass
+            method.__name__ = name
+            setattr(cls, name, deprecated_method(replacement)(method))
+    _installed.add(cls)
+    return True
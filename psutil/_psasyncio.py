@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2009, Giampaolo Rodola'. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""asyncio integration (Python >= 3.5).
+
+Waiting for processes to terminate is done by registering exit
+notifications on the event loop: a pidfd reader on Linux >= 5.3,
+else a timer callback checking the process with exponential
+backoff. Neither threads nor sleeps are involved.
+
+System information is collected in a bounded thread pool. Calls
+issued within the same event loop iteration (e.g. passed to
+asyncio.gather()) are batched and executed by a single worker
+thread, so that sampling many metrics costs one thread hop.
+
+This module must not use the async / await syntax as psutil
+package is also byte-compiled on Python 2.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
+
+import psutil
+from psutil._error import TimeoutExpired
+
+
+# maximum number of threads used to collect system information
+MAX_WORKERS = 4
+
+_executor = None
+_lock = threading.Lock()
+# {loop: [(future, fun, args, kwargs), ...]} calls not submitted yet
+_batches = {}
+
+
+def _get_executor():
+    global _executor
+    _lock.acquire()
+    try:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(MAX_WORKERS)
+        return _executor
+    finally:
+        _lock.release()
+
+
+def call(fun, *args, **kwargs):
+    """Return a future whose result is fun(*args, **kwargs) executed
+    in the thread pool.
+    """
+    loop = _get_loop(None)
+    future = loop.create_future()
+    batch = _batches.get(loop)
+    if batch is None:
+        batch = _batches[loop] = []
+        loop.call_soon(_submit_batch, loop)
+    batch.append((future, fun, args, kwargs))
+    return future
+
+
+def _submit_batch(loop):
+    batch = _batches.pop(loop)
+    _get_executor().submit(_run_batch, loop, batch)
+
+
+def _run_batch(loop, batch):
+    # executed in a worker thread
+    results = []
+    for future, fun, args, kwargs in batch:
+        if future.cancelled():
+            continue
+        try:
+            results.append((future, fun(*args, **kwargs), None))
+        except Exception:
+            results.append((future, None, sys.exc_info()[1]))
+    try:
+        loop.call_soon_threadsafe(_set_results, results)
+    except RuntimeError:
+        # loop closed in the meantime
+        pass
+
+
+def _set_results(results):
+    for future, ret, exc in results:
+        if future.done():
+            continue
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(ret)
+
+
+def cpu_percent(interval, percpu, calculate):
+    """Return a future whose result is the CPU utilization between
+    now and 'interval' seconds from now, as computed by
+    'calculate(t1, t2)' on two cpu_times() samples.
+    """
+    loop = _get_loop(None)
+    future = loop.create_future()
+
+    def fail(f):
+        if f.exception() is not None:
+            future.set_exception(f.exception())
+            return True
+        return False
+
+    def on_t1(f):
+        if future.done() or fail(f):
+            return
+        handle = loop.call_later(interval, sample_t2, f.result())
+        future.add_done_callback(lambda x: handle.cancel())
+
+    def sample_t2(t1):
+        if not future.done():
+            call(psutil.cpu_times, percpu=percpu).add_done_callback(
+                lambda f: on_t2(t1, f))
+
+    def on_t2(t1, f):
+        if future.done() or fail(f):
+            return
+        t2 = f.result()
+        if percpu:
+            future.set_result([calculate(x, y) for x, y in zip(t1, t2)])
+        else:
+            future.set_result(calculate(t1, t2))
+
+    call(psutil.cpu_times, percpu=percpu).add_done_callback(on_t1)
+    return future
+
+
+class _ProcessWaiter(object):
+    """Wait for a Process to terminate setting the result of
+    'future' to its exit code.
+    """
+
+    def __init__(self, proc, future, loop):
+        self.proc = proc
+        self.future = future
+        self.loop = loop
+        self._fd = None
+        self._handle = None
+        self._delay = 0.0001
+        future.add_done_callback(self._cleanup)
+        platform = psutil._psplatform
+        if hasattr(platform, "pidfd_open"):
+            try:
+                self._fd = platform.pidfd_open(proc.pid)
+            except EnvironmentError:
+                # ESRCH (already gone) or ENOSYS (Linux < 5.3)
+                pass
+        if self._fd is not None:
+            self.loop.add_reader(self._fd, self._on_readable)
+        else:
+            self._poll()
+
+    def _on_readable(self):
+        if self.future.done():
+            return
+        try:
+            ret = psutil._psplatform.reap_pid(self.proc.pid)
+        except Exception:
+            self.future.set_exception(sys.exc_info()[1])
+        else:
+            self.future.set_result(ret)
+
+    def _poll(self):
+        self._handle = None
+        if self.future.done():
+            return
+        try:
+            ret = self.proc._proc.wait(0)
+        except TimeoutExpired:
+            # same backoff as _psposix.wait_pid()
+            self._handle = self.loop.call_later(self._delay, self._poll)
+            self._delay = min(self._delay * 2, 0.04)
+        except Exception:
+            self.future.set_exception(sys.exc_info()[1])
+        else:
+            self.future.set_result(ret)
+
+    def _cleanup(self, future):
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+
+def _get_loop(loop):
+    if loop is not None:
+        return loop
+    try:
+        return asyncio.get_running_loop()
+    except (AttributeError, RuntimeError):
+        # Python < 3.7 or called outside of a coroutine
+        return asyncio.get_event_loop()
+
+
+def wait(proc, timeout=None, loop=None):
+    """Return a future whose result is the exit code of 'proc' as
+    returned by Process.wait(). On timeout the future raises
+    TimeoutExpired.
+    """
+    loop = _get_loop(loop)
+    future = loop.create_future()
+    _ProcessWaiter(proc, future, loop)
+    if timeout is not None:
+        def on_timeout():
+            if not future.done():
+                future.set_exception(
+                    TimeoutExpired(timeout, proc.pid, proc._name))
+
+        handle = loop.call_later(timeout, on_timeout)
+        future.add_done_callback(lambda f: handle.cancel())
+    return future
+
+
+def wait_procs(procs, timeout=None, callback=None, loop=None):
+    """Return a future whose result is a (gone, alive) tuple, same as
+    psutil.wait_procs(). The future is done as soon as all processes
+    have terminated or on timeout.
+    """
+    loop = _get_loop(loop)
+    future = loop.create_future()
+    gone = []
+    waiters = {}
+
+    def finish():
+        if future.done():
+            return
+        alive = [x for x in procs if x not in gone]
+        for proc in alive:
+            waiters[proc].cancel()
+        future.set_result((gone, alive))
+
+    def on_gone(proc, f):
+        if f.cancelled() or future.done():
+            return
+        if f.exception() is not None:
+            for x in waiters.values():
+                x.cancel()
+            future.set_exception(f.exception())
+            return
+        proc.returncode = f.result()
+        gone.append(proc)
+        if callback is not None:
+            try:
+                callback(proc)
+            except Exception:
+                for x in waiters.values():
+                    x.cancel()
+                future.set_exception(sys.exc_info()[1])
+                return
+        if len(gone) == len(procs):
+            finish()
+
+    procs = list(procs)
+    if not procs:
+        future.set_result(([], []))
+        return future
+    for proc in procs:
+        waiters[proc] = wait(proc, loop=loop)
+    for proc in procs:
+        waiters[proc].add_done_callback(
+            lambda f, proc=proc: on_gone(proc, f))
+    if timeout is not None:
+        handle = loop.call_later(timeout, finish)
+        future.add_done_callback(lambda f: handle.cancel())
+
+    def on_done(f):
+        # e.g. the caller's task got cancelled
+        if f.cancelled():
+            for x in waiters.values():
+                x.cancel()
+
+    future.add_done_callback(on_done)
+    return future
@@ -12,14 +12,21 @@ import base64
 import errno
 import os
 import re
+import select
 import socket
 import struct
 import sys
+import time
 import warnings
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
 
 from psutil import _common
 from psutil import _psposix
-from psutil._common import (isfile_strict, usage_percent, deprecated)
+from psutil._common import (isfile_strict, usage_percent, deprecated,
+                            memoize, memoize_when_activated)
 from psutil._compat import PY3, xrange, namedtuple, wraps
 from psutil._error import AccessDenied, NoSuchProcess, TimeoutExpired
 import _psutil_linux as cext
@@ -35,7 +42,7 @@ __extra__all__ = [
     "CONN_FIN_WAIT2", "CONN_TIME_WAIT", "CONN_CLOSE", "CONN_CLOSE_WAIT",
     "CONN_LAST_ACK", "CONN_LISTEN", "CONN_CLOSING",
     # other
-    "phymem_buffers", "cached_phymem"]
+    "phymem_buffers", "cached_phymem", "keep_procfs_open"]
 
 
 # --- constants
@@ -87,23 +94,32 @@ TCP_STATUSES = {
     "0A": _common.CONN_LISTEN,
     "0B": _common.CONN_CLOSING
 }
+# {CONN_*: TCP state number} as used by NETLINK_SOCK_DIAG
+TCP_STATES = dict([(v, int(k, 16)) for k, v in TCP_STATUSES.items()])
+# NETLINK_SOCK_DIAG states mask matching all the TCP states above;
+# higher bits select sockets /proc/net/* files don't list (e.g.
+# TCP_BOUND_INACTIVE, bound but not listening sockets)
+_NETLINK_ALL_STATES = 0
+for _x in TCP_STATES.values():
+    _NETLINK_ALL_STATES |= 1 << _x
+del _x
+# errors meaning NETLINK_SOCK_DIAG can't be used for a certain
+# family / protocol
+_NETLINK_UNSUPPORTED = (errno.ENOENT, errno.EPROTONOSUPPORT,
+                        errno.EAFNOSUPPORT, errno.EOPNOTSUPP,
+                        errno.EPERM, errno.EACCES)
 
 
 # --- named tuples
 
-def _get_cputimes_fields():
+def _get_cputimes_fields(vlen):
     """Return a namedtuple of variable fields depending on the
     CPU times available on this Linux kernel version which may be:
     (user, nice, system, idle, iowait, irq, softirq, [steal, [guest,
      [guest_nice]]])
+    'vlen' is the number of values of a "cpu" line of /proc/stat.
     """
-    f = open('/proc/stat', 'r')
-    try:
-        values = f.readline().split()[1:]
-    finally:
-        f.close()
     fields = ['user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq']
-    vlen = len(values)
     if vlen >= 8:
         # Linux >= 2.6.11
         fields.append('steal')
@@ -116,7 +132,19 @@ def _get_cputimes_fields():
     return fields
 
 
-scputimes = namedtuple('scputimes', _get_cputimes_fields())
+# set on first use by _get_scputimes() so that /proc/stat is not read
+# at import time
+scputimes = None
+
+
+def _get_scputimes(values):
+    """Return the scputimes namedtuple class given the values of a
+    "cpu" line of /proc/stat, creating it on first use.
+    """
+    global scputimes
+    if scputimes is None:
+        scputimes = namedtuple('scputimes', _get_cputimes_fields(len(values)))
+    return scputimes
 
 svmem = namedtuple(
     'svmem', ['total', 'available', 'percent', 'used', 'free',
@@ -132,34 +160,135 @@ pmmap_grouped = namedtuple(
 pmmap_ext = namedtuple(
     'pmmap_ext', 'addr perms ' + ' '.join(pmmap_grouped._fields))
 
+pfullmem = namedtuple('pfullmem', pextmem._fields + ('uss', 'pss', 'swap'))
+
+# Process methods create namedtuples with tuple.__new__(cls, values),
+# which is about twice as fast as calling cls(*values) as it skips
+# namedtuple's __new__ written in Python
+_tuple_new = tuple.__new__
+
+
+# --- procfs files
+
+if hasattr(os, "pread"):
+    _pread = os.pread
+else:
+    # Python < 3.3
+    _pread_lock = threading.Lock()
+
+    def _pread(fd, size, offset):
+        _pread_lock.acquire()
+        try:
+            os.lseek(fd, offset, 0)
+            return os.read(fd, size)
+        finally:
+            _pread_lock.release()
+
+_EMPTY = ''.encode('ascii')
+_O_FLAGS = os.O_RDONLY | getattr(os, "O_CLOEXEC", 0)
+
+
+def _read_procfs(path, fd=-1):
+    """Return the content of procfs file 'path' as a string.
+    If 'fd' is not -1 it is a file descriptor of 'path' kept open,
+    which is read with pread() from offset 0 instead of opening and
+    closing the file (procfs generates the content again on every
+    read starting at offset 0).
+    """
+    if fd == -1:
+        f = open(path, 'rb')
+        try:
+            data = f.read()
+        finally:
+            f.close()
+    else:
+        chunks = []
+        offset = 0
+        while 1:
+            chunk = _pread(fd, 8192, offset)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+        data = _EMPTY.join(chunks)
+    if PY3:
+        data = data.decode(sys.getfilesystemencoding(), 'surrogateescape')
+    return data
+
+
+# {path: fd} of the system-wide procfs files kept open; None unless
+# enabled by keep_procfs_open()
+_procfs_fds = None
+_procfs_lock = threading.Lock()
+
+
+def keep_procfs_open(enabled=True):
+    """Keep the system-wide procfs files (/proc/stat, /proc/meminfo,
+    /proc/vmstat, /proc/net/dev, /proc/diskstats and
+    /proc/partitions) open after their first read and read them
+    again with pread() instead of opening and closing them on every
+    call. Passing False closes them.
+    """
+    global _procfs_fds
+    _procfs_lock.acquire()
+    try:
+        if enabled:
+            if _procfs_fds is None:
+                _procfs_fds = {}
+        else:
+            fds = _procfs_fds
+            _procfs_fds = None
+            if fds:
+                for fd in fds.values():
+                    os.close(fd)
+    finally:
+        _procfs_lock.release()
+
+
+def _read_system_file(path):
+    """Return the content of system-wide procfs file 'path' as a
+    string, reading the file kept open if keep_procfs_open() is
+    enabled.
+    """
+    if _procfs_fds is None:
+        return _read_procfs(path)
+    _procfs_lock.acquire()
+    try:
+        # keep_procfs_open(False) may have been called meanwhile
+        if _procfs_fds is None:
+            return _read_procfs(path)
+        try:
+            fd = _procfs_fds[path]
+        except KeyError:
+            fd = _procfs_fds[path] = os.open(path, _O_FLAGS)
+        return _read_procfs(path, fd)
+    finally:
+        _procfs_lock.release()
+
 
 # --- system memory
 
 def virtual_memory():
     total, free, buffers, shared, _, _ = cext.linux_sysinfo()
     cached = active = inactive = None
-    f = open('/proc/meminfo', 'r')
-    try:
-        for line in f:
-            if line.startswith('Cached:'):
-                cached = int(line.split()[1]) * 1024
-            elif line.startswith('Active:'):
-                active = int(line.split()[1]) * 1024
-            elif line.startswith('Inactive:'):
-                inactive = int(line.split()[1]) * 1024
-            if (cached is not None
-                    and active is not None
-                    and inactive is not None):
-                break
-        else:
-            # we might get here when dealing with exotic Linux flavors, see:
-            # http://code.google.com/p/psutil/issues/detail?id=313
-            msg = "'cached', 'active' and 'inactive' memory stats couldn't " \
-                  "be determined and were set to 0"
-            warnings.warn(msg, RuntimeWarning)
-            cached = active = inactive = 0
-    finally:
-        f.close()
+    for line in _read_system_file('/proc/meminfo').split('\n'):
+        if line.startswith('Cached:'):
+            cached = int(line.split()[1]) * 1024
+        elif line.startswith('Active:'):
+            active = int(line.split()[1]) * 1024
+        elif line.startswith('Inactive:'):
+            inactive = int(line.split()[1]) * 1024
+        if (cached is not None
+                and active is not None
+                and inactive is not None):
+            break
+    else:
+        # we might get here when dealing with exotic Linux flavors, see:
+        # http://code.google.com/p/psutil/issues/detail?id=313
+        msg = "'cached', 'active' and 'inactive' memory stats couldn't " \
+              "be determined and were set to 0"
+        warnings.warn(msg, RuntimeWarning)
+        cached = active = inactive = 0
     avail = free + buffers + cached
     used = total - free
     percent = usage_percent((total - avail), total, _round=1)
@@ -172,26 +301,22 @@ def swap_memory():
     used = total - free
     percent = usage_percent(used, total, _round=1)
     # get pgin/pgouts
-    f = open("/proc/vmstat", "r")
     sin = sout = None
-    try:
-        for line in f:
-            # values are expressed in 4 kilo bytes, we want bytes instead
-            if line.startswith('pswpin'):
-                sin = int(line.split(' ')[1]) * 4 * 1024
-            elif line.startswith('pswpout'):
-                sout = int(line.split(' ')[1]) * 4 * 1024
-            if sin is not None and sout is not None:
-                break
-        else:
-            # we might get here when dealing with exotic Linux flavors, see:
-            # http://code.google.com/p/psutil/issues/detail?id=313
-            msg = "'sin' and 'sout' swap memory stats couldn't " \
-                  "be determined and were set to 0"
-            warnings.warn(msg, RuntimeWarning)
-            sin = sout = 0
-    finally:
-        f.close()
+    for line in _read_system_file("/proc/vmstat").split('\n'):
+        # values are expressed in 4 kilo bytes, we want bytes instead
+        if line.startswith('pswpin'):
+            sin = int(line.split(' ')[1]) * 4 * 1024
+        elif line.startswith('pswpout'):
+            sout = int(line.split(' ')[1]) * 4 * 1024
+        if sin is not None and sout is not None:
+            break
+    else:
+        # we might get here when dealing with exotic Linux flavors, see:
+        # http://code.google.com/p/psutil/issues/detail?id=313
+        msg = "'sin' and 'sout' swap memory stats couldn't " \
+              "be determined and were set to 0"
+        warnings.warn(msg, RuntimeWarning)
+        sin = sout = 0
     return _common.sswap(total, used, free, percent, sin, sout)
 
 
@@ -214,14 +339,12 @@ def cpu_times():
      [guest_nice]]])
     Last 3 fields may not be available on all Linux kernel versions.
     """
-    f = open('/proc/stat', 'r')
-    try:
-        values = f.readline().split()
-    finally:
-        f.close()
-    fields = values[1:len(scputimes._fields) + 1]
+    data = _read_system_file('/proc/stat')
+    values = data[:data.find('\n')].split()[1:]
+    nt = _get_scputimes(values)
+    fields = values[:len(nt._fields)]
     fields = [float(x) / CLOCK_TICKS for x in fields]
-    return scputimes(*fields)
+    return nt(*fields)
 
 
 def per_cpu_times():
@@ -229,20 +352,23 @@ def per_cpu_times():
     for every CPU available on the system.
     """
     cpus = []
-    f = open('/proc/stat', 'r')
-    try:
-        # get rid of the first line which refers to system wide CPU stats
-        f.readline()
-        for line in f:
-            if line.startswith('cpu'):
-                values = line.split()
-                fields = values[1:len(scputimes._fields) + 1]
-                fields = [float(x) / CLOCK_TICKS for x in fields]
-                entry = scputimes(*fields)
-                cpus.append(entry)
-        return cpus
-    finally:
-        f.close()
+    lines = _read_system_file('/proc/stat').split('\n')
+    # get rid of the first line which refers to system wide CPU stats
+    for line in lines[1:]:
+        if line.startswith('cpu'):
+            values = line.split()[1:]
+            nt = _get_scputimes(values)
+            fields = values[:len(nt._fields)]
+            fields = [float(x) / CLOCK_TICKS for x in fields]
+            entry = nt(*fields)
+            cpus.append(entry)
+    return cpus
+
+
+if hasattr(cext, "per_cpu_times_into"):
+    # Python >= 2.6; see psutil.per_cpu_times_array()
+    per_cpu_times_into = cext.per_cpu_times_into
+    cpu_busy_percent_into = cext.cpu_busy_percent_into
 
 
 def cpu_count_logical():
@@ -322,16 +448,12 @@ def users():
 def boot_time():
     """Return the system boot time expressed in seconds since the epoch."""
     global BOOT_TIME
-    f = open('/proc/stat', 'r')
-    try:
-        for line in f:
-            if line.startswith('btime'):
-                ret = float(line.strip().split()[1])
-                BOOT_TIME = ret
-                return ret
-        raise RuntimeError("line 'btime' not found")
-    finally:
-        f.close()
+    for line in _read_system_file('/proc/stat').split('\n'):
+        if line.startswith('btime'):
+            ret = float(line.strip().split()[1])
+            BOOT_TIME = ret
+            return ret
+    raise RuntimeError("line 'btime' not found")
 
 
 # --- processes
@@ -346,18 +468,698 @@ def pid_exists(pid):
     return _psposix.pid_exists(pid)
 
 
+def _parse_proc_stat(pid, fd=-1):
+    """Parse /proc/{pid}/stat file and return a
+    (name, status, ppid, tty_nr, utime, stime, starttime) tuple where
+    status is the state letter and times are expressed in clock ticks.
+    If 'fd' is not -1 it's the file kept open, see _read_procfs().
+    """
+    data = _read_procfs("/proc/%s/stat" % pid, fd)
+    # The process name is enclosed in parentheses and can contain
+    # spaces and parentheses itself, hence we look for the first
+    # "(" and the last ")".
+    rpar = data.rfind(')')
+    name = data[data.find('(') + 1:rpar]
+    # fields 3 (state) to 22 (starttime) as described in "man proc"
+    fields = data[rpar + 2:].split()
+    return (name, fields[0], int(fields[1]), int(fields[4]), int(fields[11]),
+            int(fields[12]), int(fields[19]))
+
+
+def _parse_proc_statm(pid, fd=-1):
+    """Parse /proc/{pid}/statm file and return a
+    (size, resident, shared, text, lib, data, dt) tuple expressed in
+    pages.
+    If 'fd' is not -1 it's the file kept open, see _read_procfs().
+    """
+    data = _read_procfs("/proc/%s/statm" % pid, fd)
+    return tuple([int(x) for x in data.split()[:7]])
+
+
+def _parse_proc_status(pid, fd=-1):
+    """Parse /proc/{pid}/status file and return a
+    (uid_real, uid_effective, uid_saved,
+     gid_real, gid_effective, gid_saved,
+     num_threads, voluntary_ctxsw, involuntary_ctxsw) tuple.
+    Fields which are not available on this kernel are set to None.
+    If 'fd' is not -1 it's the file kept open, see _read_procfs().
+    """
+    uids = gids = [None, None, None]
+    threads = vol = unvol = None
+    for line in _read_procfs("/proc/%s/status" % pid, fd).split('\n'):
+        if line.startswith('Uid:'):
+            uids = [int(x) for x in line.split()[1:4]]
+        elif line.startswith('Gid:'):
+            gids = [int(x) for x in line.split()[1:4]]
+        elif line.startswith('Threads:'):
+            threads = int(line.split()[1])
+        elif line.startswith('voluntary_ctxt_switches'):
+            vol = int(line.split()[1])
+        elif line.startswith('nonvoluntary_ctxt_switches'):
+            unvol = int(line.split()[1])
+    return tuple(uids) + tuple(gids) + (threads, vol, unvol)
+
+
+# {smaps field: index} of the memory fields summed by
+# _parse_proc_smaps_grouped(), in pmmap_grouped order
+_smaps_fields = dict([(name, i) for i, name in enumerate(
+    ['Rss:', 'Size:', 'Pss:', 'Shared_Clean:', 'Shared_Dirty:',
+     'Private_Clean:', 'Private_Dirty:', 'Referenced:', 'Anonymous:',
+     'Swap:'])])
+
+
+def _parse_proc_smaps_grouped(pid, rollup=False):
+    """Parse /proc/{pid}/smaps (/proc/{pid}/smaps_rollup if 'rollup'
+    is true) and return a list of (path, rss, size, pss, shared_clean,
+    shared_dirty, private_clean, private_dirty, referenced, anonymous,
+    swap) tuples in which the memory fields of all the mappings with
+    the same path are summed and expressed in bytes.
+    """
+    if rollup:
+        name = "smaps_rollup"
+    else:
+        name = "smaps"
+    data = _read_procfs("/proc/%s/%s" % (pid, name))
+    groups = {}
+    sums = None
+    get_index = _smaps_fields.get
+    for line in data.split('\n'):
+        fields = line.split(None, 2)
+        if not fields:
+            continue
+        i = get_index(fields[0])
+        if i is not None:
+            sums[i] += int(fields[1])
+        elif not fields[0].endswith(':'):
+            # "addr perms offset dev inode [path]"
+            hfields = line.split(None, 5)
+            if len(hfields) == 6:
+                path = hfields[5].strip() or '[anon]'
+            else:
+                path = '[anon]'
+            try:
+                sums = groups[path]
+            except KeyError:
+                sums = groups[path] = [0] * len(_smaps_fields)
+    return [tuple([path] + [x * 1024 for x in groups[path]])
+            for path in groups]
+
+
+# Parsing procfs files in C is considerably faster; the pure python
+# implementations above are used as a fallback.
+proc_stat = getattr(cext, "proc_stat", _parse_proc_stat)
+proc_statm = getattr(cext, "proc_statm", _parse_proc_statm)
+proc_status = getattr(cext, "proc_status", _parse_proc_status)
+proc_smaps_grouped = getattr(cext, "proc_smaps_grouped",
+                             _parse_proc_smaps_grouped)
+
+
+def ppid_ctime(pid):
+    """Return the (ppid, create_time) tuple of process 'pid' reading
+    /proc/{pid}/stat once.
+    """
+    try:
+        values = proc_stat(pid)
+    except EnvironmentError:
+        err = sys.exc_info()[1]
+        if err.errno in (errno.ENOENT, errno.ESRCH):
+            raise NoSuchProcess(pid, None)
+        raise
+    bt = BOOT_TIME or boot_time()
+    return (values[2], (float(values[6]) / CLOCK_TICKS) + bt)
+
+
+def ppid_ctime_map():
+    """Obtain a {pid: (ppid, create_time), ...} dict for all running
+    processes in one shot, reading /proc/{pid}/stat once per process.
+    Used to speed up Process.children().
+    """
+    ret = {}
+    for pid in pids():
+        try:
+            ret[pid] = ppid_ctime(pid)
+        except NoSuchProcess:
+            # process is gone in the meantime
+            pass
+    return ret
+
+
+def ppid_map():
+    """Obtain a {pid: ppid, ...} dict for all running processes in
+    one shot, reading /proc/{pid}/stat once per process.
+    """
+    ret = {}
+    for pid, (ppid, ctime) in ppid_ctime_map().items():
+        ret[pid] = ppid
+    return ret
+
+
+if hasattr(cext, "linux_pidfd_open"):
+
+    pidfd_open = cext.linux_pidfd_open
+
+    def poll_pidfds(fds, timeout=None):
+        """Wait up to 'timeout' seconds (forever if None) for any of
+        the pidfds in 'fds' to become readable, meaning the process
+        terminated, and return the ready ones (an empty list on
+        timeout).
+        """
+        poller = select.poll()
+        for fd in fds:
+            poller.register(fd, select.POLLIN)
+        timer = getattr(time, 'monotonic', time.time)
+        if timeout is not None:
+            stop_at = timer() + timeout
+        while 1:
+            if timeout is None:
+                ms = None
+            else:
+                # round up so that we never return before the timeout
+                ms = max(0, int((stop_at - timer()) * 1000 + 0.999))
+            try:
+                return [fd for fd, event in poller.poll(ms)]
+            except (select.error, EnvironmentError):
+                err = sys.exc_info()[1]
+                if err.args[0] != errno.EINTR:
+                    raise
+
+    def reap_pid(pid):
+        """Collect the exit code of a terminated process. Return None
+        if it's not a children of os.getpid().
+        """
+        while 1:
+            try:
+                retpid, status = os.waitpid(pid, os.WNOHANG)
+            except OSError:
+                err = sys.exc_info()[1]
+                if err.errno == errno.EINTR:
+                    continue
+                if err.errno == errno.ECHILD:
+                    return None
+                raise
+            if retpid == 0:
+                return None
+            return _psposix.exit_code(status)
+
+    def wait_pid(pid, timeout=None):
+        """Same as _psposix.wait_pid() but sleep in poll(2) on a pidfd
+        (Linux >= 5.3) until the process terminates instead of
+        polling. Processes which are not children of os.getpid() are
+        considered gone as soon as they terminate, even if they
+        haven't been reaped by their parent yet.
+        """
+        try:
+            fd = pidfd_open(pid)
+        except EnvironmentError:
+            # ESRCH (no such process) or ENOSYS (Linux < 5.3);
+            # let the polling implementation deal with it
+            return _psposix.wait_pid(pid, timeout)
+        try:
+            if not poll_pidfds([fd], timeout):
+                raise TimeoutExpired(timeout, pid)
+        finally:
+            os.close(fd)
+        return reap_pid(pid)
+
+else:
+    wait_pid = _psposix.wait_pid
+
+
+if hasattr(cext, "linux_proc_connector_open"):
+    # Linux >= 2.6.15; used by psutil.ProcessEvents
+    proc_connector_open = cext.linux_proc_connector_open
+    proc_connector_read = cext.linux_proc_connector_read
+
+
 # --- network
 
+class Connections(object):
+    """A wrapper on top of /proc/net/* files, retrieving per-process
+    and system-wide open connections (TCP, UDP, UNIX) similarly to
+    "netstat -an".
+
+    Note: in case of UNIX sockets we're only able to determine the
+    local endpoint/path, not the one it's connected to.
+    According to [1] it would be possible but not easily.
+
+    [1] http://serverfault.com/a/417946
+    """
+
+    def __init__(self):
+        tcp4 = ("tcp", socket.AF_INET, socket.SOCK_STREAM)
+        tcp6 = ("tcp6", socket.AF_INET6, socket.SOCK_STREAM)
+        udp4 = ("udp", socket.AF_INET, socket.SOCK_DGRAM)
+        udp6 = ("udp6", socket.AF_INET6, socket.SOCK_DGRAM)
+        unix = ("unix", socket.AF_UNIX, None)
+        self.tmap = {
+            "all": (tcp4, tcp6, udp4, udp6, unix),
+            "tcp": (tcp4, tcp6),
+            "tcp4": (tcp4,),
+            "tcp6": (tcp6,),
+            "udp": (udp4, udp6),
+            "udp4": (udp4,),
+            "udp6": (udp6,),
+            "unix": (unix,),
+            "inet": (tcp4, tcp6, udp4, udp6),
+            "inet4": (tcp4, udp4),
+            "inet6": (tcp6, udp6),
+        }
+        # Querying the kernel via NETLINK_SOCK_DIAG (Linux >= 3.3) is
+        # faster than parsing /proc/net/* files and also allows TCP
+        # states to be filtered in kernel; /proc/net/* is used as a
+        # fallback in case netlink is not available.
+        self.netlink = hasattr(cext, "linux_inet_diag")
+        # (family, type) pairs which can't be queried via netlink
+        self.netlink_unsupported = set()
+
+    def get_proc_inodes(self, pid):
+        """Return a {inode: [(pid, fd), ...]} dict of the sockets
+        opened by 'pid'.
+        """
+        inodes = {}
+        for fd in os.listdir("/proc/%s/fd" % pid):
+            try:
+                inode = os.readlink("/proc/%s/fd/%s" % (pid, fd))
+            except OSError:
+                continue
+            if inode.startswith('socket:['):
+                # the process is using a socket
+                inode = inode[8:][:-1]
+                inodes.setdefault(inode, []).append((pid, int(fd)))
+        return inodes
+
+    def get_all_inodes(self):
+        """Same as get_proc_inodes() but for all processes, scanning
+        /proc/*/fd once.
+        """
+        inodes = {}
+        for pid in pids():
+            try:
+                proc_inodes = self.get_proc_inodes(pid)
+            except OSError:
+                # os.listdir() is gonna raise a lot of access denied
+                # exceptions in case of unprivileged user; that's fine
+                # as we'll just end up returning a connection with PID
+                # set to None and fd set to -1 anyway.
+                # Both netstat -an and lsof does the same so it's
+                # unlikely we can do any better.
+                # ENOENT just means a PID disappeared on us.
+                err = sys.exc_info()[1]
+                if err.errno not in (errno.ENOENT, errno.ESRCH,
+                                     errno.EPERM, errno.EACCES):
+                    raise
+                continue
+            for inode, pairs in proc_inodes.items():
+                if inode in inodes:
+                    inodes[inode].extend(pairs)
+                else:
+                    inodes[inode] = pairs
+        return inodes
+
+    def decode_address(self, addr, family, raw=False):
+        """Accept an "ip:port" address as displayed in /proc/net/*
+        and convert it into a human readable form, like:
+
+        "0500000A:0016" -> ("10.0.0.5", 22)
+        "0000000000000000FFFF00000100007F:9E49" -> ("::ffff:127.0.0.1", 40521)
+
+        The IP address portion is a little or big endian four-byte
+        hexadecimal number; that is, the least significant byte is listed
+        first, so we need to reverse the order of the bytes to convert it
+        to an IP address.
+        The port is represented as a two-byte hexadecimal number.
+
+        If 'raw' is True the IP address is returned as an integer
+        instead (e.g. 167772165 for "10.0.0.5").
+
+        Reference:
+        http://linuxdevcenter.com/pub/a/linux/2000/11/16/LinuxAdmin.html
+        """
+        ip, port = addr.split(':')
+        port = int(port, 16)
+        # this usually refers to a local socket in listen mode with
+        # no end-points connected
+        if not port:
+            return ()
+        return (self.decode_ip(ip, family, raw), port)
+
+    def decode_addresses(self, addrs, family, raw=False):
+        """Batch version of decode_address(): accept a sequence of
+        "ip:port" addresses as displayed in /proc/net/* and return
+        a {addr: decoded_addr} dict. Every distinct address and IP
+        is converted only once.
+        """
+        decode = self.address_decoder(family, raw)
+        ret = {}
+        for addr in addrs:
+            ret[addr] = decode(addr)
+        return ret
+
+    def address_decoder(self, family, raw=False):
+        """Return a function which behaves like decode_address() but
+        remembers already decoded addresses and IPs, so that every
+        distinct one is converted only once.
+        """
+        addrs = {}
+        ips = {}
+
+        def decode(addr):
+            try:
+                return addrs[addr]
+            except KeyError:
+                pass
+            # "ip:port" where port is always 4 hex digits
+            port = int(addr[-4:], 16)
+            if not port:
+                ret = ()
+            else:
+                ip = addr[:-5]
+                if ip not in ips:
+                    ips[ip] = self.decode_ip(ip, family, raw)
+                ret = (ips[ip], port)
+            addrs[addr] = ret
+            return ret
+
+        return decode
+
+    def decode_ip(self, ip, family, raw=False):
+        """Convert the hexadecimal IP address portion of an address as
+        displayed in /proc/net/* into a string or, if 'raw' is True,
+        into an integer.
+        """
+        if raw:
+            # the address is a sequence of 32 bit words in host order
+            ret = 0
+            for i in xrange(0, len(ip), 8):
+                ret = (ret << 32) | socket.ntohl(int(ip[i:i + 8], 16))
+            return ret
+        if PY3:
+            ip = ip.encode('ascii')
+        if family == socket.AF_INET:
+            # see: http://code.google.com/p/psutil/issues/detail?id=201
+            if sys.byteorder == 'little':
+                ip = socket.inet_ntop(family, base64.b16decode(ip)[::-1])
+            else:
+                ip = socket.inet_ntop(family, base64.b16decode(ip))
+        else:  # IPv6
+            # old version - let's keep it, just in case...
+            # ip = ip.decode('hex')
+            # return socket.inet_ntop(socket.AF_INET6,
+            #          ''.join(ip[i:i+4][::-1] for i in xrange(0, 16, 4)))
+            ip = base64.b16decode(ip)
+            # see: http://code.google.com/p/psutil/issues/detail?id=201
+            if sys.byteorder == 'little':
+                ip = socket.inet_ntop(
+                    socket.AF_INET6,
+                    struct.pack('>4I', *struct.unpack('<4I', ip)))
+            else:
+                ip = socket.inet_ntop(
+                    socket.AF_INET6,
+                    struct.pack('<4I', *struct.unpack('<4I', ip)))
+        return ip
+
+    def netlink_states(self, type_, status):
+        """Return the bitmask of TCP states matching 'status' as
+        expected by NETLINK_SOCK_DIAG or 0 if no socket of 'type_'
+        can possibly match.
+        """
+        if status is None:
+            return _NETLINK_ALL_STATES
+        if type_ != socket.SOCK_STREAM:
+            # UDP sockets have no status
+            if _common.CONN_NONE in status:
+                return _NETLINK_ALL_STATES
+            return 0
+        states = 0
+        for x in status:
+            if x in TCP_STATES:
+                states |= 1 << TCP_STATES[x]
+        return states
+
+    def netlink_inet(self, rows, family, type_, get_inodes, filter_pid=None,
+                     laddr_port=None):
+        """Same as process_inet() but for the rows returned by
+        linux_inet_diag().
+        """
+        for laddr, lport, raddr, rport, state, inode in rows:
+            if laddr_port is not None and lport != laddr_port:
+                continue
+            inode = str(inode)
+            inodes = get_inodes()
+            if inode in inodes:
+                pid, fd = inodes[inode][0]
+            else:
+                pid, fd = None, -1
+            if filter_pid is not None and filter_pid != pid:
+                continue
+            if type_ == socket.SOCK_STREAM:
+                state = TCP_STATUSES["%02X" % state]
+            else:
+                state = _common.CONN_NONE
+            # same as decode_address()
+            if lport:
+                laddr = (laddr, lport)
+            else:
+                laddr = ()
+            if rport:
+                raddr = (raddr, rport)
+            else:
+                raddr = ()
+            yield (fd, family, type_, laddr, raddr, state, pid)
+
+    def netlink_unix(self, rows, family, get_inodes, filter_pid=None):
+        """Same as process_unix() but for the rows returned by
+        linux_unix_diag().
+        """
+        for type_, path, inode in rows:
+            inode = str(inode)
+            inodes = get_inodes()
+            if inode in inodes:
+                pairs = inodes[inode]
+            else:
+                pairs = [(None, -1)]
+            for pid, fd in pairs:
+                if filter_pid is not None and filter_pid != pid:
+                    continue
+                yield (fd, family, type_, path, None, _common.CONN_NONE,
+                       pid)
+
+    def process_inet(self, file, family, type_, get_inodes, filter_pid=None,
+                     status=None, laddr_port=None, raw=False):
+        """Parse /proc/net/tcp* and /proc/net/udp* files yielding
+        (fd, family, type, laddr, raddr, status, pid) tuples as they
+        are parsed.
+        'status' and 'laddr_port' filters are applied before lines
+        are split and decoded. 'get_inodes' is a function returning
+        the inode map, only called once a line matches.
+        """
+        try:
+            f = open(file, 'r')
+        except IOError:
+            # IPv6 not supported on this platform
+            err = sys.exc_info()[1]
+            if err.errno == errno.ENOENT and file.endswith('6'):
+                return
+            else:
+                raise
+        # substrings used to quickly discard non matching lines; a
+        # line is formatted as "sl laddr:lport raddr:rport st ..."
+        port_hex = None
+        if laddr_port is not None:
+            port_hex = "%04X" % laddr_port
+        states_hex = None
+        if status is not None and type_ == socket.SOCK_STREAM:
+            states_hex = [" %s " % k for k, v in TCP_STATUSES.items()
+                          if v in status]
+        decode = self.address_decoder(family, raw)
+        # Note: the file is closed on garbage collection if the
+        # generator is not exhausted (try/finally cannot be used
+        # around yield on Python 2.4).
+        f.readline()  # skip the first line
+        for line in f:
+            if port_hex is not None and ":%s " % port_hex not in line:
+                continue
+            if states_hex is not None:
+                for x in states_hex:
+                    if x in line:
+                        break
+                else:
+                    continue
+            _, laddr, raddr, state, _, _, _, _, _, inode = \
+                line.split()[:10]
+            if port_hex is not None and laddr[-4:] != port_hex:
+                continue
+            if type_ == socket.SOCK_STREAM:
+                state = TCP_STATUSES[state]
+            else:
+                state = _common.CONN_NONE
+            if status is not None and state not in status:
+                continue
+            inodes = get_inodes()
+            if inode in inodes:
+                # an inet socket shared between processes (e.g.
+                # inherited by a child) is reported once, for the
+                # first process found
+                pid, fd = inodes[inode][0]
+            else:
+                pid, fd = None, -1
+            if filter_pid is not None and filter_pid != pid:
+                continue
+            yield (fd, family, type_, decode(laddr), decode(raddr), state,
+                   pid)
+        f.close()
+
+    def process_unix(self, file, family, get_inodes, filter_pid=None):
+        """Parse /proc/net/unix file yielding
+        (fd, family, type, laddr, raddr, status, pid) tuples.
+        """
+        f = open(file, 'r')
+        f.readline()  # skip the first line
+        for line in f:
+            tokens = line.split()
+            _, _, _, _, type_, _, inode = tokens[0:7]
+            inodes = get_inodes()
+            if inode in inodes:
+                # With UNIX sockets we can have a single inode
+                # referencing many file descriptors.
+                pairs = inodes[inode]
+            else:
+                pairs = [(None, -1)]
+            if len(tokens) == 8:
+                path = tokens[-1]
+            else:
+                path = ""
+            type_ = int(type_)
+            for pid, fd in pairs:
+                if filter_pid is not None and filter_pid != pid:
+                    continue
+                yield (fd, family, type_, path, None, _common.CONN_NONE,
+                       pid)
+        f.close()
+
+    def iter_retrieve(self, kind, pid=None, status=None, laddr_port=None,
+                      raw=False):
+        """Return a generator yielding the connections of 'pid' as
+        pconn namedtuples or, if 'pid' is None, system-wide
+        connections as sconn namedtuples, as they are found.
+
+        If 'status' is not None only connections whose status is in
+        it are returned (on Linux >= 3.3 TCP sockets are filtered by
+        the kernel). If 'laddr_port' is not None only connections
+        bound to that local port are returned.
+        If 'raw' is True IP addresses are returned as integers.
+
+        The process fds are listed before returning so that
+        NoSuchProcess can be raised immediately, while the
+        system-wide inode map is only built once a connection
+        matches.
+        """
+        if kind not in self.tmap:
+            raise ValueError("invalid %r kind argument; choose between %s"
+                             % (kind, ', '.join([repr(x) for x in self.tmap])))
+        if pid is not None:
+            inodes = self.get_proc_inodes(pid)
+            if not inodes:
+                # no connections for this process
+                return iter([])
+            get_inodes = lambda: inodes
+        else:
+            cache = []
+
+            def get_inodes():
+                if not cache:
+                    cache.append(self.get_all_inodes())
+                return cache[0]
+
+        return self._iter_retrieve(kind, get_inodes, pid, status,
+                                   laddr_port, raw)
+
+    def _iter_retrieve(self, kind, get_inodes, pid, status, laddr_port,
+                       raw):
+        for f, family, type_ in self.tmap[kind]:
+            if family == socket.AF_UNIX and laddr_port is not None:
+                # UNIX sockets have no port
+                continue
+            if type_ != socket.SOCK_STREAM and status is not None and \
+                    _common.CONN_NONE not in status:
+                # UDP and UNIX sockets have no status
+                continue
+            rows = None
+            if self.netlink and \
+                    (family, type_) not in self.netlink_unsupported:
+                try:
+                    if family == socket.AF_UNIX:
+                        rows = cext.linux_unix_diag()
+                    else:
+                        states = self.netlink_states(type_, status)
+                        if not states:
+                            continue
+                        if type_ == socket.SOCK_STREAM:
+                            proto = socket.IPPROTO_TCP
+                        else:
+                            proto = socket.IPPROTO_UDP
+                        rows = cext.linux_inet_diag(family, proto, states,
+                                                    raw)
+                except EnvironmentError:
+                    err = sys.exc_info()[1]
+                    if err.errno not in _NETLINK_UNSUPPORTED:
+                        raise
+                    # e.g. the *_diag kernel module for this protocol
+                    # is not available or netlink sockets are not
+                    # permitted; from now on we'll parse /proc/net/*
+                    # files for this family and type
+                    self.netlink_unsupported.add((family, type_))
+            if rows is not None:
+                if family == socket.AF_UNIX:
+                    ls = self.netlink_unix(rows, family, get_inodes,
+                                           filter_pid=pid)
+                else:
+                    ls = self.netlink_inet(rows, family, type_, get_inodes,
+                                           filter_pid=pid,
+                                           laddr_port=laddr_port)
+            elif family == socket.AF_UNIX:
+                ls = self.process_unix("/proc/net/%s" % f, family,
+                                       get_inodes, filter_pid=pid)
+            else:
+                ls = self.process_inet("/proc/net/%s" % f, family, type_,
+                                       get_inodes, filter_pid=pid,
+                                       status=status, laddr_port=laddr_port,
+                                       raw=raw)
+            if pid is not None:
+                for fd, family, type_, laddr, raddr, status_, bound_pid \
+                        in ls:
+                    yield _common.pconn(fd, family, type_, laddr, raddr,
+                                        status_)
+            else:
+                for conn in ls:
+                    yield _common.sconn(*conn)
+
+    def retrieve(self, kind, pid=None, status=None, laddr_port=None,
+                 raw=False):
+        """Same as iter_retrieve() but return a list."""
+        return list(self.iter_retrieve(kind, pid, status, laddr_port, raw))
+
+
+_connections = Connections()
+
+
+def net_connections(kind='inet', raw=False):
+    """Return system-wide open connections."""
+    return _connections.retrieve(kind, raw=raw)
+
+
+def iter_net_connections(kind='inet', status=None, laddr_port=None,
+                         raw=False):
+    """Return a generator yielding system-wide open connections."""
+    return _connections.iter_retrieve(kind, status=status,
+                                      laddr_port=laddr_port, raw=raw)
+
+
 def net_io_counters():
     """Return network I/O statistics for every network interface
     installed on the system as a dict of raw tuples.
     """
-    f = open("/proc/net/dev", "r")
-    try:
-        lines = f.readlines()
-    finally:
-        f.close()
-
+    lines = _read_system_file("/proc/net/dev").splitlines()
     retdict = {}
     for line in lines[2:]:
         colon = line.rfind(':')
@@ -390,11 +1192,7 @@ def disk_io_counters():
 
     # determine partitions we want to look for
     partitions = []
-    f = open("/proc/partitions", "r")
-    try:
-        lines = f.readlines()[2:]
-    finally:
-        f.close()
+    lines = _read_system_file("/proc/partitions").splitlines()[2:]
     for line in reversed(lines):
         _, _, _, name = line.split()
         if name[-1].isdigit():
@@ -410,11 +1208,7 @@ def disk_io_counters():
                 partitions.append(name)
     #
     retdict = {}
-    f = open("/proc/diskstats", "r")
-    try:
-        lines = f.readlines()
-    finally:
-        f.close()
+    lines = _read_system_file("/proc/diskstats").splitlines()
     for line in lines:
         # http://www.mjmwired.net/kernel/Documentation/iostats.txt
         _, _, name, reads, _, rbytes, rtime, writes, _, wbytes, wtime = \
@@ -458,6 +1252,14 @@ def disk_partitions(all=False):
 disk_usage = _psposix.disk_usage
 
 
+@memoize
+def _proc_file_exists(name):
+    """Return whether this kernel provides /proc/PID/<name>. This is
+    checked on first failure rather than at import time.
+    """
+    return os.path.exists('/proc/%s/%s' % (os.getpid(), name))
+
+
 # --- decorators
 
 def wrap_exceptions(fun):
@@ -474,6 +1276,8 @@ def wrap_exceptions(fun):
             # process is gone in meantime.
             err = sys.exc_info()[1]
             if err.errno in (errno.ENOENT, errno.ESRCH):
+                if self._fds is not None:
+                    self._close_fds(gone=True)
                 raise NoSuchProcess(self.pid, self._name)
             if err.errno in (errno.EPERM, errno.EACCES):
                 raise AccessDenied(self.pid, self._name)
@@ -484,21 +1288,99 @@ def wrap_exceptions(fun):
 class Process(object):
     """Linux process implementation."""
 
-    __slots__ = ["pid", "_name"]
+    __slots__ = ["pid", "_name", "_cache", "_fds", "_raw"]
 
     def __init__(self, pid):
         self.pid = pid
         self._name = None
+        # {name: fd} of /proc/{pid}/* files kept open, see
+        # keep_procfs_open(); False once the process is gone
+        self._fds = None
+        # return plain tuples instead of namedtuples, see raw_tuples()
+        self._raw = False
+
+    def __del__(self):
+        if self._fds:
+            self._close_fds()
+
+    def raw_tuples(self, enabled=True):
+        self._raw = bool(enabled)
+
+    def keep_procfs_open(self, enabled=True):
+        # stat, statm, status and io files are opened on first read
+        # and read again with pread() from then on
+        if enabled:
+            if self._fds is None:
+                self._fds = {}
+        elif self._fds is not None:
+            self._close_fds()
+            self._fds = None
+
+    def _close_fds(self, gone=False):
+        fds = self._fds
+        if gone:
+            self._fds = False
+        else:
+            self._fds = {}
+        if fds:
+            for fd in fds.values():
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    def _procfs_fd(self, name):
+        """Return the file descriptor of /proc/{pid}/{name} if it is
+        kept open, else -1.
+        """
+        fds = self._fds
+        if fds is None:
+            return -1
+        if fds is False:
+            # the process is gone; the files are not opened again as
+            # its PID may have been reused meanwhile
+            raise OSError(errno.ESRCH, os.strerror(errno.ESRCH))
+        try:
+            return fds[name]
+        except KeyError:
+            fd = fds[name] = os.open("/proc/%s/%s" % (self.pid, name),
+                                     _O_FLAGS)
+            return fd
+
+    def oneshot_enter(self):
+        # stat, statm and status files are read once and their parsed
+        # content is shared between all methods until oneshot_exit()
+        self._parse_stat_file.cache_activate(self)
+
+    def oneshot_exit(self):
+        self._parse_stat_file.cache_deactivate(self)
+
+    @memoize_when_activated
+    def _parse_stat_file(self):
+        """Return a (name, status, ppid, tty_nr, utime, stime,
+        starttime) tuple from /proc/{pid}/stat.
+        """
+        return proc_stat(self.pid, self._procfs_fd("stat"))
+
+    @memoize_when_activated
+    def _parse_statm_file(self):
+        """Return a (size, resident, shared, text, lib, data, dt)
+        tuple from /proc/{pid}/statm, expressed in pages.
+        """
+        return proc_statm(self.pid, self._procfs_fd("statm"))
+
+    @memoize_when_activated
+    def _parse_status_file(self):
+        """Return a (uid_real, uid_effective, uid_saved, gid_real,
+        gid_effective, gid_saved, num_threads, voluntary_ctxsw,
+        involuntary_ctxsw) tuple from /proc/{pid}/status.
+        """
+        return proc_status(self.pid, self._procfs_fd("status"))
 
     @wrap_exceptions
     def name(self):
-        f = open("/proc/%s/stat" % self.pid)
-        try:
-            name = f.read().split(' ')[1].replace('(', '').replace(')', '')
-        finally:
-            f.close()
         # XXX - gets changed later and probably needs refactoring
-        return name
+        return self._parse_stat_file()[0]
 
     def exe(self):
         try:
@@ -542,92 +1424,75 @@ class Process(object):
     @wrap_exceptions
     def terminal(self):
         tmap = _psposix._get_terminal_map()
-        f = open("/proc/%s/stat" % self.pid)
-        try:
-            tty_nr = int(f.read().split(' ')[6])
-        finally:
-            f.close()
+        tty_nr = self._parse_stat_file()[3]
         try:
             return tmap[tty_nr]
         except KeyError:
             return None
 
-    if os.path.exists('/proc/%s/io' % os.getpid()):
-        @wrap_exceptions
-        def io_counters(self):
-            fname = "/proc/%s/io" % self.pid
-            f = open(fname)
-            try:
-                rcount = wcount = rbytes = wbytes = None
-                for line in f:
-                    if rcount is None and line.startswith("syscr"):
-                        rcount = int(line.split()[1])
-                    elif wcount is None and line.startswith("syscw"):
-                        wcount = int(line.split()[1])
-                    elif rbytes is None and line.startswith("read_bytes"):
-                        rbytes = int(line.split()[1])
-                    elif wbytes is None and line.startswith("write_bytes"):
-                        wbytes = int(line.split()[1])
-                for x in (rcount, wcount, rbytes, wbytes):
-                    if x is None:
-                        raise NotImplementedError(
-                            "couldn't read all necessary info from %r" % fname)
-                return _common.pio(rcount, wcount, rbytes, wbytes)
-            finally:
-                f.close()
-    else:
-        def io_counters(self):
-            raise NotImplementedError("couldn't find /proc/%s/io (kernel "
-                                      "too old?)" % self.pid)
+    @wrap_exceptions
+    def io_counters(self):
+        fname = "/proc/%s/io" % self.pid
+        try:
+            data = _read_procfs(fname, self._procfs_fd("io"))
+        except EnvironmentError:
+            err = sys.exc_info()[1]
+            if err.errno == errno.ENOENT and not _proc_file_exists('io'):
+                raise NotImplementedError("couldn't find /proc/%s/io (kernel "
+                                          "too old?)" % self.pid)
+            raise
+        rcount = wcount = rbytes = wbytes = None
+        for line in data.split('\n'):
+            if rcount is None and line.startswith("syscr"):
+                rcount = int(line.split()[1])
+            elif wcount is None and line.startswith("syscw"):
+                wcount = int(line.split()[1])
+            elif rbytes is None and line.startswith("read_bytes"):
+                rbytes = int(line.split()[1])
+            elif wbytes is None and line.startswith("write_bytes"):
+                wbytes = int(line.split()[1])
+        for x in (rcount, wcount, rbytes, wbytes):
+            if x is None:
+                raise NotImplementedError(
+                    "couldn't read all necessary info from %r" % fname)
+        ret = (rcount, wcount, rbytes, wbytes)
+        if self._raw:
+            return ret
+        return _tuple_new(_common.pio, ret)
 
     @wrap_exceptions
     def cpu_times(self):
-        f = open("/proc/%s/stat" % self.pid)
-        try:
-            st = f.read().strip()
-        finally:
-            f.close()
-        # ignore the first two values ("pid (exe)")
-        st = st[st.find(')') + 2:]
-        values = st.split(' ')
-        utime = float(values[11]) / CLOCK_TICKS
-        stime = float(values[12]) / CLOCK_TICKS
-        return _common.pcputimes(utime, stime)
+        values = self._parse_stat_file()
+        ret = (float(values[4]) / CLOCK_TICKS, float(values[5]) / CLOCK_TICKS)
+        if self._raw:
+            return ret
+        return _tuple_new(_common.pcputimes, ret)
 
     @wrap_exceptions
     def wait(self, timeout=None):
         try:
-            return _psposix.wait_pid(self.pid, timeout)
+            return wait_pid(self.pid, timeout)
         except TimeoutExpired:
             raise TimeoutExpired(timeout, self.pid, self._name)
 
     @wrap_exceptions
     def create_time(self):
-        f = open("/proc/%s/stat" % self.pid)
-        try:
-            st = f.read().strip()
-        finally:
-            f.close()
-        # ignore the first two values ("pid (exe)")
-        st = st[st.rfind(')') + 2:]
-        values = st.split(' ')
-        # According to documentation, starttime is in field 21 and the
+        values = self._parse_stat_file()
+        # According to documentation, starttime is in field 22 and the
         # unit is jiffies (clock ticks).
         # We first divide it for clock ticks and then add uptime returning
         # seconds since the epoch, in UTC.
         # Also use cached value if available.
         bt = BOOT_TIME or boot_time()
-        return (float(values[19]) / CLOCK_TICKS) + bt
+        return (float(values[6]) / CLOCK_TICKS) + bt
 
     @wrap_exceptions
     def memory_info(self):
-        f = open("/proc/%s/statm" % self.pid)
-        try:
-            vms, rss = f.readline().split()[:2]
-            return _common.pmem(int(rss) * PAGESIZE,
-                                int(vms) * PAGESIZE)
-        finally:
-            f.close()
+        vms, rss = self._parse_statm_file()[:2]
+        ret = (rss * PAGESIZE, vms * PAGESIZE)
+        if self._raw:
+            return ret
+        return _tuple_new(_common.pmem, ret)
 
     @wrap_exceptions
     def memory_info_ex(self):
@@ -642,94 +1507,136 @@ class Process(object):
         # | data   | data + stack                        | drs  | DATA |
         # | dirty  | dirty pages (unused in Linux 2.6)   | dt   |      |
         #  ============================================================
-        f = open("/proc/%s/statm" % self.pid)
+        vms, rss, shared, text, lib, data, dirty = \
+            [x * PAGESIZE for x in self._parse_statm_file()]
+        ret = (rss, vms, shared, text, lib, data, dirty)
+        if self._raw:
+            return ret
+        return _tuple_new(pextmem, ret)
+
+    @wrap_exceptions
+    def memory_full_info(self):
+        # USS (private_clean + private_dirty), PSS and swap are summed
+        # by the kernel in smaps_rollup (Linux >= 4.14); on older
+        # kernels we parse the whole smaps file
         try:
-            vms, rss, shared, text, lib, data, dirty = \
-                [int(x) * PAGESIZE for x in f.readline().split()[:7]]
-        finally:
-            f.close()
-        return pextmem(rss, vms, shared, text, lib, data, dirty)
-
-    if os.path.exists('/proc/%s/smaps' % os.getpid()):
-        def memory_maps(self):
-            """Return process's mapped memory regions as a list of nameduples.
-            Fields are explained in 'man proc'; here is an updated (Apr 2012)
-            version: http://goo.gl/fmebo
-            """
-            f = None
-            try:
-                f = open("/proc/%s/smaps" % self.pid)
-                first_line = f.readline()
-                current_block = [first_line]
-
-                def get_blocks():
-                    data = {}
-                    for line in f:
-                        fields = line.split(None, 5)
-                        if not fields[0].endswith(':'):
-                            # new block section
-                            yield (current_block.pop(), data)
-                            current_block.append(line)
-                        else:
-                            try:
-                                data[fields[0]] = int(fields[1]) * 1024
-                            except ValueError:
-                                if fields[0].startswith('VmFlags:'):
-                                    # see issue #369
-                                    continue
-                                else:
-                                    raise ValueError("don't know how to inte"
-                                                     "rpret line %r" % line)
-                    yield (current_block.pop(), data)
-
-                if first_line:  # smaps file can be empty
-                    for header, data in get_blocks():
-                        hfields = header.split(None, 5)
+            rows = proc_smaps_grouped(self.pid, True)
+        except EnvironmentError:
+            err = sys.exc_info()[1]
+            if err.errno == errno.ENOENT:
+                if _proc_file_exists('smaps_rollup'):
+                    raise
+            elif err.errno != errno.ESRCH:
+                raise
+            # ESRCH is also raised for kernel threads, which have no
+            # address space: their smaps file is empty
+            rows = self._memory_maps_grouped()
+        uss = pss = swap = 0
+        for row in rows:
+            uss += row[6] + row[7]
+            pss += row[3]
+            swap += row[10]
+        ret = tuple(self.memory_info_ex()) + (uss, pss, swap)
+        if self._raw:
+            return ret
+        return _tuple_new(pfullmem, ret)
+
+    def _memory_maps_grouped(self):
+        try:
+            return proc_smaps_grouped(self.pid)
+        except EnvironmentError:
+            err = sys.exc_info()[1]
+            if err.errno == errno.ENOENT and not _proc_file_exists('smaps'):
+                msg = "couldn't find /proc/%s/smaps; kernel < 2.6.14 or " \
+                      "CONFIG_MMU kernel configuration option is not " \
+                      "enabled" % self.pid
+                raise NotImplementedError(msg)
+            raise
+
+    @wrap_exceptions
+    def memory_maps_grouped(self):
+        """Return process's mapped memory regions grouped by path as
+        a list of tuples, see proc_smaps_grouped().
+        """
+        return self._memory_maps_grouped()
+
+    def memory_maps(self):
+        """Return process's mapped memory regions as a list of nameduples.
+        Fields are explained in 'man proc'; here is an updated (Apr 2012)
+        version: http://goo.gl/fmebo
+        """
+        f = None
+        try:
+            f = open("/proc/%s/smaps" % self.pid)
+            first_line = f.readline()
+            current_block = [first_line]
+
+            def get_blocks():
+                data = {}
+                for line in f:
+                    fields = line.split(None, 5)
+                    if not fields[0].endswith(':'):
+                        # new block section
+                        yield (current_block.pop(), data)
+                        current_block.append(line)
+                    else:
                         try:
-                            addr, perms, offset, dev, inode, path = hfields
+                            data[fields[0]] = int(fields[1]) * 1024
                         except ValueError:
-                            addr, perms, offset, dev, inode, path = \
-                                hfields + ['']
-                        if not path:
-                            path = '[anon]'
-                        else:
-                            path = path.strip()
-                        yield (addr, perms, path,
-                               data['Rss:'],
-                               data.get('Size:', 0),
-                               data.get('Pss:', 0),
-                               data.get('Shared_Clean:', 0),
-                               data.get('Shared_Dirty:', 0),
-                               data.get('Private_Clean:', 0),
-                               data.get('Private_Dirty:', 0),
-                               data.get('Referenced:', 0),
-                               data.get('Anonymous:', 0),
-                               data.get('Swap:', 0))
-                f.close()
-            except EnvironmentError:
-                # XXX - Can't use wrap_exceptions decorator as we're
-                # returning a generator;  this probably needs some
-                # refactoring in order to avoid this code duplication.
-                if f is not None:
-                    f.close()
-                err = sys.exc_info()[1]
-                if err.errno in (errno.ENOENT, errno.ESRCH):
-                    raise NoSuchProcess(self.pid, self._name)
-                if err.errno in (errno.EPERM, errno.EACCES):
-                    raise AccessDenied(self.pid, self._name)
-                raise
-            except:
-                if f is not None:
-                    f.close()
-                raise
+                            if fields[0].startswith('VmFlags:'):
+                                # see issue #369
+                                continue
+                            else:
+                                raise ValueError("don't know how to inte"
+                                                 "rpret line %r" % line)
+                yield (current_block.pop(), data)
+
+            if first_line:  # smaps file can be empty
+                for header, data in get_blocks():
+                    hfields = header.split(None, 5)
+                    try:
+                        addr, perms, offset, dev, inode, path = hfields
+                    except ValueError:
+                        addr, perms, offset, dev, inode, path = \
+                            hfields + ['']
+                    if not path:
+                        path = '[anon]'
+                    else:
+                        path = path.strip()
+                    yield (addr, perms, path,
+                           data['Rss:'],
+                           data.get('Size:', 0),
+                           data.get('Pss:', 0),
+                           data.get('Shared_Clean:', 0),
+                           data.get('Shared_Dirty:', 0),
+                           data.get('Private_Clean:', 0),
+                           data.get('Private_Dirty:', 0),
+                           data.get('Referenced:', 0),
+                           data.get('Anonymous:', 0),
+                           data.get('Swap:', 0))
             f.close()
-
-    else:
-        def memory_maps(self, ext):
-            msg = "couldn't find /proc/%s/smaps; kernel < 2.6.14 or "  \
-                  "CONFIG_MMU kernel configuration option is not enabled" \
-                  % self.pid
-            raise NotImplementedError(msg)
+        except EnvironmentError:
+            # XXX - Can't use wrap_exceptions decorator as we're
+            # returning a generator;  this probably needs some
+            # refactoring in order to avoid this code duplication.
+            if f is not None:
+                f.close()
+            err = sys.exc_info()[1]
+            if err.errno == errno.ENOENT and not _proc_file_exists('smaps'):
+                msg = "couldn't find /proc/%s/smaps; kernel < 2.6.14 or " \
+                      "CONFIG_MMU kernel configuration option is not " \
+                      "enabled" % self.pid
+                raise NotImplementedError(msg)
+            if err.errno in (errno.ENOENT, errno.ESRCH):
+                raise NoSuchProcess(self.pid, self._name)
+            if err.errno in (errno.EPERM, errno.EACCES):
+                raise AccessDenied(self.pid, self._name)
+            raise
+        except:
+            if f is not None:
+                f.close()
+            raise
+        f.close()
 
     @wrap_exceptions
     def cwd(self):
@@ -741,33 +1648,22 @@ class Process(object):
 
     @wrap_exceptions
     def num_ctx_switches(self):
-        vol = unvol = None
-        f = open("/proc/%s/status" % self.pid)
-        try:
-            for line in f:
-                if line.startswith("voluntary_ctxt_switches"):
-                    vol = int(line.split()[1])
-                elif line.startswith("nonvoluntary_ctxt_switches"):
-                    unvol = int(line.split()[1])
-                if vol is not None and unvol is not None:
-                    return _common.pctxsw(vol, unvol)
+        vol, unvol = self._parse_status_file()[7:9]
+        if vol is None or unvol is None:
             raise NotImplementedError(
                 "'voluntary_ctxt_switches' and 'nonvoluntary_ctxt_switches'"
                 "fields were not found in /proc/%s/status; the kernel is "
                 "probably older than 2.6.23" % self.pid)
-        finally:
-            f.close()
+        if self._raw:
+            return (vol, unvol)
+        return _tuple_new(_common.pctxsw, (vol, unvol))
 
     @wrap_exceptions
     def num_threads(self):
-        f = open("/proc/%s/status" % self.pid)
-        try:
-            for line in f:
-                if line.startswith("Threads:"):
-                    return int(line.split()[1])
+        threads = self._parse_status_file()[6]
+        if threads is None:
             raise NotImplementedError("line not found")
-        finally:
-            f.close()
+        return threads
 
     @wrap_exceptions
     def threads(self):
@@ -793,10 +1689,11 @@ class Process(object):
             # ignore the first two values ("pid (exe)")
             st = st[st.find(')') + 2:]
             values = st.split(' ')
-            utime = float(values[11]) / CLOCK_TICKS
-            stime = float(values[12]) / CLOCK_TICKS
-            ntuple = _common.pthread(int(thread_id), utime, stime)
-            retlist.append(ntuple)
+            ret = (int(thread_id), float(values[11]) / CLOCK_TICKS,
+                   float(values[12]) / CLOCK_TICKS)
+            if not self._raw:
+                ret = _tuple_new(_common.pthread, ret)
+            retlist.append(ret)
         if hit_enoent:
             # raise NSP if the process disappeared on us
             os.stat('/proc/%s' % self.pid)
@@ -843,8 +1740,10 @@ class Process(object):
 
         @wrap_exceptions
         def ionice_get(self):
-            ioclass, value = cext.proc_ioprio_get(self.pid)
-            return _common.pionice(ioclass, value)
+            ret = cext.proc_ioprio_get(self.pid)
+            if self._raw:
+                return ret
+            return _tuple_new(_common.pionice, ret)
 
         @wrap_exceptions
         def ionice_set(self, ioclass, value):
@@ -889,46 +1788,52 @@ class Process(object):
 
     @wrap_exceptions
     def status(self):
-        f = open("/proc/%s/status" % self.pid)
-        try:
-            for line in f:
-                if line.startswith("State:"):
-                    letter = line.split()[1]
-                    # XXX is '?' legit? (we're not supposed to return
-                    # it anyway)
-                    return PROC_STATUSES.get(letter, '?')
-        finally:
-            f.close()
+        letter = self._parse_stat_file()[1]
+        # XXX is '?' legit? (we're not supposed to return it anyway)
+        return PROC_STATUSES.get(letter, '?')
 
     @wrap_exceptions
     def open_files(self):
-        retlist = []
+        return list(self.iter_open_files())
+
+    @wrap_exceptions
+    def iter_open_files(self):
+        # fds are listed immediately so that NoSuchProcess is raised
+        # on call rather than on first iteration
         files = os.listdir("/proc/%s/fd" % self.pid)
+        return self._iter_open_files(files)
+
+    def _iter_open_files(self, files):
         hit_enoent = False
         for fd in files:
             file = "/proc/%s/fd/%s" % (self.pid, fd)
-            if os.path.islink(file):
-                try:
-                    file = os.readlink(file)
-                except OSError:
-                    # ENOENT == file which is gone in the meantime
-                    err = sys.exc_info()[1]
-                    if err.errno == errno.ENOENT:
-                        hit_enoent = True
-                        continue
-                    raise
-                else:
-                    # If file is not an absolute path there's no way
-                    # to tell whether it's a regular file or not,
-                    # so we skip it. A regular file is always supposed
-                    # to be absolutized though.
-                    if file.startswith('/') and isfile_strict(file):
-                        ntuple = _common.popenfile(file, int(fd))
-                        retlist.append(ntuple)
+            if not os.path.islink(file):
+                continue
+            try:
+                file = os.readlink(file)
+                # If file is not an absolute path there's no way
+                # to tell whether it's a regular file or not,
+                # so we skip it. A regular file is always supposed
+                # to be absolutized though.
+                isfile = file.startswith('/') and isfile_strict(file)
+            except OSError:
+                # ENOENT == file which is gone in the meantime
+                err = sys.exc_info()[1]
+                if err.errno == errno.ENOENT:
+                    hit_enoent = True
+                    continue
+                if err.errno in (errno.EPERM, errno.EACCES):
+                    raise AccessDenied(self.pid, self._name)
+                raise
+            if isfile:
+                yield _common.popenfile(file, int(fd))
         if hit_enoent:
             # raise NSP if the process disappeared on us
-            os.stat('/proc/%s' % self.pid)
-        return retlist
+            self._assert_alive()
+
+    @wrap_exceptions
+    def _assert_alive(self):
+        os.stat('/proc/%s' % self.pid)
 
     @wrap_exceptions
     def connections(self, kind='inet'):
@@ -948,189 +1853,43 @@ class Process(object):
         udp6            UDP over IPv6
         all             the sum of all the possible families and protocols
         """
-        # Note: in case of UNIX sockets we're only able to determine the
-        # local bound path while the remote endpoint is not retrievable:
-        # http://goo.gl/R3GHM
-        inodes = {}
-        # os.listdir() is gonna raise a lot of access denied
-        # exceptions in case of unprivileged user; that's fine:
-        # lsof does the same so it's unlikely that we can to better.
-        for fd in os.listdir("/proc/%s/fd" % self.pid):
-            try:
-                inode = os.readlink("/proc/%s/fd/%s" % (self.pid, fd))
-            except OSError:
-                continue
-            if inode.startswith('socket:['):
-                # the process is using a socket
-                inode = inode[8:][:-1]
-                inodes[inode] = fd
-
-        if not inodes:
-            # no connections for this process
-            return []
-
-        def process(file, family, type_):
-            retlist = []
-            try:
-                f = open(file, 'r')
-            except IOError:
-                # IPv6 not supported on this platform
-                err = sys.exc_info()[1]
-                if err.errno == errno.ENOENT and file.endswith('6'):
-                    return []
-                else:
-                    raise
-            try:
-                f.readline()  # skip the first line
-                for line in f:
-                    # IPv4 / IPv6
-                    if family in (socket.AF_INET, socket.AF_INET6):
-                        _, laddr, raddr, status, _, _, _, _, _, inode = \
-                            line.split()[:10]
-                        if inode in inodes:
-                            laddr = self._decode_address(laddr, family)
-                            raddr = self._decode_address(raddr, family)
-                            if type_ == socket.SOCK_STREAM:
-                                status = TCP_STATUSES[status]
-                            else:
-                                status = _common.CONN_NONE
-                            fd = int(inodes[inode])
-                            conn = _common.pconn(fd, family, type_, laddr,
-                                                 raddr, status)
-                            retlist.append(conn)
-                    elif family == socket.AF_UNIX:
-                        tokens = line.split()
-                        _, _, _, _, type_, _, inode = tokens[0:7]
-                        if inode in inodes:
-
-                            if len(tokens) == 8:
-                                path = tokens[-1]
-                            else:
-                                path = ""
-                            fd = int(inodes[inode])
-                            type_ = int(type_)
-                            conn = _common.pconn(fd, family, type_, path,
-                                                 None, _common.CONN_NONE)
-                            retlist.append(conn)
-                    else:
-                        raise ValueError(family)
-                return retlist
-            finally:
-                f.close()
-
-        tcp4 = ("tcp", socket.AF_INET, socket.SOCK_STREAM)
-        tcp6 = ("tcp6", socket.AF_INET6, socket.SOCK_STREAM)
-        udp4 = ("udp", socket.AF_INET, socket.SOCK_DGRAM)
-        udp6 = ("udp6", socket.AF_INET6, socket.SOCK_DGRAM)
-        unix = ("unix", socket.AF_UNIX, None)
-
-        tmap = {
-            "all": (tcp4, tcp6, udp4, udp6, unix),
-            "tcp": (tcp4, tcp6),
-            "tcp4": (tcp4,),
-            "tcp6": (tcp6,),
-            "udp": (udp4, udp6),
-            "udp4": (udp4,),
-            "udp6": (udp6,),
-            "unix": (unix,),
-            "inet": (tcp4, tcp6, udp4, udp6),
-            "inet4": (tcp4, udp4),
-            "inet6": (tcp6, udp6),
-        }
-        if kind not in tmap:
-            raise ValueError("invalid %r kind argument; choose between %s"
-                             % (kind, ', '.join([repr(x) for x in tmap])))
-        ret = []
-        for f, family, type_ in tmap[kind]:
-            ret += process("/proc/net/%s" % f, family, type_)
+        ret = _connections.retrieve(kind, self.pid)
         # raise NSP if the process disappeared on us
         os.stat('/proc/%s' % self.pid)
         return ret
 
+    @wrap_exceptions
+    def iter_connections(self, kind='inet', status=None, laddr_port=None):
+        """Same as connections() but return a generator. Connections
+        whose status is not in 'status' or which are not bound to
+        the local port 'laddr_port' are discarded before their
+        addresses get decoded.
+        """
+        return _connections.iter_retrieve(kind, self.pid, status=status,
+                                          laddr_port=laddr_port)
+
     @wrap_exceptions
     def num_fds(self):
         return len(os.listdir("/proc/%s/fd" % self.pid))
 
     @wrap_exceptions
     def ppid(self):
-        f = open("/proc/%s/status" % self.pid)
-        try:
-            for line in f:
-                if line.startswith("PPid:"):
-                    # PPid: nnnn
-                    return int(line.split()[1])
-            raise NotImplementedError("line not found")
-        finally:
-            f.close()
+        return self._parse_stat_file()[2]
 
     @wrap_exceptions
     def uids(self):
-        f = open("/proc/%s/status" % self.pid)
-        try:
-            for line in f:
-                if line.startswith('Uid:'):
-                    _, real, effective, saved, fs = line.split()
-                    return _common.puids(int(real), int(effective), int(saved))
+        real, effective, saved = self._parse_status_file()[0:3]
+        if real is None:
             raise NotImplementedError("line not found")
-        finally:
-            f.close()
+        if self._raw:
+            return (real, effective, saved)
+        return _tuple_new(_common.puids, (real, effective, saved))
 
     @wrap_exceptions
     def gids(self):
-        f = open("/proc/%s/status" % self.pid)
-        try:
-            for line in f:
-                if line.startswith('Gid:'):
-                    _, real, effective, saved, fs = line.split()
-                    return _common.pgids(int(real), int(effective), int(saved))
+        real, effective, saved = self._parse_status_file()[3:6]
+        if real is None:
             raise NotImplementedError("line not found")
-        finally:
-            f.close()
-
-    @staticmethod
-    def _decode_address(addr, family):
-        """Accept an "ip:port" address as displayed in /proc/net/*
-        and convert it into a human readable form, like:
-
-        "0500000A:0016" -> ("10.0.0.5", 22)
-        "0000000000000000FFFF00000100007F:9E49" -> ("::ffff:127.0.0.1", 40521)
-
-        The IP address portion is a little or big endian four-byte
-        hexadecimal number; that is, the least significant byte is listed
-        first, so we need to reverse the order of the bytes to convert it
-        to an IP address.
-        The port is represented as a two-byte hexadecimal number.
-
-        Reference:
-        http://linuxdevcenter.com/pub/a/linux/2000/11/16/LinuxAdmin.html
-        """
-        ip, port = addr.split(':')
-        port = int(port, 16)
-        if PY3:
-            ip = ip.encode('ascii')
-        # this usually refers to a local socket in listen mode with
-        # no end-points connected
-        if not port:
-            return ()
-        if family == socket.AF_INET:
-            # see: http://code.google.com/p/psutil/issues/detail?id=201
-            if sys.byteorder == 'little':
-                ip = socket.inet_ntop(family, base64.b16decode(ip)[::-1])
-            else:
-                ip = socket.inet_ntop(family, base64.b16decode(ip))
-        else:  # IPv6
-            # old version - let's keep it, just in case...
-            # ip = ip.decode('hex')
-            # return socket.inet_ntop(socket.AF_INET6,
-            #          ''.join(ip[i:i+4][::-1] for i in xrange(0, 16, 4)))
-            ip = base64.b16decode(ip)
-            # see: http://code.google.com/p/psutil/issues/detail?id=201
-            if sys.byteorder == 'little':
-                ip = socket.inet_ntop(
-                    socket.AF_INET6,
-                    struct.pack('>4I', *struct.unpack('<4I', ip)))
-            else:
-                ip = socket.inet_ntop(
-                    socket.AF_INET6,
-                    struct.pack('<4I', *struct.unpack('<4I', ip)))
-        return (ip, port)
+        if self._raw:
+            return (real, effective, saved)
+        return _tuple_new(_common.pgids, (real, effective, saved))
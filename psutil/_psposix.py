@@ -99,17 +99,24 @@ def wait_pid(pid, timeout=None):
                 # WNOHANG was used, pid is still running
                 delay = check_timeout(delay)
                 continue
-            # process exited due to a signal; return the integer of
-            # that signal
-            if os.WIFSIGNALED(status):
-                return os.WTERMSIG(status)
-            # process exited using exit(2) system call; return the
-            # integer exit(2) system call has been called with
-            elif os.WIFEXITED(status):
-                return os.WEXITSTATUS(status)
-            else:
-                # should never happen
-                raise RuntimeError("unknown process exit status")
+            return exit_code(status)
+
+
+def exit_code(status):
+    """Convert a status as returned by os.waitpid() into the process
+    exit code.
+    """
+    # process exited due to a signal; return the integer of
+    # that signal
+    if os.WIFSIGNALED(status):
+        return os.WTERMSIG(status)
+    # process exited using exit(2) system call; return the
+    # integer exit(2) system call has been called with
+    elif os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+    else:
+        # should never happen
+        raise RuntimeError("unknown process exit status")
 
 
 def disk_usage(path):
@@ -12,6 +12,10 @@
 #include <Python.h>
 #include <errno.h>
 #include <stdlib.h>
+#include <stdio.h>
+#include <string.h>
+#include <fcntl.h>
+#include <unistd.h>
 #include <mntent.h>
 #include <features.h>
 #include <utmp.h>
@@ -20,8 +24,6 @@
 #include <sys/syscall.h>
 #include <sys/sysinfo.h>
 
-#include "_psutil_linux.h"
-
 
 // Linux >= 2.6.13
 #define PSUTIL_HAVE_IOPRIO defined(__NR_ioprio_get) && defined(__NR_ioprio_set)
@@ -38,6 +40,42 @@
     #include <sys/resource.h>
 #endif
 
+// Linux >= 3.3 (NETLINK_SOCK_DIAG, unix_diag)
+#define PSUTIL_HAVE_SOCK_DIAG \
+    LINUX_VERSION_CODE >= KERNEL_VERSION(3, 3, 0)
+
+#if PSUTIL_HAVE_SOCK_DIAG
+    // sizeof(((struct sockaddr_un *)0)->sun_path)
+    #define UNIX_PATH_MAX_DIAG 108
+    #include <arpa/inet.h>
+    #include <sys/socket.h>
+    #include <linux/netlink.h>
+    #include <linux/rtnetlink.h>
+    #include <linux/sock_diag.h>
+    #include <linux/inet_diag.h>
+    #include <linux/unix_diag.h>
+#endif
+
+// Linux >= 5.3; the syscall number is the same on all architectures
+// but alpha, so it's defined here in case libc headers are older
+#if !defined(__NR_pidfd_open) && !defined(__alpha__)
+    #define __NR_pidfd_open 434
+#endif
+
+// Linux >= 2.6.15 (process events connector)
+#define PSUTIL_HAVE_PROC_CONNECTOR \
+    LINUX_VERSION_CODE >= KERNEL_VERSION(2, 6, 15)
+
+#if PSUTIL_HAVE_PROC_CONNECTOR
+    #include <sys/socket.h>
+    #include <linux/netlink.h>
+    #include <linux/connector.h>
+    #include <linux/cn_proc.h>
+#endif
+
+// included after the PSUTIL_HAVE_* feature macros are defined
+#include "_psutil_linux.h"
+
 
 #if PSUTIL_HAVE_IOPRIO
 enum {
@@ -377,6 +415,1098 @@ error:
 }
 
 
+/*
+ * Read the whole content of /proc/{pid}/{name} into a NULL terminated
+ * malloc()ed buffer which the caller is supposed to free().
+ * If 'pfd' is not -1 it is a file descriptor of that file which is
+ * kept open by the caller: it is read with pread() from offset 0
+ * instead of opening and closing the file.
+ * On error set an OSError exception and return NULL.
+ */
+static char *
+psutil_read_procfs(long pid, const char *name, size_t *len, int pfd)
+{
+    char path[64];
+    char *buf = NULL;
+    char *tmp;
+    size_t size = 4096;
+    size_t nread = 0;
+    ssize_t ret;
+    int fd = pfd;
+
+    sprintf(path, "/proc/%ld/%s", pid, name);
+    if (pfd == -1) {
+        Py_BEGIN_ALLOW_THREADS
+        fd = open(path, O_RDONLY);
+        Py_END_ALLOW_THREADS
+        if (fd == -1) {
+            PyErr_SetFromErrnoWithFilename(PyExc_OSError, path);
+            return NULL;
+        }
+    }
+    buf = malloc(size);
+    if (buf == NULL) {
+        PyErr_NoMemory();
+        goto error;
+    }
+    while (1) {
+        if (nread == size - 1) {
+            size *= 2;
+            tmp = realloc(buf, size);
+            if (tmp == NULL) {
+                PyErr_NoMemory();
+                goto error;
+            }
+            buf = tmp;
+        }
+        Py_BEGIN_ALLOW_THREADS
+        if (pfd == -1)
+            ret = read(fd, buf + nread, size - 1 - nread);
+        else
+            ret = pread(fd, buf + nread, size - 1 - nread, nread);
+        Py_END_ALLOW_THREADS
+        if (ret == -1) {
+            if (errno == EINTR)
+                continue;
+            PyErr_SetFromErrnoWithFilename(PyExc_OSError, path);
+            goto error;
+        }
+        if (ret == 0)
+            break;
+        nread += ret;
+    }
+    if (pfd == -1)
+        close(fd);
+    buf[nread] = '\0';
+    if (len != NULL)
+        *len = nread;
+    return buf;
+
+error:
+    if (pfd == -1)
+        close(fd);
+    if (buf != NULL)
+        free(buf);
+    return NULL;
+}
+
+
+/*
+ * Return a Python string from a process name as found in procfs.
+ */
+static PyObject *
+psutil_name_from_procfs(const char *name, Py_ssize_t len)
+{
+#if PY_MAJOR_VERSION >= 3
+    return PyUnicode_DecodeFSDefaultAndSize(name, len);
+#else
+    return PyString_FromStringAndSize(name, len);
+#endif
+}
+
+
+/*
+ * Parse /proc/{pid}/stat and return a
+ * (name, status, ppid, tty_nr, utime, stime, starttime) tuple where
+ * status is the state letter and times are expressed in clock ticks.
+ * If passed, the optional 'fd' argument is read instead of opening
+ * the file, see psutil_read_procfs().
+ */
+static PyObject *
+psutil_proc_stat(PyObject *self, PyObject *args)
+{
+    long pid;
+    int fd = -1;
+    char *buf;
+    char *lpar;
+    char *rpar;
+    char state[2] = {'\0', '\0'};
+    int ppid, tty_nr;
+    unsigned long utime, stime;
+    unsigned long long starttime;
+    PyObject *py_name = NULL;
+    PyObject *py_ret = NULL;
+
+    if (! PyArg_ParseTuple(args, "l|i", &pid, &fd))
+        return NULL;
+    buf = psutil_read_procfs(pid, "stat", NULL, fd);
+    if (buf == NULL)
+        return NULL;
+
+    // The process name is enclosed in parentheses and can contain
+    // spaces and parentheses itself, hence we look for the first
+    // "(" and the last ")".
+    lpar = strchr(buf, '(');
+    rpar = strrchr(buf, ')');
+    if (lpar == NULL || rpar == NULL || rpar < lpar) {
+        PyErr_Format(PyExc_RuntimeError, "can't parse /proc/%ld/stat", pid);
+        goto error;
+    }
+    // fields 3 (state) to 22 (starttime) as described in "man proc"
+    if (sscanf(rpar + 2,
+               "%c %d %*d %*d %d %*d %*u %*u %*u %*u %*u %lu %lu "
+               "%*d %*d %*d %*d %*d %*d %llu",
+               &state[0], &ppid, &tty_nr, &utime, &stime, &starttime) != 6) {
+        PyErr_Format(PyExc_RuntimeError, "can't parse /proc/%ld/stat", pid);
+        goto error;
+    }
+    py_name = psutil_name_from_procfs(lpar + 1, rpar - lpar - 1);
+    if (py_name == NULL)
+        goto error;
+    py_ret = Py_BuildValue("(OsiikkK)", py_name, state, ppid, tty_nr,
+                           utime, stime, starttime);
+    Py_DECREF(py_name);
+    free(buf);
+    return py_ret;
+
+error:
+    free(buf);
+    return NULL;
+}
+
+
+/*
+ * Parse /proc/{pid}/statm and return a
+ * (size, resident, shared, text, lib, data, dt) tuple expressed in
+ * pages.
+ * If passed, the optional 'fd' argument is read instead of opening
+ * the file, see psutil_read_procfs().
+ */
+static PyObject *
+psutil_proc_statm(PyObject *self, PyObject *args)
+{
+    long pid;
+    int fd = -1;
+    char *buf;
+    unsigned long v[7];
+
+    if (! PyArg_ParseTuple(args, "l|i", &pid, &fd))
+        return NULL;
+    buf = psutil_read_procfs(pid, "statm", NULL, fd);
+    if (buf == NULL)
+        return NULL;
+    if (sscanf(buf, "%lu %lu %lu %lu %lu %lu %lu",
+               &v[0], &v[1], &v[2], &v[3], &v[4], &v[5], &v[6]) != 7) {
+        PyErr_Format(PyExc_RuntimeError, "can't parse /proc/%ld/statm", pid);
+        free(buf);
+        return NULL;
+    }
+    free(buf);
+    return Py_BuildValue("(kkkkkkk)",
+                         v[0], v[1], v[2], v[3], v[4], v[5], v[6]);
+}
+
+
+/*
+ * Parse /proc/{pid}/status and return a
+ * (uid_real, uid_effective, uid_saved,
+ *  gid_real, gid_effective, gid_saved,
+ *  num_threads, voluntary_ctxsw, involuntary_ctxsw) tuple.
+ * Fields which are not available on this kernel are set to None.
+ * If passed, the optional 'fd' argument is read instead of opening
+ * the file, see psutil_read_procfs().
+ */
+static PyObject *
+psutil_proc_status(PyObject *self, PyObject *args)
+{
+    long pid;
+    int fd = -1;
+    char *buf;
+    char *line;
+    char *eol;
+    unsigned long long v[9];
+    int found[9];
+    int i;
+    PyObject *py_ret = NULL;
+    PyObject *py_value = NULL;
+
+    if (! PyArg_ParseTuple(args, "l|i", &pid, &fd))
+        return NULL;
+    buf = psutil_read_procfs(pid, "status", NULL, fd);
+    if (buf == NULL)
+        return NULL;
+
+    memset(found, 0, sizeof(found));
+    line = buf;
+    while (line != NULL && *line != '\0') {
+        eol = strchr(line, '\n');
+        if (eol != NULL)
+            *eol = '\0';
+        if (strncmp(line, "Uid:", 4) == 0) {
+            if (sscanf(line + 4, "%llu %llu %llu", &v[0], &v[1], &v[2]) == 3)
+                found[0] = found[1] = found[2] = 1;
+        }
+        else if (strncmp(line, "Gid:", 4) == 0) {
+            if (sscanf(line + 4, "%llu %llu %llu", &v[3], &v[4], &v[5]) == 3)
+                found[3] = found[4] = found[5] = 1;
+        }
+        else if (strncmp(line, "Threads:", 8) == 0) {
+            found[6] = sscanf(line + 8, "%llu", &v[6]) == 1;
+        }
+        else if (strncmp(line, "voluntary_ctxt_switches:", 24) == 0) {
+            found[7] = sscanf(line + 24, "%llu", &v[7]) == 1;
+        }
+        else if (strncmp(line, "nonvoluntary_ctxt_switches:", 27) == 0) {
+            found[8] = sscanf(line + 27, "%llu", &v[8]) == 1;
+        }
+        line = eol == NULL ? NULL : eol + 1;
+    }
+    free(buf);
+
+    py_ret = PyTuple_New(9);
+    if (py_ret == NULL)
+        return NULL;
+    for (i = 0; i < 9; i++) {
+        if (found[i]) {
+            py_value = PyLong_FromUnsignedLongLong(v[i]);
+            if (py_value == NULL)
+                goto error;
+        }
+        else {
+            Py_INCREF(Py_None);
+            py_value = Py_None;
+        }
+        PyTuple_SET_ITEM(py_ret, i, py_value);
+    }
+    return py_ret;
+
+error:
+    Py_DECREF(py_ret);
+    return NULL;
+}
+
+
+
+// memory fields of /proc/{pid}/smaps summed by
+// psutil_proc_smaps_grouped(), in pmmap_grouped order
+static const char *psutil_smaps_fields[] = {
+    "Rss:", "Size:", "Pss:", "Shared_Clean:", "Shared_Dirty:",
+    "Private_Clean:", "Private_Dirty:", "Referenced:", "Anonymous:",
+    "Swap:"
+};
+#define PSUTIL_SMAPS_NFIELDS 10
+
+
+/*
+ * Parse /proc/{pid}/smaps (/proc/{pid}/smaps_rollup if 'rollup' is
+ * true) and return a list of (path, rss, size, pss, shared_clean,
+ * shared_dirty, private_clean, private_dirty, referenced, anonymous,
+ * swap) tuples in which the memory fields of all the mappings with
+ * the same path are summed and expressed in bytes. Anonymous mappings
+ * are reported as "[anon]".
+ * The sums are accumulated while parsing: no Python object is created
+ * for a mapping unless its path differs from the previous one.
+ */
+static PyObject *
+psutil_proc_smaps_grouped(PyObject *self, PyObject *args)
+{
+    long pid;
+    int rollup = 0;
+    int i;
+    char *buf;
+    char *line;
+    char *eol;
+    char *sp;
+    char *path;
+    char *path_end;
+    char *prev_path = NULL;
+    size_t prev_len = 0;
+    size_t keylen;
+    unsigned long long *sums = NULL;
+    unsigned long long *tmp;
+    long ngroups = 0;
+    long allocated = 0;
+    long cur = -1;
+    PyObject *py_index = NULL;
+    PyObject *py_paths = NULL;
+    PyObject *py_path = NULL;
+    PyObject *py_idx = NULL;
+    PyObject *py_tuple = NULL;
+    PyObject *py_ret = NULL;
+
+    if (! PyArg_ParseTuple(args, "l|i", &pid, &rollup))
+        return NULL;
+    buf = psutil_read_procfs(pid, rollup ? "smaps_rollup" : "smaps", NULL,
+                             -1);
+    if (buf == NULL)
+        return NULL;
+    py_index = PyDict_New();
+    py_paths = PyList_New(0);
+    if (py_index == NULL || py_paths == NULL)
+        goto error;
+
+    line = buf;
+    while (*line != '\0') {
+        eol = strchr(line, '\n');
+        if (eol != NULL)
+            *eol = '\0';
+        sp = strchr(line, ' ');
+        if (sp != NULL && sp > line && sp[-1] == ':') {
+            // "Rss:     1384 kB"
+            if (cur != -1) {
+                keylen = sp - line;
+                for (i = 0; i < PSUTIL_SMAPS_NFIELDS; i++) {
+                    if (strlen(psutil_smaps_fields[i]) == keylen &&
+                            memcmp(line, psutil_smaps_fields[i],
+                                   keylen) == 0) {
+                        sums[cur * PSUTIL_SMAPS_NFIELDS + i] +=
+                            strtoull(sp, NULL, 10);
+                        break;
+                    }
+                }
+            }
+        }
+        else if (sp != NULL) {
+            // "addr perms offset dev inode [path]"; skip 5 fields
+            path = line;
+            for (i = 0; i < 5; i++) {
+                while (*path == ' ' || *path == '\t')
+                    path++;
+                while (*path != '\0' && *path != ' ' && *path != '\t')
+                    path++;
+            }
+            while (*path == ' ' || *path == '\t')
+                path++;
+            path_end = path + strlen(path);
+            while (path_end > path && (path_end[-1] == ' ' ||
+                                       path_end[-1] == '\t'))
+                path_end--;
+            if (path == path_end) {
+                path = "[anon]";
+                path_end = path + 6;
+            }
+            if (prev_path == NULL ||
+                    (size_t)(path_end - path) != prev_len ||
+                    memcmp(path, prev_path, prev_len) != 0) {
+                py_path = psutil_name_from_procfs(path, path_end - path);
+                if (py_path == NULL)
+                    goto error;
+                py_idx = PyDict_GetItem(py_index, py_path);
+                if (py_idx != NULL) {
+                    cur = PyLong_AsLong(py_idx);
+                }
+                else {
+                    if (ngroups == allocated) {
+                        allocated = allocated ? allocated * 2 : 64;
+                        tmp = realloc(sums, allocated * PSUTIL_SMAPS_NFIELDS *
+                                            sizeof(unsigned long long));
+                        if (tmp == NULL) {
+                            PyErr_NoMemory();
+                            goto error;
+                        }
+                        sums = tmp;
+                    }
+                    cur = ngroups++;
+                    memset(sums + cur * PSUTIL_SMAPS_NFIELDS, 0,
+                           PSUTIL_SMAPS_NFIELDS * sizeof(unsigned long long));
+                    py_idx = PyLong_FromLong(cur);
+                    if (py_idx == NULL)
+                        goto error;
+                    if (PyDict_SetItem(py_index, py_path, py_idx) != 0) {
+                        Py_DECREF(py_idx);
+                        goto error;
+                    }
+                    Py_DECREF(py_idx);
+                    if (PyList_Append(py_paths, py_path) != 0)
+                        goto error;
+                }
+                Py_CLEAR(py_path);
+                prev_path = path;
+                prev_len = path_end - path;
+            }
+        }
+        if (eol == NULL)
+            break;
+        line = eol + 1;
+    }
+
+    py_ret = PyList_New(ngroups);
+    if (py_ret == NULL)
+        goto error;
+    for (cur = 0; cur < ngroups; cur++) {
+        tmp = sums + cur * PSUTIL_SMAPS_NFIELDS;
+        py_tuple = Py_BuildValue(
+            "(OKKKKKKKKKK)", PyList_GET_ITEM(py_paths, cur),
+            tmp[0] * 1024, tmp[1] * 1024, tmp[2] * 1024, tmp[3] * 1024,
+            tmp[4] * 1024, tmp[5] * 1024, tmp[6] * 1024, tmp[7] * 1024,
+            tmp[8] * 1024, tmp[9] * 1024);
+        if (py_tuple == NULL)
+            goto error;
+        PyList_SET_ITEM(py_ret, cur, py_tuple);
+    }
+    free(buf);
+    free(sums);
+    Py_DECREF(py_index);
+    Py_DECREF(py_paths);
+    return py_ret;
+
+error:
+    free(buf);
+    free(sums);
+    Py_XDECREF(py_path);
+    Py_XDECREF(py_index);
+    Py_XDECREF(py_paths);
+    Py_XDECREF(py_ret);
+    return NULL;
+}
+
+#if PSUTIL_HAVE_SOCK_DIAG
+/*
+ * Send a NETLINK_SOCK_DIAG dump request and call 'callback' for every
+ * returned message, passing it 'arg'. The callback returns 0 on
+ * success or -1 if a Python exception was set.
+ * Return 0 on success or -1 with a Python exception set.
+ */
+static int
+psutil_sock_diag_dump(void *req, size_t reqlen,
+                      int (*callback)(struct nlmsghdr *, void *),
+                      void *arg)
+{
+    int fd;
+    int done = 0;
+    ssize_t len;
+    struct nlmsghdr nlh;
+    struct sockaddr_nl sa;
+    struct iovec iov[2];
+    struct msghdr msg;
+    struct nlmsghdr *h;
+    struct nlmsgerr *err;
+    // aligned as netlink messages are supposed to be
+    long buf[8192 / sizeof(long)];
+
+    fd = socket(AF_NETLINK, SOCK_DGRAM, NETLINK_SOCK_DIAG);
+    if (fd == -1) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+
+    memset(&nlh, 0, sizeof(nlh));
+    nlh.nlmsg_len = NLMSG_LENGTH(reqlen);
+    nlh.nlmsg_type = SOCK_DIAG_BY_FAMILY;
+    nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_DUMP;
+    memset(&sa, 0, sizeof(sa));
+    sa.nl_family = AF_NETLINK;
+    iov[0].iov_base = &nlh;
+    iov[0].iov_len = sizeof(nlh);
+    iov[1].iov_base = req;
+    iov[1].iov_len = reqlen;
+    memset(&msg, 0, sizeof(msg));
+    msg.msg_name = &sa;
+    msg.msg_namelen = sizeof(sa);
+    msg.msg_iov = iov;
+    msg.msg_iovlen = 2;
+    if (sendmsg(fd, &msg, 0) == -1) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto error;
+    }
+
+    while (! done) {
+        Py_BEGIN_ALLOW_THREADS
+        len = recv(fd, buf, sizeof(buf), 0);
+        Py_END_ALLOW_THREADS
+        if (len == -1) {
+            if (errno == EINTR)
+                continue;
+            PyErr_SetFromErrno(PyExc_OSError);
+            goto error;
+        }
+        if (len == 0)
+            break;
+        h = (struct nlmsghdr *)buf;
+        for (; NLMSG_OK(h, len); h = NLMSG_NEXT(h, len)) {
+            if (h->nlmsg_type == NLMSG_DONE) {
+                done = 1;
+                break;
+            }
+            if (h->nlmsg_type == NLMSG_ERROR) {
+                err = (struct nlmsgerr *)NLMSG_DATA(h);
+                errno = -err->error;
+                PyErr_SetFromErrno(PyExc_OSError);
+                goto error;
+            }
+            if (h->nlmsg_type != SOCK_DIAG_BY_FAMILY)
+                continue;
+            if (callback(h, arg) != 0)
+                goto error;
+        }
+    }
+    close(fd);
+    return 0;
+
+error:
+    close(fd);
+    return -1;
+}
+
+
+struct psutil_inet_diag_arg {
+    PyObject *py_retlist;
+    int raw;
+};
+
+
+/*
+ * Convert an IPv4 / IPv6 address in network byte order into a Python
+ * string or, if raw is true, into a Python integer.
+ */
+static PyObject *
+psutil_inet_addr(int family, __be32 *addr, int raw)
+{
+    char buf[INET6_ADDRSTRLEN];
+    int i;
+
+    if (! raw) {
+        if (inet_ntop(family, addr, buf, sizeof(buf)) == NULL)
+            return PyErr_SetFromErrno(PyExc_OSError);
+        return Py_BuildValue("s", buf);
+    }
+    if (family == AF_INET)
+        return PyLong_FromUnsignedLong(ntohl(addr[0]));
+    for (i = 0; i < 4; i++)
+        sprintf(buf + i * 8, "%08x", ntohl(addr[i]));
+    return PyLong_FromString(buf, NULL, 16);
+}
+
+
+static int
+psutil_inet_diag_callback(struct nlmsghdr *h, void *arg)
+{
+    struct psutil_inet_diag_arg *diag_arg = arg;
+    PyObject *py_tuple = NULL;
+    PyObject *py_laddr = NULL;
+    PyObject *py_raddr = NULL;
+    struct inet_diag_msg *diag = (struct inet_diag_msg *)NLMSG_DATA(h);
+
+    if (h->nlmsg_len < NLMSG_LENGTH(sizeof(*diag)))
+        return 0;
+    py_laddr = psutil_inet_addr(diag->idiag_family, diag->id.idiag_src,
+                                diag_arg->raw);
+    if (py_laddr == NULL)
+        goto error;
+    py_raddr = psutil_inet_addr(diag->idiag_family, diag->id.idiag_dst,
+                                diag_arg->raw);
+    if (py_raddr == NULL)
+        goto error;
+    py_tuple = Py_BuildValue(
+        "(OiOiik)",
+        py_laddr,                        // local address
+        ntohs(diag->id.idiag_sport),     // local port
+        py_raddr,                        // remote address
+        ntohs(diag->id.idiag_dport),     // remote port
+        (int)diag->idiag_state,          // TCP state
+        (unsigned long)diag->idiag_inode);
+    if (py_tuple == NULL)
+        goto error;
+    if (PyList_Append(diag_arg->py_retlist, py_tuple))
+        goto error;
+    Py_DECREF(py_laddr);
+    Py_DECREF(py_raddr);
+    Py_DECREF(py_tuple);
+    return 0;
+
+error:
+    Py_XDECREF(py_laddr);
+    Py_XDECREF(py_raddr);
+    Py_XDECREF(py_tuple);
+    return -1;
+}
+
+
+/*
+ * Return IPv4 / IPv6 sockets as a list of
+ * (laddr, lport, raddr, rport, state, inode) tuples by querying the
+ * kernel through NETLINK_SOCK_DIAG. 'states' is a bitmask of the TCP
+ * states to return (1 << state), the filtering being done in kernel.
+ * If 'raw' is true addresses are returned as integers instead of
+ * strings.
+ */
+static PyObject *
+psutil_linux_inet_diag(PyObject *self, PyObject *args)
+{
+    int family, protocol;
+    unsigned int states;
+    struct inet_diag_req_v2 req;
+    struct psutil_inet_diag_arg arg;
+
+    arg.raw = 0;
+    if (! PyArg_ParseTuple(args, "iiI|i", &family, &protocol, &states,
+                           &arg.raw))
+        return NULL;
+    arg.py_retlist = PyList_New(0);
+    if (arg.py_retlist == NULL)
+        return NULL;
+    memset(&req, 0, sizeof(req));
+    req.sdiag_family = family;
+    req.sdiag_protocol = protocol;
+    req.idiag_states = states;
+    if (psutil_sock_diag_dump(&req, sizeof(req), psutil_inet_diag_callback,
+                              &arg) != 0) {
+        Py_DECREF(arg.py_retlist);
+        return NULL;
+    }
+    return arg.py_retlist;
+}
+
+
+static int
+psutil_unix_diag_callback(struct nlmsghdr *h, void *arg)
+{
+    PyObject *py_retlist = (PyObject *)arg;
+    PyObject *py_tuple;
+    PyObject *py_path;
+    struct unix_diag_msg *diag = (struct unix_diag_msg *)NLMSG_DATA(h);
+    struct rtattr *attr;
+    int attrlen;
+    char path[UNIX_PATH_MAX_DIAG + 1];
+    int pathlen = 0;
+
+    if (h->nlmsg_len < NLMSG_LENGTH(sizeof(*diag)))
+        return 0;
+    attr = (struct rtattr *)(diag + 1);
+    attrlen = h->nlmsg_len - NLMSG_LENGTH(sizeof(*diag));
+    for (; RTA_OK(attr, attrlen); attr = RTA_NEXT(attr, attrlen)) {
+        if (attr->rta_type == UNIX_DIAG_NAME) {
+            pathlen = RTA_PAYLOAD(attr);
+            if (pathlen > UNIX_PATH_MAX_DIAG)
+                pathlen = UNIX_PATH_MAX_DIAG;
+            memcpy(path, RTA_DATA(attr), pathlen);
+            // abstract namespace, displayed as in /proc/net/unix
+            if (pathlen > 0 && path[0] == '\0')
+                path[0] = '@';
+        }
+    }
+    path[pathlen] = '\0';
+    py_path = psutil_name_from_procfs(path, strlen(path));
+    if (py_path == NULL)
+        return -1;
+    py_tuple = Py_BuildValue(
+        "(iOk)",
+        (int)diag->udiag_type,           // socket type
+        py_path,                         // bound path
+        (unsigned long)diag->udiag_ino); // inode
+    Py_DECREF(py_path);
+    if (py_tuple == NULL)
+        return -1;
+    if (PyList_Append(py_retlist, py_tuple)) {
+        Py_DECREF(py_tuple);
+        return -1;
+    }
+    Py_DECREF(py_tuple);
+    return 0;
+}
+
+
+/*
+ * Return UNIX sockets as a list of (type, path, inode) tuples by
+ * querying the kernel through NETLINK_SOCK_DIAG.
+ */
+static PyObject *
+psutil_linux_unix_diag(PyObject *self, PyObject *args)
+{
+    struct unix_diag_req req;
+    PyObject *py_retlist = PyList_New(0);
+
+    if (py_retlist == NULL)
+        return NULL;
+    memset(&req, 0, sizeof(req));
+    req.sdiag_family = AF_UNIX;
+    req.udiag_states = -1;
+    req.udiag_show = UDIAG_SHOW_NAME;
+    if (psutil_sock_diag_dump(&req, sizeof(req), psutil_unix_diag_callback,
+                              py_retlist) != 0) {
+        Py_DECREF(py_retlist);
+        return NULL;
+    }
+    return py_retlist;
+}
+#endif
+
+
+#ifdef __NR_pidfd_open
+/*
+ * Return a file descriptor referring to process 'pid' which becomes
+ * readable when the process terminates. Raise OSError with ENOSYS
+ * on Linux < 5.3.
+ */
+static PyObject *
+psutil_linux_pidfd_open(PyObject *self, PyObject *args)
+{
+    long pid;
+    int fd;
+
+    if (! PyArg_ParseTuple(args, "l", &pid))
+        return NULL;
+    // the fd is always close-on-exec
+    fd = syscall(__NR_pidfd_open, (pid_t)pid, 0);
+    if (fd == -1)
+        return PyErr_SetFromErrno(PyExc_OSError);
+    return Py_BuildValue("i", fd);
+}
+#endif
+
+
+#if PSUTIL_HAVE_PROC_CONNECTOR
+/*
+ * Open a NETLINK_CONNECTOR socket subscribed to process events and
+ * return its file descriptor. Requires CAP_NET_ADMIN.
+ */
+static PyObject *
+psutil_linux_proc_connector_open(PyObject *self, PyObject *args)
+{
+    int fd;
+    struct sockaddr_nl sa;
+    struct {
+        struct nlmsghdr nlh;
+        struct cn_msg cn;
+        enum proc_cn_mcast_op op;
+    } __attribute__((packed)) req;
+
+    fd = socket(PF_NETLINK, SOCK_DGRAM, NETLINK_CONNECTOR);
+    if (fd == -1)
+        return PyErr_SetFromErrno(PyExc_OSError);
+    if (fcntl(fd, F_SETFD, FD_CLOEXEC) == -1)
+        goto error;
+
+    memset(&sa, 0, sizeof(sa));
+    sa.nl_family = AF_NETLINK;
+    sa.nl_groups = CN_IDX_PROC;
+    if (bind(fd, (struct sockaddr *)&sa, sizeof(sa)) == -1)
+        goto error;
+
+    memset(&req, 0, sizeof(req));
+    req.nlh.nlmsg_len = sizeof(req);
+    req.nlh.nlmsg_type = NLMSG_DONE;
+    req.cn.id.idx = CN_IDX_PROC;
+    req.cn.id.val = CN_VAL_PROC;
+    req.cn.len = sizeof(enum proc_cn_mcast_op);
+    req.op = PROC_CN_MCAST_LISTEN;
+    if (send(fd, &req, sizeof(req), 0) == -1)
+        goto error;
+    return Py_BuildValue("i", fd);
+
+error:
+    PyErr_SetFromErrno(PyExc_OSError);
+    close(fd);
+    return NULL;
+}
+
+
+/*
+ * Read the next batch of process events from a socket returned by
+ * linux_proc_connector_open() and return them as a list of
+ * (what, pid, ppid, exit_status) tuples where 'what' is either
+ * "fork", "exec" or "exit". Events about threads other than the
+ * main one are discarded. 'ppid' is -1 if not provided by the event.
+ * This never blocks: an empty list is returned if no event is
+ * available (e.g. because another thread read it first).
+ */
+static PyObject *
+psutil_linux_proc_connector_read(PyObject *self, PyObject *args)
+{
+    int fd;
+    ssize_t len;
+    struct nlmsghdr *h;
+    struct cn_msg *cn;
+    struct proc_event *ev;
+    PyObject *py_tuple = NULL;
+    PyObject *py_retlist = NULL;
+    // aligned as netlink messages are supposed to be
+    long buf[8192 / sizeof(long)];
+
+    if (! PyArg_ParseTuple(args, "i", &fd))
+        return NULL;
+
+    do {
+        Py_BEGIN_ALLOW_THREADS
+        len = recv(fd, buf, sizeof(buf), MSG_DONTWAIT);
+        Py_END_ALLOW_THREADS
+    } while (len == -1 && errno == EINTR);
+    if (len == -1 && errno != EAGAIN && errno != EWOULDBLOCK)
+        return PyErr_SetFromErrno(PyExc_OSError);
+
+    py_retlist = PyList_New(0);
+    if (py_retlist == NULL)
+        return NULL;
+    if (len == -1)
+        return py_retlist;
+    h = (struct nlmsghdr *)buf;
+    for (; NLMSG_OK(h, len); h = NLMSG_NEXT(h, len)) {
+        if (h->nlmsg_type == NLMSG_NOOP || h->nlmsg_type == NLMSG_ERROR)
+            continue;
+        cn = (struct cn_msg *)NLMSG_DATA(h);
+        if (cn->id.idx != CN_IDX_PROC || cn->id.val != CN_VAL_PROC)
+            continue;
+        ev = (struct proc_event *)cn->data;
+        switch (ev->what) {
+        case PROC_EVENT_FORK:
+            if (ev->event_data.fork.child_pid !=
+                    ev->event_data.fork.child_tgid)
+                continue;
+            py_tuple = Py_BuildValue(
+                "(siii)", "fork",
+                (int)ev->event_data.fork.child_tgid,
+                (int)ev->event_data.fork.parent_tgid, 0);
+            break;
+        case PROC_EVENT_EXEC:
+            py_tuple = Py_BuildValue(
+                "(siii)", "exec",
+                (int)ev->event_data.exec.process_tgid, -1, 0);
+            break;
+        case PROC_EVENT_EXIT:
+            if (ev->event_data.exit.process_pid !=
+                    ev->event_data.exit.process_tgid)
+                continue;
+            py_tuple = Py_BuildValue(
+                "(siii)", "exit",
+                (int)ev->event_data.exit.process_tgid, -1,
+                (int)ev->event_data.exit.exit_code);
+            break;
+        default:
+            continue;
+        }
+        if (py_tuple == NULL)
+            goto error;
+        if (PyList_Append(py_retlist, py_tuple))
+            goto error;
+        Py_DECREF(py_tuple);
+        py_tuple = NULL;
+    }
+    return py_retlist;
+
+error:
+    Py_XDECREF(py_tuple);
+    Py_DECREF(py_retlist);
+    return NULL;
+}
+#endif
+
+#if PY_VERSION_HEX >= 0x02060000
+/*
+ * Get a writable, C-contiguous buffer of doubles from a Python object
+ * (e.g. array.array('d') or a float64 numpy array).
+ */
+static int
+psutil_get_double_buffer(PyObject *obj, Py_buffer *view)
+{
+    size_t flen;
+
+    if (PyObject_GetBuffer(obj, view,
+                           PyBUF_WRITABLE | PyBUF_FORMAT |
+                           PyBUF_C_CONTIGUOUS) != 0)
+        return -1;
+    flen = view->format == NULL ? 0 : strlen(view->format);
+    if (view->itemsize != sizeof(double) || flen == 0 ||
+            view->format[flen - 1] != 'd') {
+        PyErr_SetString(PyExc_TypeError, "a buffer of doubles is required");
+        PyBuffer_Release(view);
+        return -1;
+    }
+    return 0;
+}
+
+
+/*
+ * Read the times of every CPU from /proc/stat into a buffer of doubles
+ * as a flat ncpus x nfields matrix, expressed in seconds. Fields which
+ * are not available are set to 0, as are unused buffer items.
+ * Return the number of CPUs. No Python objects are allocated.
+ */
+static PyObject *
+psutil_per_cpu_times_into(PyObject *self, PyObject *args)
+{
+    PyObject *py_buf;
+    Py_buffer view;
+    int nfields;
+    int i;
+    int fd = -1;
+    int seen_total = 0;
+    int done = 0;
+    double *out;
+    double *row;
+    double ticks;
+    Py_ssize_t size;
+    Py_ssize_t ncpus = 0;
+    Py_ssize_t j;
+    char buf[8192];
+    char *start;
+    char *nl;
+    char *p;
+    char *end;
+    size_t len = 0;
+    ssize_t n;
+    unsigned long long value;
+
+    if (! PyArg_ParseTuple(args, "Oi", &py_buf, &nfields))
+        return NULL;
+    if (nfields <= 0) {
+        PyErr_SetString(PyExc_ValueError, "nfields must be > 0");
+        return NULL;
+    }
+    if (psutil_get_double_buffer(py_buf, &view) != 0)
+        return NULL;
+    out = (double *)view.buf;
+    size = view.len / sizeof(double);
+    ticks = (double)sysconf(_SC_CLK_TCK);
+
+    fd = open("/proc/stat", O_RDONLY);
+    if (fd == -1) {
+        PyErr_SetFromErrnoWithFilename(PyExc_OSError, "/proc/stat");
+        goto error;
+    }
+    // "cpu" lines come first: stop reading as soon as another line
+    // starts, so that the (big) "intr" line is never read
+    while (! done) {
+        n = read(fd, buf + len, sizeof(buf) - len - 1);
+        if (n == -1) {
+            if (errno == EINTR)
+                continue;
+            PyErr_SetFromErrnoWithFilename(PyExc_OSError, "/proc/stat");
+            goto error;
+        }
+        if (n == 0)
+            break;
+        len += n;
+        buf[len] = '\0';
+        start = buf;
+        while ((nl = memchr(start, '\n', buf + len - start)) != NULL) {
+            *nl = '\0';
+            if (strncmp(start, "cpu", 3) != 0) {
+                done = 1;
+                break;
+            }
+            if (! seen_total) {
+                // first line: system-wide times
+                seen_total = 1;
+            }
+            else {
+                if ((ncpus + 1) * nfields > size) {
+                    PyErr_SetString(PyExc_ValueError,
+                                    "buffer too small for all CPUs");
+                    goto error;
+                }
+                row = out + ncpus * nfields;
+                p = start + 3;
+                while (*p >= '0' && *p <= '9')
+                    p++;
+                for (i = 0; i < nfields; i++) {
+                    value = strtoull(p, &end, 10);
+                    if (end == p) {
+                        row[i] = 0.0;
+                    }
+                    else {
+                        row[i] = (double)value / ticks;
+                        p = end;
+                    }
+                }
+                ncpus++;
+            }
+            start = nl + 1;
+        }
+        if (done)
+            break;
+        // keep the last, incomplete line
+        len = buf + len - start;
+        if (len >= sizeof(buf) - 1) {
+            PyErr_SetString(PyExc_RuntimeError,
+                            "line too long in /proc/stat");
+            goto error;
+        }
+        memmove(buf, start, len);
+    }
+    close(fd);
+    for (j = ncpus * nfields; j < size; j++)
+        out[j] = 0.0;
+    PyBuffer_Release(&view);
+    return Py_BuildValue("n", ncpus);
+
+error:
+    if (fd != -1)
+        close(fd);
+    PyBuffer_Release(&view);
+    return NULL;
+}
+
+
+/*
+ * Given two per-CPU times buffers as filled by per_cpu_times_into()
+ * compute the utilization percentage of every CPU (all fields but
+ * idle are considered busy) into a third buffer of ncpus doubles.
+ */
+static PyObject *
+psutil_cpu_busy_percent_into(PyObject *self, PyObject *args)
+{
+    PyObject *py_t1;
+    PyObject *py_t2;
+    PyObject *py_out;
+    Py_buffer v1;
+    Py_buffer v2;
+    Py_buffer vout;
+    int nfields;
+    int idle;
+    int i;
+    Py_ssize_t cpu;
+    Py_ssize_t ncpus;
+    double *t1;
+    double *t2;
+    double *out;
+    double all1, all2, busy1, busy2;
+
+    if (! PyArg_ParseTuple(args, "OOOii", &py_t1, &py_t2, &py_out,
+                           &nfields, &idle))
+        return NULL;
+    if (nfields <= 0 || idle < 0 || idle >= nfields) {
+        PyErr_SetString(PyExc_ValueError, "invalid nfields or idle index");
+        return NULL;
+    }
+    if (psutil_get_double_buffer(py_t1, &v1) != 0)
+        return NULL;
+    if (psutil_get_double_buffer(py_t2, &v2) != 0) {
+        PyBuffer_Release(&v1);
+        return NULL;
+    }
+    if (psutil_get_double_buffer(py_out, &vout) != 0) {
+        PyBuffer_Release(&v1);
+        PyBuffer_Release(&v2);
+        return NULL;
+    }
+    ncpus = v2.len / sizeof(double) / nfields;
+    if (v1.len != v2.len || (Py_ssize_t)(vout.len / sizeof(double)) < ncpus) {
+        PyErr_SetString(PyExc_ValueError, "buffers size mismatch");
+        goto error;
+    }
+    t1 = (double *)v1.buf;
+    t2 = (double *)v2.buf;
+    out = (double *)vout.buf;
+    for (cpu = 0; cpu < ncpus; cpu++) {
+        all1 = all2 = 0.0;
+        for (i = 0; i < nfields; i++) {
+            all1 += t1[i];
+            all2 += t2[i];
+        }
+        busy1 = all1 - t1[idle];
+        busy2 = all2 - t2[idle];
+        // this usually indicates a float precision issue
+        if (busy2 <= busy1)
+            out[cpu] = 0.0;
+        else
+            out[cpu] = (busy2 - busy1) / (all2 - all1) * 100.0;
+        t1 += nfields;
+        t2 += nfields;
+    }
+    PyBuffer_Release(&v1);
+    PyBuffer_Release(&v2);
+    PyBuffer_Release(&vout);
+    return Py_BuildValue("n", ncpus);
+
+error:
+    PyBuffer_Release(&v1);
+    PyBuffer_Release(&v2);
+    PyBuffer_Release(&vout);
+    return NULL;
+}
+#endif
+
+
 /*
  * Define the psutil C module methods and initialize the module.
  */
@@ -395,6 +1525,18 @@ PsutilMethods[] =
      "Return process CPU affinity as a Python long (the bitmask)."},
     {"proc_cpu_affinity_set", psutil_proc_cpu_affinity_set, METH_VARARGS,
      "Set process CPU affinity; expects a bitmask."},
+    {"proc_stat", psutil_proc_stat, METH_VARARGS,
+     "Parse /proc/{pid}/stat and return a (name, status, ppid, tty_nr, "
+     "utime, stime, starttime) tuple"},
+    {"proc_statm", psutil_proc_statm, METH_VARARGS,
+     "Parse /proc/{pid}/statm and return a tuple of 7 integers "
+     "expressed in pages"},
+    {"proc_status", psutil_proc_status, METH_VARARGS,
+     "Parse /proc/{pid}/status and return a tuple including uids, "
+     "gids, number of threads and context switches"},
+    {"proc_smaps_grouped", psutil_proc_smaps_grouped, METH_VARARGS,
+     "Parse /proc/{pid}/smaps and return a list of tuples of memory "
+     "fields summed by mapped path"},
 
     // --- system related functions
 
@@ -403,6 +1545,14 @@ PsutilMethods[] =
      "device, mount point and filesystem type"},
     {"users", psutil_users, METH_VARARGS,
      "Return currently connected users as a list of tuples"},
+#if PY_VERSION_HEX >= 0x02060000
+    {"per_cpu_times_into", psutil_per_cpu_times_into, METH_VARARGS,
+     "Read per-CPU times into a buffer of doubles; return the number "
+     "of CPUs"},
+    {"cpu_busy_percent_into", psutil_cpu_busy_percent_into, METH_VARARGS,
+     "Compute per-CPU utilization percentages between two per-CPU "
+     "times buffers"},
+#endif
 
     // --- linux specific
 
@@ -412,6 +1562,24 @@ PsutilMethods[] =
     {"linux_prlimit", psutil_linux_prlimit, METH_VARARGS,
      "Get or set process resource limits."},
 #endif
+#if PSUTIL_HAVE_SOCK_DIAG
+    {"linux_inet_diag", psutil_linux_inet_diag, METH_VARARGS,
+     "Return IPv4 / IPv6 sockets by querying NETLINK_SOCK_DIAG"},
+    {"linux_unix_diag", psutil_linux_unix_diag, METH_VARARGS,
+     "Return UNIX sockets by querying NETLINK_SOCK_DIAG"},
+#endif
+#ifdef __NR_pidfd_open
+    {"linux_pidfd_open", psutil_linux_pidfd_open, METH_VARARGS,
+     "Return a file descriptor referring to a process (pidfd_open(2))"},
+#endif
+#if PSUTIL_HAVE_PROC_CONNECTOR
+    {"linux_proc_connector_open", psutil_linux_proc_connector_open,
+     METH_VARARGS,
+     "Return a netlink socket fd subscribed to process events"},
+    {"linux_proc_connector_read", psutil_linux_proc_connector_read,
+     METH_VARARGS,
+     "Read process events as a list of (what, pid, ppid, exit_status)"},
+#endif
 
 
     {NULL, NULL, 0, NULL}
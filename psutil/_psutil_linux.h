@@ -12,9 +12,31 @@ static PyObject* psutil_proc_cpu_affinity_get(PyObject* self, PyObject* args);
 static PyObject* psutil_proc_cpu_affinity_set(PyObject* self, PyObject* args);
 static PyObject* psutil_proc_ioprio_get(PyObject* self, PyObject* args);
 static PyObject* psutil_proc_ioprio_get(PyObject* self, PyObject* args);
+static PyObject* psutil_proc_stat(PyObject* self, PyObject* args);
+static PyObject* psutil_proc_statm(PyObject* self, PyObject* args);
+static PyObject* psutil_proc_status(PyObject* self, PyObject* args);
+static PyObject* psutil_proc_smaps_grouped(PyObject* self, PyObject* args);
 
 // system
 
 static PyObject* psutil_disk_partitions(PyObject* self, PyObject* args);
 static PyObject* psutil_linux_sysinfo(PyObject* self, PyObject* args);
+#if PSUTIL_HAVE_SOCK_DIAG
+static PyObject* psutil_linux_inet_diag(PyObject* self, PyObject* args);
+static PyObject* psutil_linux_unix_diag(PyObject* self, PyObject* args);
+#endif
+#ifdef __NR_pidfd_open
+static PyObject* psutil_linux_pidfd_open(PyObject* self, PyObject* args);
+#endif
+#if PSUTIL_HAVE_PROC_CONNECTOR
+static PyObject* psutil_linux_proc_connector_open(PyObject* self,
+                                                  PyObject* args);
+static PyObject* psutil_linux_proc_connector_read(PyObject* self,
+                                                  PyObject* args);
+#endif
 static PyObject* psutil_users(PyObject* self, PyObject* args);
+#if PY_VERSION_HEX >= 0x02060000
+static PyObject* psutil_per_cpu_times_into(PyObject* self, PyObject* args);
+static PyObject* psutil_cpu_busy_percent_into(PyObject* self,
+                                              PyObject* args);
+#endif
@@ -7,13 +7,19 @@
 """Linux specific tests.  These are implicitly run by test_psutil.py."""
 
 from __future__ import division
+import errno
 import os
 import re
+import signal
+import socket
+import struct
+import subprocess
 import sys
+import threading
 import time
 
-from test_psutil import (POSIX, TOLERANCE, skip_on_not_implemented, sh,
-                         get_test_subprocess, retry_before_failing,
+from test_psutil import (POSIX, TOLERANCE, PYTHON, skip_on_not_implemented,
+                         sh, get_test_subprocess, retry_before_failing,
                          get_kernel_version, unittest)
 import psutil
 
@@ -137,6 +143,418 @@ class LinuxSpecificTestCase(unittest.TestCase):
         else:
             self.assertNotIn('guest_nice', fields)
 
+    def test_import_reads_no_procfs(self):
+        # /proc is accessed lazily, on first use
+        code = "\n".join([
+            "import os",
+            "opened = []",
+            "orig_open = open",
+            "def fake_open(name, *args, **kwargs):",
+            "    opened.append(name)",
+            "    return orig_open(name, *args, **kwargs)",
+            "try:",
+            "    import builtins",
+            "except ImportError:",
+            "    import __builtin__ as builtins",
+            "builtins.open = fake_open",
+            "import psutil",
+            "builtins.open = orig_open",
+            "print(opened)",
+            "psutil.cpu_percent(percpu=True)",
+            "psutil.Process(os.getpid()).io_counters()",
+        ])
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        p = subprocess.Popen([PYTHON, '-c', code], env=env,
+                             stdout=subprocess.PIPE)
+        out = p.communicate()[0]
+        self.assertEqual(p.returncode, 0)
+        self.assertEqual(out.strip().decode(), '[]')
+
+    def test_procfs_parsers(self):
+        # C and pure python /proc/{pid}/* parsers must agree
+        from psutil import _pslinux
+        import _psutil_linux
+        # use a stopped process so that its stats do not change
+        sproc = get_test_subprocess(wait=True)
+        p = psutil.Process(sproc.pid)
+        p.suspend()
+        # SIGSTOP is delivered asynchronously
+        stop_at = time.time() + 2
+        while p.status() != psutil.STATUS_STOPPED and time.time() < stop_at:
+            time.sleep(0.001)
+        for cfun, pyfun in (
+                (_psutil_linux.proc_stat, _pslinux._parse_proc_stat),
+                (_psutil_linux.proc_statm, _pslinux._parse_proc_statm),
+                (_psutil_linux.proc_status, _pslinux._parse_proc_status)):
+            self.assertEqual(cfun(sproc.pid), pyfun(sproc.pid))
+            # files kept open are read with pread()
+            name = pyfun.__name__[len('_parse_proc_'):]
+            fd = os.open("/proc/%s/%s" % (sproc.pid, name), os.O_RDONLY)
+            try:
+                for x in range(2):
+                    self.assertEqual(cfun(sproc.pid, fd), pyfun(sproc.pid))
+                    self.assertEqual(pyfun(sproc.pid, fd), pyfun(sproc.pid))
+            finally:
+                os.close(fd)
+        for rollup in (False, True):
+            if rollup and not os.path.exists('/proc/self/smaps_rollup'):
+                continue
+            self.assertEqual(
+                sorted(_psutil_linux.proc_smaps_grouped(sproc.pid, rollup)),
+                sorted(_pslinux._parse_proc_smaps_grouped(sproc.pid, rollup)))
+        sproc.kill()
+        sproc.wait()
+        self.assertRaises(OSError, _psutil_linux.proc_stat, sproc.pid)
+
+    def test_keep_procfs_open(self):
+        from psutil import _pslinux
+        funs = (psutil.cpu_times, psutil.boot_time,
+                psutil.net_io_counters, psutil.disk_io_counters)
+        expected = [type(fun()) for fun in funs]
+        psutil.keep_procfs_open()
+        try:
+            for x in range(2):
+                self.assertEqual([type(fun()) for fun in funs], expected)
+                self.assertEqual(len(psutil.cpu_times(percpu=True)),
+                                 psutil.cpu_count())
+            fds = _pslinux._procfs_fds
+            for path in ('/proc/stat', '/proc/net/dev', '/proc/diskstats'):
+                self.assertTrue(os.readlink('/proc/self/fd/%s' % fds[path])
+                                .endswith(path[len('/proc'):]))
+            # content is generated again on every read
+            t1 = psutil.cpu_times()
+            time.sleep(0.1)
+            self.assertNotEqual(psutil.cpu_times(), t1)
+        finally:
+            psutil.keep_procfs_open(False)
+        self.assertIsNone(_pslinux._procfs_fds)
+        for fd in fds.values():
+            self.assertRaises(OSError, os.fstat, fd)
+
+    def test_process_keep_procfs_open(self):
+        sproc = get_test_subprocess(wait=True)
+        p = psutil.Process(sproc.pid)
+        p.keep_procfs_open()
+        for x in range(2):
+            p.name()
+            p.memory_info()
+            p.uids()
+            p.io_counters()
+        fds = p._proc._fds
+        self.assertEqual(sorted(fds), ['io', 'stat', 'statm', 'status'])
+        p.keep_procfs_open(False)
+        self.assertIsNone(p._proc._fds)
+        for fd in fds.values():
+            self.assertRaises(OSError, os.fstat, fd)
+        # files are closed as soon as the process is gone and never
+        # opened again
+        p.keep_procfs_open()
+        p.cpu_times()
+        fd = p._proc._fds['stat']
+        sproc.kill()
+        sproc.wait()
+        self.assertRaises(psutil.NoSuchProcess, p.cpu_times)
+        self.assertRaises(OSError, os.fstat, fd)
+        self.assertRaises(psutil.NoSuchProcess, p.memory_info)
+
+    def test_ppid_map(self):
+        sproc = get_test_subprocess()
+        ppid_map = psutil._psplatform.ppid_map()
+        self.assertEqual(ppid_map[sproc.pid], os.getpid())
+        self.assertEqual(ppid_map[os.getpid()], os.getppid())
+        # creation times are read in the same pass and reused by
+        # children()
+        ctime_map = psutil._psplatform.ppid_ctime_map()
+        child = psutil.Process(sproc.pid)
+        self.assertEqual(ctime_map[sproc.pid],
+                         (os.getpid(), child.create_time()))
+        children = [x for x in psutil.Process().children()
+                    if x.pid == sproc.pid]
+        self.assertEqual(children, [child])
+        self.assertEqual(children[0]._create_time, child.create_time())
+        self.assertRaises(psutil.NoSuchProcess,
+                          psutil._psplatform.ppid_ctime, 2 ** 30)
+
+    def test_wait_procs_pidfd(self):
+        try:
+            os.close(psutil._psplatform.pidfd_open(os.getpid()))
+        except (AttributeError, EnvironmentError):
+            err = sys.exc_info()[1]
+            raise unittest.SkipTest("pidfd_open() not available: %s" % err)
+        procs = [psutil.Process(get_test_subprocess().pid)
+                 for x in range(10)]
+        # waiting does not burn CPU
+        cpu = sum(psutil.Process().cpu_times())
+        t = time.time()
+        gone, alive = psutil.wait_procs(procs, timeout=0.5)
+        self.assertGreaterEqual(time.time() - t, 0.5)
+        self.assertLess(sum(psutil.Process().cpu_times()) - cpu, 0.1)
+        self.assertEqual(gone, [])
+        self.assertEqual(set(alive), set(procs))
+        # we're woken up as soon as processes terminate
+        for p in procs[:5]:
+            p.terminate()
+        t = time.time()
+        gone, alive = psutil.wait_procs(procs[:5], timeout=5)
+        self.assertLess(time.time() - t, 1)
+        self.assertEqual(alive, [])
+        self.assertEqual(set(gone), set(procs[:5]))
+        for p in gone:
+            self.assertEqual(p.returncode, signal.SIGTERM)
+        # single process
+        self.assertRaises(psutil.TimeoutExpired, procs[5].wait, 0.01)
+        procs[5].kill()
+        self.assertEqual(procs[5].wait(5), signal.SIGKILL)
+        # already reaped
+        self.assertEqual(procs[5].wait(5), None)
+
+    def test_process_events_connector(self):
+        try:
+            events = psutil.ProcessEvents(polling=False)
+        except (NotImplementedError, EnvironmentError):
+            err = sys.exc_info()[1]
+            raise unittest.SkipTest("process connector not available: %s"
+                                    % err)
+        try:
+            self.assertFalse(events.polling)
+            self.assertIs(psutil._pmap_events, events)
+            self.assertEqual(events._ppids[os.getpid()], os.getppid())
+            # a process which exits immediately is not missed
+            code = "import os; os._exit(3)"
+            sproc = get_test_subprocess([sys.executable, "-c", code])
+            sproc.wait()
+            got = []
+            stop_at = time.time() + 3
+            while time.time() < stop_at:
+                got.extend([(x.event, x.ppid, x.exitcode)
+                            for x in events.read(timeout=0.1)
+                            if x.pid == sproc.pid])
+                if got and got[-1][0] == psutil.PROC_EVENT_EXIT:
+                    break
+            self.assertEqual(got, [(psutil.PROC_EVENT_FORK, os.getpid(), None),
+                                   (psutil.PROC_EVENT_EXEC, os.getpid(), None),
+                                   (psutil.PROC_EVENT_EXIT, os.getpid(), 3)])
+            # process_iter() table is kept up to date by the events
+            self.assertNotIn(sproc.pid, events._ppids)
+            pids = [x.pid for x in psutil.process_iter()]
+            self.assertIn(os.getpid(), pids)
+            self.assertNotIn(sproc.pid, pids)
+            fd = events.fileno()
+        finally:
+            events.close()
+        self.assertIsNone(psutil._pmap_events)
+        self.assertRaises(OSError, os.fstat, fd)
+
+    def test_process_events_threads(self):
+        # process_iter() reads events from the connector while another
+        # thread is waiting for them: it must neither hang nor lose
+        # events
+        try:
+            events = psutil.ProcessEvents(polling=False)
+        except (NotImplementedError, EnvironmentError):
+            err = sys.exc_info()[1]
+            raise unittest.SkipTest("process connector not available: %s"
+                                    % err)
+        try:
+            got = []
+
+            def reader():
+                stop_at = time.time() + 3
+                while time.time() < stop_at:
+                    got.extend(events.read(timeout=0.05))
+
+            t = threading.Thread(target=reader)
+            t.start()
+            try:
+                code = "import os; os._exit(0)"
+                for x in range(5):
+                    sproc = get_test_subprocess([sys.executable, "-c", code])
+                    sproc.wait()
+                    for y in range(20):
+                        pids = [p.pid for p in psutil.process_iter()]
+                    self.assertNotIn(sproc.pid, pids)
+            finally:
+                t.join()
+            exited = [x.pid for x in got + events.read(timeout=0)
+                      if x.event == psutil.PROC_EVENT_EXIT]
+            self.assertIn(sproc.pid, exited)
+        finally:
+            events.close()
+
+    @unittest.skipUnless(hasattr(psutil._psplatform.cext, "linux_inet_diag"),
+                         "NETLINK_SOCK_DIAG not supported")
+    def test_net_connections_netlink(self):
+        # NETLINK_SOCK_DIAG and /proc/net/* must return the same results
+        conns = psutil._psplatform._connections
+        tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # bound but not listening: not listed by /proc/net/tcp
+        bound = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            tcp.bind(('127.0.0.1', 0))
+            tcp.listen(1)
+            udp.bind(('127.0.0.1', 0))
+            bound.bind(('127.0.0.1', 0))
+            for kind in ('tcp4', 'udp4', 'unix'):
+                self.assertTrue(conns.netlink)
+                nl = conns.retrieve(kind, os.getpid())
+                conns.netlink = False
+                try:
+                    procfs = conns.retrieve(kind, os.getpid())
+                finally:
+                    conns.netlink = True
+                self.assertEqual(sorted(nl), sorted(procfs))
+            # in-kernel status filtering
+            for netlink in (True, False):
+                conns.netlink = netlink
+                try:
+                    listen = conns.retrieve(
+                        'inet4', os.getpid(), status=[psutil.CONN_LISTEN])
+                    est = conns.retrieve(
+                        'inet4', os.getpid(),
+                        status=[psutil.CONN_ESTABLISHED])
+                finally:
+                    conns.netlink = True
+                self.assertEqual([x.laddr for x in listen],
+                                 [tcp.getsockname()])
+                self.assertEqual(est, [])
+            self.assertNotIn(bound.getsockname(),
+                             [x.laddr for x in conns.retrieve('tcp4')])
+        finally:
+            tcp.close()
+            udp.close()
+            bound.close()
+
+    @unittest.skipUnless(hasattr(psutil._psplatform.cext, "linux_inet_diag"),
+                         "NETLINK_SOCK_DIAG not supported")
+    def test_net_connections_netlink_fallback(self):
+        # a protocol which can't be queried via netlink falls back on
+        # /proc/net/* for that protocol only; other errors are raised
+        conns = psutil._psplatform._connections
+        cext = psutil._psplatform.cext
+        orig = cext.linux_inet_diag
+
+        def inet_diag(family, proto, *args):
+            if proto == socket.IPPROTO_UDP:
+                raise OSError(err[0], os.strerror(err[0]))
+            return orig(family, proto, *args)
+
+        err = [errno.EPROTONOSUPPORT]
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        cext.linux_inet_diag = inet_diag
+        try:
+            udp.bind(('127.0.0.1', 0))
+            laddrs = [x.laddr for x in conns.retrieve('inet4', os.getpid())]
+            self.assertIn(udp.getsockname(), laddrs)
+            self.assertTrue(conns.netlink)
+            self.assertEqual(conns.netlink_unsupported,
+                             set([(socket.AF_INET, socket.SOCK_DGRAM)]))
+            conns.netlink_unsupported.clear()
+            err[0] = errno.ENOMEM
+            self.assertRaises(OSError, conns.retrieve, 'udp4')
+        finally:
+            cext.linux_inet_diag = orig
+            conns.netlink_unsupported.clear()
+            udp.close()
+
+    def test_iter_net_connections_filters(self):
+        # filters are applied while parsing, both with netlink and
+        # /proc/net/*, and the inode map is built lazily
+        conns = psutil._psplatform._connections
+        tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            tcp.bind(('127.0.0.1', 0))
+            tcp.listen(1)
+            port = tcp.getsockname()[1]
+            for netlink in (conns.netlink, False):
+                conns.netlink = netlink
+                try:
+                    # other processes' connections may change in the
+                    # meantime so only ours are compared
+                    all_ = conns.retrieve('all', os.getpid())
+                    for status in (None, [psutil.CONN_LISTEN],
+                                   [psutil.CONN_NONE]):
+                        for lport in (None, port):
+                            ls = list(conns.iter_retrieve(
+                                'all', os.getpid(), status=status,
+                                laddr_port=lport))
+                            self.assertEqual(sorted(ls), sorted(
+                                [x for x in all_
+                                 if (status is None or x.status in status)
+                                 and (lport is None or
+                                      (x.laddr and x.laddr[1] == lport))]))
+                    calls = []
+                    orig = conns.get_all_inodes
+                    conns.get_all_inodes = lambda: calls.append(1) or orig()
+                    try:
+                        # a port nobody is bound to
+                        tcp2 = socket.socket()
+                        tcp2.bind(('127.0.0.1', 0))
+                        free_port = tcp2.getsockname()[1]
+                        tcp2.close()
+                        self.assertEqual(list(conns.iter_retrieve(
+                            'all', laddr_port=free_port)), [])
+                        self.assertEqual(calls, [])
+                        list(conns.iter_retrieve('tcp4', laddr_port=port))
+                        self.assertEqual(calls, [1])
+                    finally:
+                        del conns.get_all_inodes
+                finally:
+                    conns.netlink = hasattr(psutil._psplatform.cext,
+                                            "linux_inet_diag")
+        finally:
+            tcp.close()
+
+    @staticmethod
+    def _format_conn(conn):
+        # turn a connection having raw IP addresses into a formatted one
+        addrs = []
+        for addr in (conn.laddr, conn.raddr):
+            if addr:
+                if conn.family == socket.AF_INET:
+                    packed = struct.pack('>I', addr[0])
+                else:
+                    packed = struct.pack('>QQ', addr[0] >> 64,
+                                         addr[0] & 0xFFFFFFFFFFFFFFFF)
+                addr = (socket.inet_ntop(conn.family, packed), addr[1])
+            addrs.append(addr)
+        return conn._replace(laddr=addrs[0], raddr=addrs[1])
+
+    def test_net_connections_raw(self):
+        conns = psutil._psplatform._connections
+        tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            tcp.bind(('127.0.0.1', 0))
+            tcp.listen(1)
+            for netlink in (conns.netlink, False):
+                conns.netlink = netlink
+                try:
+                    raw = psutil.net_connections(kind='inet', raw=True)
+                    nice = psutil.net_connections(kind='inet')
+                finally:
+                    conns.netlink = hasattr(psutil._psplatform.cext,
+                                            "linux_inet_diag")
+                self.assertIn(((0x7F000001, tcp.getsockname()[1]), ()),
+                              [(x.laddr, x.raddr) for x in raw])
+                self.assertEqual(sorted([self._format_conn(x) for x in raw]),
+                                 sorted(nice))
+        finally:
+            tcp.close()
+        # batch decoding
+        decode = conns.decode_addresses
+        self.assertEqual(
+            decode(["0500000A:0016", "0500000A:0017", "00000000:0000"],
+                   socket.AF_INET),
+            {"0500000A:0016": ("10.0.0.5", 22),
+             "0500000A:0017": ("10.0.0.5", 23),
+             "00000000:0000": ()})
+        self.assertEqual(
+            decode(["0000000000000000FFFF00000100007F:9E49"],
+                   socket.AF_INET6, raw=True),
+            {"0000000000000000FFFF00000100007F:9E49": (0xFFFF7F000001,
+                                                       40521)})
+
     # --- tests for specific kernel versions
 
     @unittest.skipUnless(
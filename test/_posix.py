@@ -209,7 +209,9 @@ class PosixSpecificTestCase(unittest.TestCase):
         p = psutil.Process(os.getpid())
         failures = []
         ignored_names = ('terminate', 'kill', 'suspend', 'resume', 'nice',
-                         'send_signal', 'wait', 'children', 'as_dict')
+                         'send_signal', 'wait', 'wait_async', 'children',
+                         'as_dict', 'keep_procfs_open', 'raw_tuples',
+                         'info', 'returncode')
         for name in dir(psutil.Process):
             if (name.startswith('_')
                     or name.startswith('set_')
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2009, Giampaolo Rodola'. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+A script which measures how long "import psutil" takes in fresh
+interpreters (best of N runs). It also lists the files opened while
+importing, which should be none under /proc.
+
+$ python test/bench_import.py [runs]
+"""
+
+import subprocess
+import sys
+
+
+RUNS = 50
+
+# print the files opened by "import psutil"
+OPENED_SCRIPT = """
+import sys
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+opened = []
+orig_open = builtins.open
+def open(name, *args, **kwargs):
+    opened.append(name)
+    return orig_open(name, *args, **kwargs)
+builtins.open = open
+import psutil
+builtins.open = orig_open
+for name in opened:
+    sys.stdout.write("%s\\n" % name)
+"""
+
+
+def timeit(runs):
+    """Return the minimum time it takes to import psutil in a fresh
+    interpreter.
+    """
+    code = "import time; t = time.time(); import psutil; " \
+           "print(time.time() - t)"
+    timings = []
+    for x in range(runs):
+        p = subprocess.Popen([sys.executable, '-c', code],
+                             stdout=subprocess.PIPE)
+        timings.append(float(p.communicate()[0]))
+    return min(timings)
+
+
+def opened_files():
+    p = subprocess.Popen([sys.executable, '-c', OPENED_SCRIPT],
+                         stdout=subprocess.PIPE)
+    out = p.communicate()[0]
+    if not isinstance(out, str):
+        out = out.decode()
+    return out.split()
+
+
+def main():
+    runs = RUNS
+    if len(sys.argv) > 1:
+        runs = int(sys.argv[1])
+    print("import psutil:  %.2f ms" % (timeit(runs) * 1000))
+    print("files opened:   %s" % (opened_files() or None))
+
+
+if __name__ == '__main__':
+    main()
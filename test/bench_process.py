@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2009, Giampaolo Rodola'. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+A script which measures the memory taken by every Process instance
+and the time it takes to call the Process methods returning
+namedtuples, also with raw tuples if supported.
+
+$ python test/bench_process.py
+"""
+
+import os
+import sys
+import timeit
+
+import psutil
+
+
+NUM_PROCS = 10000
+CALLS = 20000
+METHODS = ['cpu_times', 'memory_info', 'memory_info_ex', 'io_counters',
+           'num_ctx_switches', 'uids', 'gids']
+
+
+def process_size():
+    """Return the average amount of memory allocated by a Process
+    instance, or None if tracemalloc module is not available.
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+    pid = os.getpid()
+    tracemalloc.start()
+    procs = [psutil.Process(pid) for x in range(NUM_PROCS)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del procs
+    return size / float(NUM_PROCS)
+
+
+def call_time(p, name):
+    """Return the best time it takes to call p.<name>() in
+    microseconds.
+    """
+    timer = timeit.Timer(getattr(p, name))
+    return min(timer.repeat(5, CALLS)) / CALLS * 1000000
+
+
+def main():
+    size = process_size()
+    if size is None:
+        print("Process size:        n/a (no tracemalloc module)")
+    else:
+        print("Process size:        %d bytes" % size)
+    p = psutil.Process()
+    methods = [x for x in METHODS if hasattr(p, x)]
+    raw = hasattr(p, 'raw_tuples')
+    for name in methods:
+        line = "%-20s %6.2f us" % (name + "()", call_time(p, name))
+        if raw:
+            p.raw_tuples()
+            line += "   raw: %6.2f us" % call_time(p, name)
+            p.raw_tuples(False)
+        print(line)
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
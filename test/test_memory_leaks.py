@@ -216,6 +216,10 @@ class TestProcessObjectLeaks(Base):
     def test_memory_maps(self):
         self.execute('memory_maps')
 
+    @unittest.skipUnless(LINUX, "feature not supported on this platform")
+    def test_memory_full_info(self):
+        self.execute('memory_full_info')
+
     @unittest.skipUnless(LINUX, "feature not supported on this platform")
     def test_rlimit(self):
         self.execute('rlimit', psutil.RLIMIT_NOFILE)
@@ -334,6 +338,15 @@ class TestModuleFunctionsLeaks(Base):
     def test_per_cpu_times(self):
         self.execute('cpu_times', percpu=True)
 
+    def test_per_cpu_times_array(self):
+        times = psutil.per_cpu_times_array()
+        self.execute('per_cpu_times_array', times)
+
+    def test_cpu_busy_percent_array(self):
+        times = psutil.per_cpu_times_array()
+        out = psutil.cpu_busy_percent_array(times, times)
+        self.execute('cpu_busy_percent_array', times, times, out)
+
     @unittest.skipIf(POSIX, "not worth being tested on POSIX (pure python)")
     def test_disk_usage(self):
         self.execute('disk_usage', '.')
@@ -344,6 +357,9 @@ class TestModuleFunctionsLeaks(Base):
     def test_net_io_counters(self):
         self.execute('net_io_counters')
 
+    def test_net_connections(self):
+        self.execute('net_connections', kind='all')
+
     def test_disk_io_counters(self):
         self.execute('disk_io_counters')
 
@@ -15,6 +15,7 @@ https://pypi.python.org/pypi/unittest2
 
 from __future__ import division
 
+import array
 import atexit
 import datetime
 import errno
@@ -35,6 +36,7 @@ import time
 import traceback
 import types
 import warnings
+import weakref
 from socket import AF_INET, SOCK_STREAM, SOCK_DGRAM
 try:
     import ast  # python >= 2.6
@@ -44,6 +46,10 @@ try:
     import json  # python >= 2.6
 except ImportError:
     json = None
+try:
+    import asyncio  # python >= 3.4
+except ImportError:
+    asyncio = None
 
 if sys.version_info < (2, 7):
     import unittest2 as unittest  # https://pypi.python.org/pypi/unittest2
@@ -526,6 +532,248 @@ class TestSystemAPIs(unittest.TestCase):
         p.wait()
         self.assertNotIn(sproc.pid, [x.pid for x in psutil.process_iter()])
 
+    def test_process_iter_attrs(self):
+        for p in psutil.process_iter(['pid', 'name', 'cpu_times']):
+            self.assertEqual(sorted(p.info.keys()),
+                             ['cpu_times', 'name', 'pid'])
+            self.assertEqual(p.info['pid'], p.pid)
+        p = [x for x in psutil.process_iter(['name', 'ppid'])
+             if x.pid == os.getpid()][0]
+        self.assertEqual(p.info, p.as_dict(['name', 'ppid']))
+        # all attributes
+        p = [x for x in psutil.process_iter([])
+             if x.pid == os.getpid()][0]
+        self.assertEqual(sorted(p.info.keys()), sorted(p.as_dict().keys()))
+        self.assertRaises(AttributeError, list,
+                          psutil.process_iter(['foo']))
+        # processes which disappear before being yielded are skipped
+        sproc = get_test_subprocess()
+        pids = []
+        for p in psutil.process_iter(['name']):
+            if not pids:
+                p2 = psutil.Process(sproc.pid)
+                p2.kill()
+                p2.wait()
+            pids.append(p.pid)
+        self.assertNotIn(sproc.pid, pids)
+
+    def test_process_iter_cache(self):
+        cache = psutil.ProcessCache()
+        procs = list(psutil.process_iter(cache=cache))
+        self.assertEqual(sorted([x.pid for x in cache]),
+                         [x.pid for x in procs])
+        # instances are kept across calls but not shared with the
+        # module-wide cache
+        p = [x for x in psutil.process_iter(cache=cache)
+             if x.pid == os.getpid()][0]
+        self.assertIs(p, cache.get(os.getpid()))
+        self.assertIsNot(p, [x for x in psutil.process_iter()
+                             if x.pid == os.getpid()][0])
+        # gone processes are removed
+        sproc = get_test_subprocess()
+        self.assertIn(sproc.pid, [x.pid for x in
+                                  psutil.process_iter(cache=cache)])
+        p = psutil.Process(sproc.pid)
+        p.kill()
+        p.wait()
+        list(psutil.process_iter(cache=cache))
+        self.assertNotIn(sproc.pid, cache)
+        self.assertRaises(psutil.NoSuchProcess, cache.get, sproc.pid)
+        self.assertNotIn(sproc.pid, cache)
+
+    def test_process_iter_cache_maxsize(self):
+        # a cache smaller than the number of processes keeps the same
+        # instances across iterations instead of evicting all of them
+        cache = psutil.ProcessCache(maxsize=2)
+        procs1 = list(psutil.process_iter(cache=cache))
+        procs2 = list(psutil.process_iter(cache=cache))
+        assert len(procs1) > 2, procs1
+        self.assertEqual(len(cache), 2)
+        cached = list(cache)
+        self.assertEqual([x.pid for x in cached],
+                         [x.pid for x in procs1[:2]])
+        for proc in cached:
+            self.assertIn(proc, procs1)
+            self.assertTrue([x for x in procs2 if x is proc])
+        # the others are not cached
+        self.assertIsNot(procs1[-1], procs2[-1])
+
+    def test_process_cache(self):
+        self.assertRaises(ValueError, psutil.ProcessCache, 0)
+        pids = psutil.pids()[:3]
+        cache = psutil.ProcessCache(maxsize=2)
+        for pid in pids:
+            cache.get(pid)
+        # the least recently used instance is evicted
+        self.assertEqual(len(cache), 2)
+        self.assertEqual([x.pid for x in cache], pids[1:])
+        cache.get(pids[1])
+        self.assertEqual([x.pid for x in cache], [pids[2], pids[1]])
+        cache.discard(pids[1])
+        self.assertEqual([x.pid for x in cache], [pids[2]])
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(list(cache), [])
+
+    def test_process_cache_ttl(self):
+        # simulate a PID which has been reused by changing the
+        # creation time of the cached instance
+        cache = psutil.ProcessCache(ttl=3600)
+        p = cache.get(os.getpid())
+        p._ident = (p.pid, 0)
+        # identity is not verified again until TTL expires
+        self.assertIs(cache.get(os.getpid()), p)
+        cache.ttl = 0
+        p2 = cache.get(os.getpid())
+        self.assertIsNot(p2, p)
+        self.assertEqual(p2, psutil.Process())
+        self.assertIs(cache.get(os.getpid()), p2)
+
+    def test_process_table(self):
+        attrs = ['name', 'ppid', 'cpu_times', 'memory_info', 'nice']
+        table = psutil.process_table(attrs)
+        pids = [row[0] for row in table]
+        self.assertIn(os.getpid(), pids)
+        self.assertEqual(pids, sorted(pids))
+        for row in table:
+            self.assertEqual(len(row), len(attrs) + 1)
+        row = [x for x in table if x[0] == os.getpid()][0]
+        p = psutil.Process()
+        self.assertEqual(row[1], p.name())
+        self.assertEqual(row[2], p.ppid())
+        self.assertGreaterEqual(row[3].user, 0)
+        self.assertGreaterEqual(row[4].rss, 0)
+        self.assertEqual(row[5], p.nice())
+        # no attrs
+        self.assertEqual(psutil.process_table([]),
+                         [(pid, ) for pid in psutil.pids()])
+        # invalid attrs
+        self.assertRaises(ValueError, psutil.process_table, ['foo'])
+        self.assertRaises(ValueError, psutil.process_table, ['kill'])
+        self.assertRaises(ValueError, psutil.process_table, ['_proc'])
+
+    def test_process_tree(self):
+        tree = psutil.ProcessTree()
+        self.assertIn(os.getpid(), tree)
+        self.assertEqual(tree.children(os.getpid()), [])
+        self.assertEqual(tree.parent(os.getpid()).pid, os.getppid())
+        sproc = get_test_subprocess(wait=True)
+        self.assertNotIn(sproc.pid, tree)
+        tree.refresh()
+        self.assertIn(sproc.pid, tree)
+        self.assertEqual(len(tree), len(list(tree)))
+        children = tree.children(os.getpid())
+        self.assertEqual([x.pid for x in children], [sproc.pid])
+        self.assertEqual(tree.children(os.getpid(), recursive=True),
+                         children)
+        self.assertEqual(tree.parent(sproc.pid), psutil.Process())
+        # totals
+        p = psutil.Process()
+        self.assertEqual(tree.total(sproc.pid, 'num_threads'),
+                         children[0].num_threads())
+        self.assertEqual(tree.total(os.getpid(), 'num_threads'),
+                         p.num_threads() + children[0].num_threads())
+        rss = tree.total(os.getpid(), 'memory_info').rss
+        self.assertGreater(rss, p.memory_info().rss)
+        self.assertRaises(ValueError, tree.total, os.getpid(), 'name')
+        # gone processes are removed on refresh
+        sproc.kill()
+        sproc.wait()
+        tree.refresh()
+        self.assertNotIn(sproc.pid, tree)
+        self.assertEqual(tree.children(os.getpid()), [])
+        self.assertIsNone(tree.total(sproc.pid, 'num_threads'))
+
+    def test_process_events(self):
+        def wait_event(events, pid, event):
+            stop_at = time.time() + 3
+            while time.time() < stop_at:
+                for x in events.read(timeout=0.1):
+                    if x.pid == pid and x.event == event:
+                        return x
+            self.fail("no %r event for PID %s" % (event, pid))
+
+        events = psutil.ProcessEvents(interval=0.01, polling=True)
+        try:
+            self.assertTrue(events.polling)
+            self.assertRaises(ValueError, events.fileno)
+            sproc = get_test_subprocess()
+            ev = wait_event(events, sproc.pid, psutil.PROC_EVENT_FORK)
+            self.assertEqual(ev.ppid, os.getpid())
+            self.assertIsNone(ev.exitcode)
+            sproc.kill()
+            sproc.wait()
+            ev = wait_event(events, sproc.pid, psutil.PROC_EVENT_EXIT)
+            self.assertEqual(ev.ppid, os.getpid())
+            # timeout
+            t = time.time()
+            events.read(timeout=0.05)
+            self.assertLess(time.time() - t, 0.05 + TOLERANCE)
+        finally:
+            events.close()
+        self.assertRaises(ValueError, events.read)
+        events.close()
+
+    def test_process_table_columnar(self):
+        attrs = ['cpu_times', 'memory_info', 'num_threads', 'create_time']
+        p = psutil.Process()
+        get_numpy = psutil._get_numpy
+        try:
+            for numpy in (get_numpy(), None):
+                psutil._get_numpy = lambda: numpy
+                t1 = psutil.process_table(attrs, columnar=True)
+                t2 = psutil.process_table(attrs, columnar=True)
+                self.assertEqual(
+                    sorted(t2.keys()),
+                    ['cpu_times.system', 'cpu_times.user', 'create_time',
+                     'memory_info.rss', 'memory_info.vms', 'num_threads',
+                     'pid'])
+                for col in t2.values():
+                    self.assertEqual(len(col), len(t2['pid']))
+                pids = list(t2['pid'])
+                self.assertEqual(pids, sorted(pids))
+                i = pids.index(os.getpid())
+                self.assertEqual(t2['num_threads'][i], p.num_threads())
+                self.assertEqual(t2['create_time'][i], p.create_time())
+                self.assertGreater(t2['memory_info.rss'][i], 0)
+                self.assertGreaterEqual(t2['cpu_times.user'][i],
+                                        t1['cpu_times.user'][i])
+                percent = t2.cpu_percent(t1)
+                self.assertEqual(len(percent), len(pids))
+                self.assertGreaterEqual(percent[i], 0.0)
+                # pids missing from the previous sample get NaN
+                for name in list(t1.keys()):
+                    t1[name] = t1[name][:i]
+                percent = t2.cpu_percent(t1)
+                self.assertNotEqual(percent[i], percent[i])
+                self.assertRaises(ValueError, t2.cpu_percent,
+                                  psutil.process_table([], columnar=True))
+            self.assertRaises(ValueError, psutil.process_table, ['name'],
+                              columnar=True)
+        finally:
+            psutil._get_numpy = get_numpy
+
+    @unittest.skipUnless(LINUX, "feature not supported on this platform")
+    def test_memory_full_info_bulk(self):
+        sproc = get_test_subprocess(wait=True)
+        p = psutil.Process()
+        for workers in (1, 4):
+            ret = psutil.memory_full_info_bulk(workers=workers)
+            self.assertIn(os.getpid(), ret)
+            self.assertEqual(ret[os.getpid()]._fields,
+                             p.memory_full_info()._fields)
+            self.assertGreater(ret[os.getpid()].uss, 0)
+        # Process instances as keys; gone processes are skipped
+        child = psutil.Process(sproc.pid)
+        ret = psutil.memory_full_info_bulk([p, child])
+        self.assertEqual(sorted(ret, key=lambda x: x.pid),
+                         sorted([p, child], key=lambda x: x.pid))
+        sproc.kill()
+        sproc.wait()
+        ret = psutil.memory_full_info_bulk([os.getpid(), sproc.pid])
+        self.assertEqual(list(ret), [os.getpid()])
+        self.assertEqual(psutil.memory_full_info_bulk([]), {})
+
     def test_wait_procs(self):
         l = []
         callback = lambda p: l.append(p.pid)
@@ -576,6 +824,144 @@ class TestSystemAPIs(unittest.TestCase):
             p.terminate()
         gone, alive = psutil.wait_procs(procs)
 
+    @unittest.skipIf(asyncio is None, 'asyncio not available')
+    def test_wait_procs_async(self):
+        l = []
+        callback = lambda p: l.append(p.pid)
+        sprocs = [get_test_subprocess() for x in range(3)]
+        procs = [psutil.Process(x.pid) for x in sprocs]
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            run = loop.run_until_complete
+            t = time.time()
+            gone, alive = run(psutil.wait_procs_async(procs, timeout=0.01,
+                                                      callback=callback))
+            self.assertLess(time.time() - t, 0.5)
+            self.assertEqual(gone, [])
+            self.assertEqual(len(alive), 3)
+            self.assertEqual(l, [])
+            procs[0].terminate()
+            gone, alive = run(psutil.wait_procs_async(procs, timeout=0.5,
+                                                      callback=callback))
+            self.assertEqual(gone, [procs[0]])
+            self.assertEqual(gone[0].returncode, signal.SIGTERM)
+            self.assertEqual(len(alive), 2)
+            self.assertEqual(l, [procs[0].pid])
+            for p in alive:
+                p.terminate()
+            gone, alive = run(psutil.wait_procs_async(procs,
+                                                      callback=callback))
+            self.assertEqual(alive, [])
+            self.assertEqual(set(gone), set(procs))
+            self.assertEqual(sorted(l), sorted([x.pid for x in procs] +
+                                               [procs[0].pid]))
+            self.assertEqual(run(psutil.wait_procs_async([])), ([], []))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+        self.assertRaises(ValueError, psutil.wait_procs_async, procs, -1)
+        self.assertRaises(TypeError, psutil.wait_procs_async, procs, 1, 1)
+
+    @unittest.skipIf(asyncio is None, 'asyncio not available')
+    def test_async_collectors(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            run = loop.run_until_complete
+            cpu, percpu, mem, nic, table = run(asyncio.gather(
+                psutil.cpu_times_async(),
+                psutil.cpu_times_async(percpu=True),
+                psutil.virtual_memory_async(),
+                psutil.net_io_counters_async(pernic=True),
+                psutil.process_table_async(['pid', 'name'])))
+            self.assertEqual(cpu._fields, psutil.cpu_times()._fields)
+            self.assertEqual(len(percpu), len(psutil.cpu_times(True)))
+            self.assertEqual(mem.total, psutil.virtual_memory().total)
+            self.assertEqual(sorted(nic),
+                             sorted(psutil.net_io_counters(pernic=True)))
+            self.assertIn(os.getpid(), [x[0] for x in table])
+            if psutil.disk_io_counters() is not None:
+                run(psutil.disk_io_counters_async(perdisk=True))
+            # errors are propagated
+            self.assertRaises(ValueError, run,
+                              psutil.process_table_async(['???']))
+            # calls issued together are run by the same thread
+            threads = []
+            orig = psutil.virtual_memory
+            psutil.virtual_memory = \
+                lambda: threads.append(threading.current_thread())
+            try:
+                run(asyncio.gather(psutil.virtual_memory_async(),
+                                   psutil.virtual_memory_async()))
+            finally:
+                psutil.virtual_memory = orig
+            self.assertEqual(len(threads), 2)
+            self.assertIs(threads[0], threads[1])
+            self.assertIsNot(threads[0], threading.current_thread())
+            # interval-based calls don't block the loop
+            ticks = []
+
+            def tick():
+                ticks.append(None)
+                loop.call_later(0.01, tick)
+
+            loop.call_soon(tick)
+            t = time.time()
+            percent, times_percent = run(asyncio.gather(
+                psutil.cpu_percent_async(interval=0.2),
+                psutil.cpu_times_percent_async(interval=0.2, percpu=True)))
+            self.assertGreaterEqual(time.time() - t, 0.2)
+            self.assertGreater(len(ticks), 5)
+            self.assertTrue(0.0 <= percent <= 100.0, percent)
+            self.assertEqual(len(times_percent), len(percpu))
+            run(psutil.cpu_percent_async(percpu=True))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def test_sampler(self):
+        sproc = get_test_subprocess()
+        wait_for_pid(sproc.pid)
+        sampler = psutil.Sampler(percpu=True, disk=True, net=True,
+                                 pernic=True, procs=[os.getpid(), sproc.pid])
+        t = time.time()
+        s = sampler.sample(interval=0.1)
+        # a single sleep for all metrics
+        self.assertGreaterEqual(time.time() - t, 0.1)
+        self.assertLess(time.time() - t, 0.5)
+        self.assertGreaterEqual(s.elapsed, 0.1)
+        self.assertTrue(0.0 <= s.cpu_percent <= 100.0, s.cpu_percent)
+        self.assertEqual(s.cpu_times_percent._fields,
+                         psutil.cpu_times()._fields)
+        self.assertEqual(len(s.per_cpu_percent), len(psutil.cpu_times(True)))
+        self.assertEqual(len(s.per_cpu_times_percent),
+                         len(psutil.cpu_times(True)))
+        self.assertEqual(sorted(s.net_io), sorted(s.net_io_rate))
+        for nic, delta in s.net_io.items():
+            self.assertEqual(delta._fields, psutil.net_io_counters()._fields)
+            for value in delta:
+                self.assertGreaterEqual(value, 0)
+            self.assertAlmostEqual(s.net_io_rate[nic].bytes_sent,
+                                   delta.bytes_sent / s.elapsed)
+        if psutil.disk_io_counters() is not None:
+            self.assertGreaterEqual(s.disk_io.read_count, 0)
+            self.assertGreaterEqual(s.disk_io_rate.read_count, 0)
+        self.assertEqual(sorted(s.procs_cpu_percent),
+                         sorted([os.getpid(), sproc.pid]))
+        # processes which went away are reported as None
+        sproc.kill()
+        sproc.wait()
+        s = sampler.sample()
+        self.assertIsNone(s.procs_cpu_percent[sproc.pid])
+        self.assertIsInstance(s.procs_cpu_percent[os.getpid()], float)
+        # metrics which were not requested
+        s = psutil.Sampler().sample()
+        self.assertIsInstance(s.cpu_percent, float)
+        for name in ('per_cpu_percent', 'disk_io', 'net_io_rate',
+                     'procs_cpu_percent'):
+            self.assertIsNone(getattr(s, name))
+
     def test_boot_time(self):
         bt = psutil.boot_time()
         self.assertIsInstance(bt, float)
@@ -877,6 +1263,89 @@ class TestSystemAPIs(unittest.TestCase):
                     self._test_cpu_percent(percent)
                 self._test_cpu_percent(sum(cpu))
 
+    def test_per_cpu_times_array(self):
+        fields = psutil.cpu_times()._fields
+        nfields = len(fields)
+        per_cpu = psutil.cpu_times(percpu=True)
+        t1 = psutil.per_cpu_times_array()
+        self.assertIsInstance(t1, array.array)
+        self.assertEqual(len(t1), len(per_cpu) * nfields)
+        for cpu, times in enumerate(per_cpu):
+            for field, value in enumerate(times):
+                self.assertAlmostEqual(t1[cpu * nfields + field], value,
+                                       delta=1)
+        # filled in place; extra items are zeroed
+        out = array.array('d', [-1.0]) * (len(t1) + nfields)
+        self.assertIs(psutil.per_cpu_times_array(out), out)
+        self.assertEqual(list(out[len(t1):]), [0.0] * nfields)
+        t2 = out[:len(t1)]
+        for x, y in zip(t1, t2):
+            self.assertGreaterEqual(y, x)
+        percents = psutil.cpu_busy_percent_array(t1, t2)
+        self.assertEqual(len(percents), len(per_cpu))
+        for percent in percents:
+            self._test_cpu_percent(percent)
+        out = array.array('d', [-1.0]) * len(per_cpu)
+        self.assertIs(psutil.cpu_busy_percent_array(t1, t2, out), out)
+        self.assertEqual(list(out), list(percents))
+        # errors
+        self.assertRaises(ValueError, psutil.per_cpu_times_array,
+                          array.array('d', [0.0]))
+        self.assertRaises(ValueError, psutil.cpu_busy_percent_array,
+                          t1, t2[:-1])
+        if LINUX:
+            self.assertRaises(TypeError, psutil.per_cpu_times_array,
+                              array.array('i', [0]) * len(t1))
+        # numpy 2D arrays
+        numpy = psutil._get_numpy()
+        if numpy is not None:
+            arr = numpy.zeros((len(per_cpu), nfields))
+            psutil.per_cpu_times_array(arr)
+            self.assertTrue((arr >= numpy.array(t1).reshape(arr.shape)).all())
+            out = numpy.zeros(len(per_cpu))
+            psutil.cpu_busy_percent_array(t1, arr, out)
+            self.assertTrue(((out >= 0) & (out <= 100)).all())
+
+    def test_cpu_percent_tracker(self):
+        tracker = psutil.CPUPercentTracker()
+        self._test_cpu_percent(tracker.cpu_percent())
+        self.assertEqual(len(tracker.cpu_percent(percpu=True)),
+                         psutil.cpu_count())
+        for percent in tracker.cpu_times_percent():
+            self._test_cpu_percent(percent)
+        self.assertEqual(len(tracker.cpu_times_percent(percpu=True)),
+                         psutil.cpu_count())
+        # every tracker has its own baseline, independent from the
+        # module-level functions
+        other = psutil.CPUPercentTracker()
+        self.assertIsNot(tracker._last, other._last)
+        key = list(tracker._last)[0]
+        before = other._last[key]
+        tracker.cpu_percent()
+        tracker.cpu_times_percent(percpu=True)
+        psutil.cpu_percent(interval=None)
+        self.assertIs(other._last[key], before)
+
+        # many threads polling the same tracker
+        errors = []
+
+        def poll():
+            try:
+                for x in range(200):
+                    self._test_cpu_percent(tracker.cpu_percent())
+                    for cpu in tracker.cpu_times_percent(percpu=True):
+                        for percent in cpu:
+                            self._test_cpu_percent(percent)
+            except Exception:
+                errors.append(sys.exc_info()[1])
+
+        threads = [threading.Thread(target=poll) for x in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
     @unittest.skipIf(POSIX and not hasattr(os, 'statvfs'),
                      "os.statvfs() function not available on this platform")
     def test_disk_usage(self):
@@ -975,6 +1444,69 @@ class TestSystemAPIs(unittest.TestCase):
         self.assertIn(mount, mounts)
         psutil.disk_usage(mount)
 
+    def test_net_connections(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind(('127.0.0.1', 0))
+            sock.listen(1)
+            laddr = sock.getsockname()
+            cons = [x for x in psutil.net_connections(kind='tcp4')
+                    if x.laddr == laddr]
+            self.assertEqual(len(cons), 1)
+            conn = cons[0]
+            self.assertEqual(conn.pid, os.getpid())
+            self.assertEqual(conn.fd, sock.fileno())
+            self.assertEqual(conn.family, socket.AF_INET)
+            self.assertEqual(conn.type, socket.SOCK_STREAM)
+            self.assertEqual(conn.status, psutil.CONN_LISTEN)
+            self.assertEqual(conn.raddr, ())
+            self.assertNotIn(conn, psutil.net_connections(kind='udp'))
+            # system-wide connections include per-process ones
+            proc_cons = psutil.Process().connections(kind='all')
+            all_cons = [x[:-1] for x in psutil.net_connections(kind='all')
+                        if x.pid == os.getpid()]
+            for x in proc_cons:
+                self.assertIn(tuple(x), all_cons)
+        finally:
+            sock.close()
+        for kind in ('all', 'inet', 'inet4', 'inet6', 'tcp', 'tcp4',
+                     'tcp6', 'udp', 'udp4', 'udp6', 'unix'):
+            if kind.endswith('6') and not supports_ipv6():
+                continue
+            for conn in psutil.net_connections(kind=kind):
+                self.assertEqual(len(conn), 7)
+                self.assertTrue(conn.pid is None or conn.pid > 0)
+        self.assertRaises(ValueError, psutil.net_connections, kind='???')
+
+    def test_iter_net_connections(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind(('127.0.0.1', 0))
+            sock.listen(1)
+            laddr = sock.getsockname()
+            it = psutil.iter_net_connections(kind='all')
+            self.assertFalse(isinstance(it, list))
+            # other processes' connections may change in the meantime
+            mine = lambda ls: sorted([x for x in ls if x.pid == os.getpid()])
+            self.assertEqual(mine(it),
+                             mine(psutil.net_connections(kind='all')))
+            # filters
+            cons = list(psutil.iter_net_connections(
+                kind='inet', status=psutil.CONN_LISTEN, laddr_port=laddr[1]))
+            self.assertEqual([x.laddr for x in cons], [laddr])
+            self.assertEqual(cons[0].pid, os.getpid())
+            cons = list(psutil.iter_net_connections(
+                kind='inet', status=[psutil.CONN_ESTABLISHED],
+                laddr_port=laddr[1]))
+            self.assertEqual(cons, [])
+            for conn in psutil.iter_net_connections(
+                    kind='all', status=psutil.CONN_LISTEN):
+                self.assertEqual(conn.status, psutil.CONN_LISTEN)
+        finally:
+            sock.close()
+        # kind is validated on call, not on first iteration
+        self.assertRaises(ValueError, psutil.iter_net_connections, kind='???')
+
     def test_net_io_counters(self):
         def check_ntuple(nt):
             self.assertEqual(nt[0], nt.bytes_sent)
@@ -1136,6 +1668,48 @@ class TestProcess(unittest.TestCase):
         # timeout < 0 not allowed
         self.assertRaises(ValueError, p.wait, -1)
 
+    @unittest.skipIf(asyncio is None, 'asyncio not available')
+    def test_wait_async(self):
+        def run(future):
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                return loop.run_until_complete(
+                    asyncio.wait_for(future(), 5))
+            finally:
+                asyncio.set_event_loop(None)
+                loop.close()
+
+        def enosys(pid):
+            raise OSError(errno.ENOSYS, "")
+
+        pidfd_open = getattr(psutil._psplatform, 'pidfd_open', None)
+        try:
+            # with and without pidfds (Linux)
+            for x in set([pidfd_open, enosys]):
+                if pidfd_open is not None:
+                    psutil._psplatform.pidfd_open = x
+                sproc = get_test_subprocess()
+                p = psutil.Process(sproc.pid)
+                p.terminate()
+                code = run(p.wait_async)
+                if POSIX:
+                    self.assertEqual(code, signal.SIGTERM)
+                self.assertFalse(p.is_running())
+                # timeout
+                sproc = get_test_subprocess()
+                p = psutil.Process(sproc.pid)
+                self.assertRaises(psutil.TimeoutExpired, run,
+                                  lambda: p.wait_async(0.01))
+                # psutil.Popen
+                code = "import sys; sys.exit(5)"
+                p = psutil.Popen([PYTHON, "-c", code])
+                self.assertEqual(run(p.wait_async), 5)
+        finally:
+            if pidfd_open is not None:
+                psutil._psplatform.pidfd_open = pidfd_open
+        self.assertRaises(ValueError, p.wait_async, -1)
+
     # XXX why is this skipped on Windows?
     @unittest.skipUnless(POSIX, 'skipped on Windows')
     def test_wait_non_children(self):
@@ -1450,6 +2024,79 @@ class TestProcess(unittest.TestCase):
                     self.assertIsInstance(value, (int, long))
                     assert value >= 0, value
 
+    def test_memory_maps_grouped(self):
+        # grouped fields are the sum of the mappings' fields; use a
+        # stopped process so that its memory does not change between
+        # the two reads
+        sproc = get_test_subprocess(wait=True)
+        p = psutil.Process(sproc.pid)
+        p.suspend()
+        stop_at = time.time() + 2
+        while POSIX and p.status() != psutil.STATUS_STOPPED \
+                and time.time() < stop_at:
+            time.sleep(0.001)
+        try:
+            maps = p.memory_maps()
+            ext_maps = p.memory_maps(grouped=False)
+        finally:
+            p.resume()
+        for nt in maps:
+            for fname in ('size', 'anonymous'):
+                self.assertEqual(getattr(nt, fname),
+                                 sum([getattr(x, fname) for x in ext_maps
+                                      if x.path == nt.path]))
+
+    @unittest.skipUnless(LINUX, "feature not supported on this platform")
+    def test_memory_full_info(self):
+        p = psutil.Process()
+        mem = p.memory_full_info()
+        self.assertEqual(mem._fields[:len(p.memory_info_ex()._fields)],
+                         p.memory_info_ex()._fields)
+        maps = p.memory_maps()
+        self.assertGreater(mem.uss, 0)
+        self.assertGreater(mem.pss, 0)
+        self.assertLessEqual(mem.uss, mem.pss)
+        self.assertLessEqual(mem.pss, mem.rss)
+        # the totals are also computed from smaps on old kernels
+        uss = sum([x.private_clean + x.private_dirty for x in maps])
+        pss = sum([x.pss for x in maps])
+        self.assertAlmostEqual(mem.uss, uss, delta=mem.uss * 0.1)
+        self.assertAlmostEqual(mem.pss, pss, delta=mem.pss * 0.1)
+
+    @unittest.skipUnless(LINUX, "feature not supported on this platform")
+    def test_raw_tuples(self):
+        p = psutil.Process()
+        names = ('uids', 'gids', 'num_ctx_switches', 'memory_info_ex',
+                 'ionice', 'io_counters')
+        expected = dict([(x, getattr(p, x)()) for x in names])
+        p.raw_tuples()
+        try:
+            for name in names:
+                ret = getattr(p, name)()
+                self.assertIs(type(ret), tuple)
+                self.assertEqual(len(ret), len(expected[name]._fields))
+            self.assertEqual(p.uids(), tuple(expected['uids']))
+            self.assertEqual(p.gids(), tuple(expected['gids']))
+            self.assertIs(type(p.cpu_times()), tuple)
+            self.assertIs(type(p.memory_full_info()), tuple)
+            self.assertIs(type(p.threads()[0]), tuple)
+            # the methods using them internally still work
+            self.assertGreater(p.memory_percent(), 0.0)
+            p.cpu_percent(interval=0.001)
+            self.assertEqual(p.username(), psutil.Process().username())
+            self.assertIs(type(p.as_dict(['uids'])['uids']), tuple)
+        finally:
+            p.raw_tuples(False)
+        self.assertEqual(p.uids(), expected['uids'])
+        self.assertIsNot(type(p.uids()), tuple)
+
+    def test_slots(self):
+        p = psutil.Process()
+        self.assertRaises(AttributeError, setattr, p, 'foo', 1)
+        self.assertFalse(hasattr(p, '__dict__'))
+        ref = weakref.ref(p)
+        self.assertIs(ref(), p)
+
     def test_memory_percent(self):
         p = psutil.Process()
         self.assertGreater(p.memory_percent(), 0.0)
@@ -1651,6 +2298,22 @@ class TestProcess(unittest.TestCase):
         fileobj.close()
         self.assertTrue(fileobj.name not in p.open_files())
 
+    def test_iter_open_files(self):
+        fileobj = open(TESTFN, 'w')
+        try:
+            p = psutil.Process()
+            it = p.iter_open_files()
+            self.assertFalse(isinstance(it, list))
+            self.assertEqual(sorted(it), sorted(p.open_files()))
+            self.assertIn(fileobj.name, [x.path for x in p.iter_open_files()])
+        finally:
+            fileobj.close()
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        p.kill()
+        p.wait()
+        self.assertRaises(psutil.NoSuchProcess, p.iter_open_files)
+
     def test_connection_constants(self):
         ints = []
         strs = []
@@ -1696,6 +2359,15 @@ class TestProcess(unittest.TestCase):
         self.assertEqual(con[5], con.status)
         # test kind arg
         self.assertRaises(ValueError, p.connections, 'foo')
+        # generator version and its filters
+        self.assertEqual(list(p.iter_connections()), cons)
+        self.assertEqual(
+            list(p.iter_connections(status=psutil.CONN_LISTEN,
+                                    laddr_port=con.laddr[1])), cons)
+        self.assertEqual(
+            list(p.iter_connections(status=[psutil.CONN_ESTABLISHED])), [])
+        self.assertEqual(list(p.iter_connections(laddr_port=1)), [])
+        self.assertEqual(list(p.iter_connections('udp')), [])
 
     @unittest.skipUnless(supports_ipv6(), 'IPv6 is not supported')
     def test_connections_ipv6(self):
@@ -1939,6 +2611,34 @@ class TestProcess(unittest.TestCase):
         if not isinstance(d['connections'], list):
             self.assertEqual(d['connections'], 'foo')
 
+    def test_oneshot(self):
+        p = psutil.Process()
+        ctx = p.oneshot()
+        self.assertIs(ctx.__enter__(), p)
+        try:
+            name = p.name()
+            ppid = p.ppid()
+            times = p.cpu_times()
+            self.assertEqual(p.name(), name)
+            self.assertEqual(p.ppid(), ppid)
+            # values are cached within the block
+            self.assertEqual(p.cpu_times(), times)
+            # nested blocks are a no-op
+            ctx2 = p.oneshot()
+            ctx2.__enter__()
+            ctx2.__exit__(None, None, None)
+            self.assertEqual(p.cpu_times(), times)
+        finally:
+            ctx.__exit__(None, None, None)
+        # cache is cleared on exit
+        for x in range(100000):
+            if p.cpu_times() != times:
+                break
+        else:
+            self.fail("cpu_times() is still cached")
+        self.assertEqual(p.as_dict(['name', 'ppid']),
+                         {'name': name, 'ppid': ppid})
+
     def test_halfway_terminated_process(self):
         # Test that NoSuchProcess exception gets raised in case the
         # process dies after we create the Process object.
@@ -1952,7 +2652,10 @@ class TestProcess(unittest.TestCase):
         p.kill()
         p.wait()
 
-        excluded_names = ('pid', 'is_running', 'wait', 'create_time')
+        excluded_names = ('pid', 'is_running', 'wait', 'create_time',
+                          'oneshot', 'iter_open_files', 'iter_connections',
+                          'wait_async', 'keep_procfs_open', 'raw_tuples',
+                          'info', 'returncode')
         for name in dir(p):
             if (name.startswith('_')
                     or name.startswith('get')  # deprecated APIs
@@ -2119,7 +2822,10 @@ class TestFetchAllProcesses(unittest.TestCase):
         valid_procs = 0
         excluded_names = set([
             'send_signal', 'suspend', 'resume', 'terminate', 'kill', 'wait',
-            'as_dict', 'cpu_percent', 'parent', 'children', 'pid'])
+            'as_dict', 'cpu_percent', 'parent', 'children', 'pid',
+            'oneshot', 'iter_open_files', 'iter_connections',
+            'wait_async', 'keep_procfs_open', 'raw_tuples', 'info',
+            'returncode'])
         attrs = []
         for name in dir(psutil.Process):
             if name.startswith("_"):
@@ -2271,6 +2977,11 @@ class TestFetchAllProcesses(unittest.TestCase):
         self.assertTrue(ret.rss >= 0)
         self.assertTrue(ret.vms >= 0)
 
+    def memory_full_info(self, ret):
+        for name in ret._fields:
+            self.assertTrue(getattr(ret, name) >= 0)
+        assert ret.uss <= ret.pss <= ret.rss, ret
+
     def memory_info_ex(self, ret):
         for name in ret._fields:
             self.assertTrue(getattr(ret, name) >= 0)
@@ -2478,6 +3189,29 @@ class TestMisc(unittest.TestCase):
                                 'deprecated' not in fun.__doc__.lower()):
                             self.fail('%r not in psutil.__all__' % name)
 
+    @unittest.skipIf(sys.version_info < (3, 7), "module __getattr__ n/a")
+    def test_deprecated_apis_lazy(self):
+        # deprecated APIs are loaded on first use
+        code = "; ".join([
+            "import sys, warnings",
+            "warnings.simplefilter('ignore')",
+            "import psutil",
+            "assert 'psutil._deprecated' not in sys.modules",
+            "assert 'get_cpu_times' in dir(psutil.Process)",
+            "assert 'set_nice' in dir(psutil.Process)",
+            "assert not hasattr(psutil.Process(), 'foo')",
+            "assert 'psutil._deprecated' not in sys.modules",
+            "assert not hasattr(psutil, 'foo')",
+            "assert 'psutil._deprecated' in sys.modules",
+            "assert psutil.NUM_CPUS == psutil.cpu_count()",
+            "from psutil import get_pid_list",
+            "assert psutil.Process().get_cpu_times()",
+            "assert hasattr(psutil.Process, 'get_cpu_times')",
+        ])
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        subprocess.check_call([PYTHON, '-c', code], env=env)
+
     def test_cached_property(self):
         from psutil._common import cached_property
 
@@ -2534,6 +3268,33 @@ class TestMisc(unittest.TestCase):
         # docstring
         self.assertEqual(foo.__doc__, "foo docstring")
 
+    def test_memoize_when_activated(self):
+        from psutil._common import memoize_when_activated
+
+        class Foo(object):
+            @memoize_when_activated
+            def foo(self):
+                "foo docstring"
+                calls.append(None)
+                return len(calls)
+
+        calls = []
+        f = Foo()
+        # deactivated (default)
+        self.assertEqual(f.foo(), 1)
+        self.assertEqual(f.foo(), 2)
+        # activated
+        Foo.foo.cache_activate(f)
+        self.assertEqual(f.foo(), 3)
+        self.assertEqual(f.foo(), 3)
+        # other instances are not affected
+        self.assertEqual(Foo().foo(), 4)
+        # deactivated again
+        Foo.foo.cache_deactivate(f)
+        self.assertEqual(f.foo(), 5)
+        Foo.foo.cache_deactivate(f)
+        self.assertEqual(Foo.foo.__doc__, "foo docstring")
+
     def test_serialization(self):
         def check(ret):
             if json is not None: